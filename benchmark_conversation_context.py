@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the per-call cost of ConversationContext.get_context with many active users.
+
+The expiry cleanup only looks at the oldest contexts, so the cost per call should stay
+flat as the number of users grows; the "full scan" column times the old approach of
+checking every context on each call, for comparison.
+
+A second table reports the memory held per user after a long conversation
+(MESSAGES_PER_USER messages mentioning new products, orders and price ranges), and the
+memory of the message histories per 10k users with and without compressing the older
+messages.
+
+    python benchmark_conversation_context.py
+    python benchmark_conversation_context.py 1000 10000 100000 250000
+"""
+
+import sys
+import time
+import random
+import tracemalloc
+from conversation_context import ConversationContext, MessageBuffer, MESSAGE_HISTORY
+
+CALLS = 20000
+SCAN_CALLS = 20
+MEMORY_USERS = 200
+MESSAGES_PER_USER = 200
+
+def populate(users):
+    """Context manager with `users` active contexts"""
+    manager = ConversationContext()
+    for i in range(users):
+        manager.get_context(f"user{i}")
+    return manager
+
+def per_call_us(func, calls):
+    """Average microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+def full_scan(manager):
+    """The old cleanup: compute the expiry of every context"""
+    current_time = time.time()
+    expired_ids = [user_id for user_id, context in manager.contexts.items()
+                   if current_time > context['last_updated'] + manager.expiration_hours * 3600]
+    return expired_ids
+
+def run(sizes):
+    print(f"{'users':>10}{'get_context us':>18}{'update_context us':>20}{'full scan us':>16}")
+    for users in sizes:
+        manager = populate(users)
+        user_ids = [f"user{random.randrange(users)}" for _ in range(CALLS)]
+        calls = iter(user_ids * 2)
+        get_us = per_call_us(lambda: manager.get_context(next(calls)), CALLS)
+        update_us = per_call_us(lambda: manager.update_context(next(calls), "ok", is_user=False), CALLS)
+        scan_us = per_call_us(lambda: full_scan(manager), SCAN_CALLS)
+        print(f"{users:>10}{get_us:>18.2f}{update_us:>20.2f}{scan_us:>16.0f}")
+
+def long_conversation(manager, user_id):
+    """Feed one user a long conversation with many distinct entities"""
+    for i in range(MESSAGES_PER_USER):
+        manager.update_context(user_id, f"Haben Sie Embraco NJ {9000 + i} unter {100 + i} Euro? Bestellung #{10000 + i}")
+        manager.update_context(user_id, f"Embraco NJ {9000 + i} kostet {100 + i} EUR.", is_user=False)
+
+def memory_per_user():
+    """Bytes allocated per user after a long conversation"""
+    manager = ConversationContext()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(MEMORY_USERS):
+        long_conversation(manager, f"user{i}")
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    context = manager.get_context("user0")
+    entities = {name: len(values) for name, values in context['entities'].items()}
+    print(f"\n{MEMORY_USERS} users x {MESSAGES_PER_USER * 2} messages: {allocated / MEMORY_USERS / 1024:.1f} KB per user")
+    print(f"messages kept: {len(context['messages'])}, entities kept: {entities}")
+
+def allocated_bytes(build, count):
+    """Bytes allocated by `count` results of build(), kept alive while measuring"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+def message_history_memory():
+    """Memory of full message histories, all hot versus older messages compressed"""
+    def history(i):
+        for n in range(MESSAGE_HISTORY):
+            yield {'text': f"Haben Sie Embraco NJ {9000 + i + n} unter {100 + n} Euro? Bestellung #{10000 + i}",
+                   'timestamp': time.time(), 'is_user': n % 2 == 0}
+    hot = allocated_bytes(lambda i: MessageBuffer(history(i), hot=MESSAGE_HISTORY), MEMORY_USERS)
+    tiered = allocated_bytes(lambda i: MessageBuffer(history(i)), MEMORY_USERS)
+    scale = 10000 / MEMORY_USERS / 1024 / 1024
+    print(f"\nmessage histories per 10k users ({MESSAGE_HISTORY} messages each): "
+          f"all hot {hot * scale:.1f} MB, older compressed {tiered * scale:.1f} MB, "
+          f"saved {(hot - tiered) * scale:.1f} MB")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    run(sizes)
+    memory_per_user()
+    message_history_memory()
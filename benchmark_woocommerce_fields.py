@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark bytes transferred and JSON parse time of WooCommerce reads with and
+without `_fields` projections.
+
+    python benchmark_woocommerce_fields.py          # offline fake store with synthetic data
+    python benchmark_woocommerce_fields.py --live   # against the configured store
+"""
+
+import sys
+import json
+import time
+from woocommerce_fields import (
+    PRODUCT_SEARCH_FIELDS, PRODUCT_RECOMMENDATION_FIELDS, ORDER_SUMMARY_FIELDS,
+    ORDER_NOTIFICATION_FIELDS, ORDER_INDEX_FIELDS, fields_param
+)
+
+PARSE_RUNS = 50
+
+# (label, endpoint, params, projection)
+SCENARIOS = [
+    ("product search (20)", "products", {"search": "embraco", "per_page": 20}, PRODUCT_SEARCH_FIELDS),
+    ("recommendations (10)", "products", {"per_page": 10}, PRODUCT_RECOMMENDATION_FIELDS),
+    ("order summaries (20)", "orders", {"per_page": 20}, ORDER_SUMMARY_FIELDS),
+    ("notification poll (100)", "orders", {"per_page": 100}, ORDER_NOTIFICATION_FIELDS),
+    ("order index page (100)", "orders", {"per_page": 100}, ORDER_INDEX_FIELDS),
+]
+
+def synthetic_fetcher():
+    """Fetch response bodies from the offline fake store (fake_woocommerce_server)"""
+    from fake_woocommerce_server import FakeWooCommerceStore, create_app, API_PREFIX
+    client = create_app(FakeWooCommerceStore.synthetic(products=500, orders=500)).test_client()
+
+    def fetch(endpoint, params, fields):
+        if fields:
+            params = dict(params, _fields=fields_param(fields))
+        return client.get(f"{API_PREFIX}/{endpoint}", query_string=params).data
+
+    return fetch
+
+def live_response(endpoint, params, fields):
+    """Response body fetched from the configured store"""
+    from woocommerce_client import woocommerce
+    if fields:
+        params = dict(params, _fields=fields_param(fields))
+    response = woocommerce.wcapi.get(endpoint, params=params)
+    response.raise_for_status()
+    return response.content
+
+def parse_time_ms(body):
+    """Median json.loads time in milliseconds"""
+    timings = []
+    for _ in range(PARSE_RUNS):
+        start = time.perf_counter()
+        json.loads(body)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def run(fetch):
+    print(f"{'scenario':<26}{'full KB':>10}{'proj KB':>10}{'saved':>8}{'full ms':>10}{'proj ms':>10}")
+    for label, endpoint, params, fields in SCENARIOS:
+        full = fetch(endpoint, params, None)
+        projected = fetch(endpoint, params, fields)
+        saved = 1 - len(projected) / len(full)
+        print(f"{label:<26}{len(full) / 1024:>10.1f}{len(projected) / 1024:>10.1f}{saved:>8.0%}"
+              f"{parse_time_ms(full):>10.2f}{parse_time_ms(projected):>10.2f}")
+
+if __name__ == "__main__":
+    if "--live" in sys.argv:
+        print("Benchmarking against the configured WooCommerce store\n")
+        run(live_response)
+    else:
+        print("Benchmarking the offline fake store (use --live to query the store)\n")
+        run(synthetic_fetcher())
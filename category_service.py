@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import logging
+import threading
+from woocommerce_client import woocommerce
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('category_service')
+
+# Seconds before the indexes are rebuilt from the (cached) category list
+CATEGORY_INDEX_TTL = int(os.getenv("WC_CATEGORY_INDEX_TTL", "600"))
+# Seconds before a failed load (running on the built-in categories) is retried
+CATEGORY_RETRY_INTERVAL = 60
+
+# Known store categories, used while the store is unreachable: id -> (name, slug, parent)
+DEFAULT_CATEGORIES = {
+    132: ("Kompressoren", "kompressoren", 0),
+    86: ("Halbhermetische Kompressoren", "halbhermetische-kompressoren", 132),
+    74: ("Kältesysteme", "kaltesysteme", 0),
+    95: ("Expansionsventile", "expansionsventile", 0),
+    161: ("Thermostat", "thermostat", 0),
+    90: ("Kühlschranke", "kuhlschranke", 0),
+    94: ("Tiefkühlraumtür", "tiefkuhlraumtur", 0),
+    93: ("Klimageräte-Einheiten", "klimagerate-einheiten", 0),
+}
+
+# English and Turkish names of the store categories (keyed by slug, the store names are German)
+CATEGORY_ALIASES = {
+    "kompressoren": ["Kompressor", "compressor", "compressors", "kompresör", "kompresörler"],
+    "halbhermetische-kompressoren": ["semi-hermetic compressor", "semi-hermetic compressors",
+                                     "yarı hermetik kompresör"],
+    "kaltesysteme": ["Kältesystem", "cooling system", "refrigeration system", "soğutma sistemi"],
+    "expansionsventile": ["Expansionsventil", "expansion valve", "expansion valves", "genleşme valfi"],
+    "thermostat": ["Thermostate", "thermostats", "termostat"],
+    "kuhlschranke": ["Kühlschrank", "refrigerator", "fridge", "buzdolabı"],
+    "tiefkuhlraumtur": ["freezer room door", "cold room door", "soğuk oda kapısı"],
+    "klimagerate-einheiten": ["Klimagerät", "air conditioner", "air conditioning", "klima"],
+}
+
+# Folding applied before name lookups, so "Kältesysteme", "kaltesysteme" and "KAELTESYSTEME" meet
+_FOLD = str.maketrans({
+    'ä': 'a', 'ö': 'o', 'ü': 'u', 'ß': 'ss',
+    'ç': 'c', 'ğ': 'g', 'ı': 'i', 'ş': 's', 'â': 'a', 'î': 'i', 'û': 'u',
+})
+
+def normalize_category_name(name):
+    """
+    Normalize a category name, slug or alias for lookups
+
+    Args:
+        name (str): Name as written by a user, the store or in a slug
+
+    Returns:
+        str: Lowercase name without umlauts and punctuation
+    """
+    name = (name or "").lower()
+    # ae/oe/ue spellings of umlauts
+    name = name.replace('ae', 'a').replace('oe', 'o').replace('ue', 'u')
+    name = name.translate(_FOLD)
+    return re.sub(r'[^a-z0-9]+', ' ', name).strip()
+
+class CategoryService:
+    """
+    Product category tree of the store with constant-time lookups.
+
+    The full category list is loaded through WooCommerceClient.get_product_categories
+    (all pages, cached in the client's 'categories' tier) and turned into indexes by id,
+    slug and normalized name/alias, plus a parent -> children map. The indexes are
+    rebuilt after CATEGORY_INDEX_TTL seconds; while the store is unreachable the
+    built-in DEFAULT_CATEGORIES are served.
+    """
+    def __init__(self, client, ttl=None, store_url=None):
+        """
+        Args:
+            client: WooCommerceClient used to load the categories
+            ttl (int): Seconds before the indexes are rebuilt
+            store_url (str): Store URL used for category links
+        """
+        self.client = client
+        self.ttl = ttl or CATEGORY_INDEX_TTL
+        self.store_url = (store_url or os.getenv("WC_STORE_URL") or "https://durmusbaba.de").rstrip('/')
+        self._indexes = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _build(self, categories, source):
+        """Build the lookup indexes for a list of category records"""
+        by_id = {}
+        by_slug = {}
+        by_name = {}
+        children = {}
+        for category in categories:
+            record = {
+                'id': int(category['id']),
+                'name': category.get('name', ''),
+                'slug': category.get('slug', ''),
+                'parent': int(category.get('parent') or 0),
+                'count': category.get('count', 0),
+            }
+            by_id[record['id']] = record
+            by_slug[record['slug']] = record
+
+        for record in by_id.values():
+            children.setdefault(record['parent'], []).append(record['id'])
+            by_name.setdefault(normalize_category_name(record['name']), record)
+            by_name.setdefault(normalize_category_name(record['slug']), record)
+        # Aliases never shadow a store name
+        for record in by_id.values():
+            for alias in CATEGORY_ALIASES.get(record['slug'], []):
+                by_name.setdefault(normalize_category_name(alias), record)
+
+        return {
+            'by_id': by_id,
+            'by_slug': by_slug,
+            'by_name': by_name,
+            'children': children,
+            'source': source,
+            'built_at': time.time(),
+        }
+
+    def refresh(self):
+        """
+        Reload the categories from the store and rebuild the indexes
+
+        Returns:
+            bool: True if the categories came from the store
+        """
+        categories = []
+        try:
+            categories = self.client.get_product_categories()
+        except Exception as e:
+            logger.error(f"Error loading product categories: {e}")
+
+        if categories:
+            indexes = self._build(categories, 'store')
+            self._indexes, self._expires_at = indexes, time.time() + self.ttl
+            logger.info(f"Category index built with {len(indexes['by_id'])} categories")
+            return True
+
+        # Keep a previously loaded tree; start with the built-in categories otherwise
+        if self._indexes is None:
+            defaults = [{'id': category_id, 'name': name, 'slug': slug, 'parent': parent}
+                        for category_id, (name, slug, parent) in DEFAULT_CATEGORIES.items()]
+            self._indexes = self._build(defaults, 'default')
+        self._expires_at = time.time() + CATEGORY_RETRY_INTERVAL
+        return False
+
+    def _current(self):
+        """Current indexes, rebuilt first if they have expired"""
+        if time.time() >= self._expires_at:
+            with self._lock:
+                if time.time() >= self._expires_at:
+                    self.refresh()
+        return self._indexes
+
+    def get(self, category_id):
+        """
+        Look up a category by id
+
+        Returns:
+            dict: Category record (id, name, slug, parent, count) or None
+        """
+        try:
+            return self._current()['by_id'].get(int(category_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_by_slug(self, slug):
+        """Look up a category by slug"""
+        return self._current()['by_slug'].get(slug)
+
+    def find(self, name):
+        """
+        Look up a category by store name, slug or German/English/Turkish alias
+
+        Args:
+            name (str): e.g. "Kältesysteme", "cooling system" or "soğutma sistemi"
+
+        Returns:
+            dict: Category record or None
+        """
+        return self._current()['by_name'].get(normalize_category_name(name))
+
+    def resolve(self, value):
+        """
+        Resolve an id, slug or name to a category id
+
+        Returns:
+            int: Category id or None
+        """
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            category = self.get(value)
+        else:
+            category = self.get_by_slug(value) or self.find(value)
+        return category['id'] if category else None
+
+    def children(self, category_id):
+        """Ids of the direct subcategories of a category"""
+        return list(self._current()['children'].get(int(category_id), []))
+
+    def expand(self, category_id):
+        """
+        A category id followed by the ids of all its descendants
+
+        Args:
+            category_id (int): Category id
+
+        Returns:
+            list: Category ids (empty if the category is unknown)
+        """
+        indexes = self._current()
+        category_id = int(category_id)
+        if category_id not in indexes['by_id']:
+            return []
+        result = []
+        pending = [category_id]
+        while pending:
+            current = pending.pop()
+            if current in result:
+                continue
+            result.append(current)
+            pending.extend(indexes['children'].get(current, []))
+        return result
+
+    def ancestors(self, category_id):
+        """Ids of the parent, grandparent, ... of a category"""
+        by_id = self._current()['by_id']
+        result = []
+        category = by_id.get(int(category_id))
+        while category and category['parent'] and category['parent'] not in result:
+            result.append(category['parent'])
+            category = by_id.get(category['parent'])
+        return result
+
+    def collapse(self, category_ids):
+        """
+        Drop ids whose ancestor is also in the list
+
+        WooCommerce's category filter already includes subcategories, so searching a
+        parent and its child separately only costs an extra request.
+
+        Returns:
+            list: Remaining ids in their original order
+        """
+        ids = [int(category_id) for category_id in category_ids]
+        wanted = set(ids)
+        result = []
+        for category_id in ids:
+            if category_id in result or wanted.intersection(self.ancestors(category_id)):
+                continue
+            result.append(category_id)
+        return result
+
+    def url(self, category_id):
+        """
+        Storefront URL of a category (/product-category/<parent slugs>/<slug>/)
+
+        Returns:
+            str: URL or None if the category is unknown
+        """
+        category = self.get(category_id)
+        if not category:
+            return None
+        by_id = self._current()['by_id']
+        slugs = [by_id[parent]['slug'] for parent in reversed(self.ancestors(category['id'])) if parent in by_id]
+        slugs.append(category['slug'])
+        return f"{self.store_url}/product-category/{'/'.join(slugs)}/"
+
+    def all(self):
+        """All categories as a list of records"""
+        return list(self._current()['by_id'].values())
+
+    def info(self):
+        """Size and origin of the current indexes"""
+        indexes = self._current()
+        return {
+            'categories': len(indexes['by_id']),
+            'source': indexes['source'],
+            'built_at': indexes['built_at'],
+        }
+
+# Create a global instance
+category_service = CategoryService(woocommerce)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Snapshot file of all conversation contexts, for restarts without an external store.
+
+ConversationContext writes a snapshot periodically and at shutdown, and reads it back on
+startup. Only the header and the user index are read at startup; the file is memory-mapped
+and a user's record is decoded on their first message, so startup time does not grow
+with the number of users.
+
+File layout (version 1):
+
+    8 bytes   magic b'CTXSNAP\\0'
+    2 bytes   format version (big endian)
+    8 bytes   length of the index
+    index     pickle of {user_id: (offset, length, last_updated)}
+    records   zlib-compressed pickles of the context records, offsets relative to here
+
+Snapshots are only read from the local cache directory the bot writes itself; pickle
+must not be used for files from elsewhere.
+"""
+
+import os
+import mmap
+import zlib
+import pickle
+import struct
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('context_snapshot')
+
+SNAPSHOT_MAGIC = b'CTXSNAP\0'
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('>8sHQ')
+
+def encode_record(record):
+    """Compressed binary form of a context record"""
+    return zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+def decode_record(blob):
+    """Context record from its compressed binary form"""
+    return pickle.loads(zlib.decompress(blob))
+
+def write_snapshot(path, entries):
+    """
+    Write a snapshot file atomically (a crash leaves the previous snapshot intact)
+
+    Args:
+        path (str): Snapshot file
+        entries (iterable): (user_id, last_updated, encoded record) tuples
+
+    Returns:
+        int: Number of users written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    index = {}
+    blobs = []
+    offset = 0
+    for user_id, last_updated, blob in entries:
+        index[user_id] = (offset, len(blob), last_updated)
+        blobs.append(blob)
+        offset += len(blob)
+    index_data = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index_data)))
+        f.write(index_data)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(index)
+
+class ContextSnapshot:
+    """
+    Read side of a snapshot file: the index is loaded up front, records on demand.
+
+    A record is removed from the index once it has been loaded, because the context
+    then lives in memory and the next snapshot writes the current version.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Snapshot file; a missing, unreadable or foreign file gives an empty snapshot
+        """
+        self.path = path
+        self.index = {}
+        self._file = None
+        self._data = None
+        self._start = 0
+        if os.path.exists(path):
+            try:
+                self._open()
+            except Exception as e:
+                logger.error(f"Ignoring unreadable context snapshot {path}: {e}")
+                self.close()
+                self.index = {}
+
+    def _open(self):
+        self._file = open(self.path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size:
+            raise ValueError("file too short")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self._data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a context snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {version}")
+        self._start = _HEADER.size + index_length
+        self.index = pickle.loads(self._data[_HEADER.size:self._start])
+
+    def __len__(self):
+        return len(self.index)
+
+    def _blob(self, entry):
+        offset, length, _ = entry
+        return self._data[self._start + offset:self._start + offset + length]
+
+    def pop(self, user_id):
+        """
+        Decode and remove the record of one user
+
+        Returns:
+            dict: Record, or None if the user is not in the snapshot
+        """
+        entry = self.index.pop(user_id, None)
+        if entry is None:
+            return None
+        try:
+            return decode_record(self._blob(entry))
+        except Exception as e:
+            logger.error(f"Error decoding the snapshot record of {user_id}: {e}")
+            return None
+
+    def entries(self, cutoff=0):
+        """
+        Records not loaded yet, still encoded, for carrying over into the next snapshot
+
+        Args:
+            cutoff (float): Skip records last updated before this time
+
+        Returns:
+            list: (user_id, last_updated, encoded record) tuples
+        """
+        return [(user_id, entry[2], self._blob(entry))
+                for user_id, entry in list(self.index.items()) if entry[2] >= cutoff]
+
+    def close(self):
+        """Release the file"""
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
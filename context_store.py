@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Storage backends for conversation contexts.
+
+ConversationContext keeps the active contexts in memory and writes changed ones to a
+backend in batches (write-behind); a user that is not in memory is loaded from the
+backend on first access (read-through). Backends store one JSON record per user:
+
+    memory  nothing is stored; the in-memory contexts are the only copy (default,
+            nothing survives a restart, except through the snapshot)
+    sqlite  SQLite file in WAL mode, shared by the worker processes of one host
+    redis   any Redis-protocol server (needs the optional `redis` package)
+
+Selected with CONTEXT_STORE=memory|sqlite|redis, see create_context_store().
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('context_store')
+
+class ContextStore:
+    """
+    Interface of a context backend. Records are JSON-serialisable dicts with a
+    'last_updated' timestamp.
+    """
+    name = 'base'
+    # False for a backend that keeps nothing, so write-behind can skip serialising contexts
+    persistent = True
+
+    def load(self, user_id):
+        """
+        Load the record of one user
+
+        Returns:
+            dict: Record, or None if the user is unknown
+        """
+        raise NotImplementedError
+
+    def save_many(self, records):
+        """
+        Write several records in one batch
+
+        Args:
+            records (dict): user_id -> record
+        """
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        """Remove the record of one user"""
+        raise NotImplementedError
+
+    def purge_expired(self, cutoff):
+        """
+        Remove records last updated before cutoff
+
+        Returns:
+            int: Number of removed records
+        """
+        return 0
+
+    def count(self):
+        """Number of stored records"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections"""
+
+class MemoryContextStore(ContextStore):
+    """
+    Pass-through backend: the contexts in ConversationContext are the only copy.
+
+    A second, serialised copy of every live context in the same process would double
+    its memory use and buy nothing, since both are lost on a restart.
+    """
+    name = 'memory'
+    persistent = False
+
+    def load(self, user_id):
+        return None
+
+    def save_many(self, records):
+        pass
+
+    def delete(self, user_id):
+        pass
+
+    def count(self):
+        return 0
+
+class SQLiteContextStore(ContextStore):
+    """
+    SQLite backend in WAL mode: readers are not blocked by the write-behind flush, and
+    several worker processes on one host can share the file.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS contexts ("
+                "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_updated REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS contexts_last_updated ON contexts (last_updated)")
+            self._conn.commit()
+
+    def load(self, user_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM contexts WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, records):
+        rows = [(user_id, json.dumps(record, ensure_ascii=False), record.get('last_updated', time.time()))
+                for user_id, record in records.items()]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO contexts (user_id, data, last_updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, last_updated = excluded.last_updated",
+                    rows
+                )
+
+    def delete(self, user_id):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM contexts WHERE user_id = ?", (user_id,))
+
+    def purge_expired(self, cutoff):
+        with self._lock:
+            with self._conn:
+                return self._conn.execute("DELETE FROM contexts WHERE last_updated < ?", (cutoff,)).rowcount
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RedisContextStore(ContextStore):
+    """Redis-protocol backend; records expire on the server after the context expiration"""
+    name = 'redis'
+
+    def __init__(self, url, ttl, prefix="context:"):
+        """
+        Args:
+            url (str): Server URL, e.g. redis://localhost:6379/0
+            ttl (int): Seconds a record is kept after its last write
+            prefix (str): Key prefix
+        """
+        if redis is None:
+            raise RuntimeError("The redis package is required for CONTEXT_STORE=redis")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def load(self, user_id):
+        data = self._client.get(self.prefix + user_id)
+        return json.loads(data) if data else None
+
+    def save_many(self, records):
+        pipeline = self._client.pipeline(transaction=False)
+        for user_id, record in records.items():
+            pipeline.set(self.prefix + user_id, json.dumps(record, ensure_ascii=False), ex=self.ttl)
+        pipeline.execute()
+
+    def delete(self, user_id):
+        self._client.delete(self.prefix + user_id)
+
+    def count(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+    def close(self):
+        self._client.close()
+
+def create_context_store(expiration_hours=48):
+    """
+    Create the backend configured in the environment
+
+    CONTEXT_STORE selects the backend (memory, sqlite or redis); CONTEXT_STORE_PATH is
+    the SQLite file and CONTEXT_REDIS_URL the Redis server. An unusable backend falls
+    back to memory so the bot keeps answering.
+
+    Args:
+        expiration_hours (int): Context expiration, used as the Redis key TTL
+
+    Returns:
+        ContextStore: Backend instance
+    """
+    kind = os.getenv("CONTEXT_STORE", "memory").lower()
+    try:
+        if kind == "sqlite":
+            return SQLiteContextStore(os.getenv("CONTEXT_STORE_PATH", "cache/conversation_contexts.db"))
+        if kind == "redis":
+            return RedisContextStore(os.getenv("CONTEXT_REDIS_URL", "redis://localhost:6379/0"),
+                                     ttl=expiration_hours * 3600)
+    except Exception as e:
+        logger.error(f"Could not open the {kind} context store, using memory: {e}")
+    return MemoryContextStore()
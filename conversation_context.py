@@ -1,46 +1,498 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import re
+import os
 import json
 import time
-from datetime import datetime, timedelta
+import atexit
+import logging
+import functools
+import zlib
+import threading
+from itertools import islice
+from collections import OrderedDict, deque
+from context_store import MemoryContextStore, create_context_store
+from context_snapshot import ContextSnapshot, encode_record, write_snapshot
+from entity_extraction import analyze
+from striped_lock import StripedLock
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('conversation_context')
+
+# Maximum number of expired contexts removed per call, so a burst of expiries is spread over several calls
+CLEANUP_BATCH = 100
+# Seconds between write-behind flushes of changed contexts to the store
+CONTEXT_FLUSH_INTERVAL = float(os.getenv("CONTEXT_FLUSH_INTERVAL", "2"))
+# Seconds between removals of expired records from the store
+CONTEXT_PURGE_INTERVAL = 3600
+# Snapshot of all contexts, written periodically and at shutdown and restored on startup
+# (empty CONTEXT_SNAPSHOT_FILE disables it)
+CONTEXT_SNAPSHOT_FILE = os.getenv("CONTEXT_SNAPSHOT_FILE", "cache/conversation_contexts.snapshot")
+CONTEXT_SNAPSHOT_INTERVAL = float(os.getenv("CONTEXT_SNAPSHOT_INTERVAL", "300"))
+# Messages kept per conversation
+MESSAGE_HISTORY = 30
+# Entities kept per type; the oldest mention is dropped first
+ENTITY_LIMITS = {
+    'products': 50,
+    'categories': 20,
+    'price_ranges': 10,
+    'orders': 20,
+    'features': 10,
+}
+
+# Most recent messages kept as plain dicts; older ones are compressed in chunks
+HOT_MESSAGES = int(os.getenv("CONTEXT_HOT_MESSAGES", "6"))
+COLD_CHUNK = 8
+
+class MessageBuffer:
+    """
+    Bounded message history in two tiers; supports the list operations used by callers
+    (append, len, iteration, msgs[-1], msgs[-5:]).
+
+    The last `hot` messages stay as dicts, which is all most turns look at. Older
+    messages are moved out in chunks of COLD_CHUNK and kept zlib-compressed until the
+    full history is read (history requests, the store, snapshots). The oldest message
+    is dropped once maxlen is reached; in a compressed chunk that only advances its
+    start, the chunk is released once all its messages are dropped.
+    """
+    def __init__(self, messages=(), maxlen=MESSAGE_HISTORY, hot=HOT_MESSAGES):
+        self.maxlen = maxlen
+        self.hot = hot
+        self._hot = deque()
+        # [compressed JSON list of messages, message count, messages dropped from its start]
+        self._cold = deque()
+        self._cold_count = 0
+        # Incremented on every change, used to invalidate cached summaries
+        self.version = 0
+        for message in messages:
+            self._push(message)
+
+    def _push(self, message):
+        self._hot.append(message)
+        if len(self._hot) >= self.hot + COLD_CHUNK:
+            chunk = [self._hot.popleft() for _ in range(COLD_CHUNK)]
+            data = zlib.compress(json.dumps(chunk, ensure_ascii=False).encode('utf-8'))
+            self._cold.append([data, len(chunk), 0])
+            self._cold_count += len(chunk)
+        while len(self) > self.maxlen:
+            if not self._cold:
+                self._hot.popleft()
+                continue
+            oldest = self._cold[0]
+            oldest[2] += 1
+            self._cold_count -= 1
+            if oldest[2] == oldest[1]:
+                self._cold.popleft()
+
+    def append(self, message):
+        self._push(message)
+        self.version += 1
+
+    def _cold_messages(self):
+        """Decompress the older messages, oldest first"""
+        messages = []
+        for data, _, dropped in self._cold:
+            messages.extend(json.loads(zlib.decompress(data))[dropped:])
+        return messages
+
+    def __len__(self):
+        return len(self._hot) + self._cold_count
+
+    def __iter__(self):
+        if self._cold:
+            yield from self._cold_messages()
+        yield from self._hot
+
+    def __getitem__(self, index):
+        # Recent messages are answered from the hot tier without decompressing
+        if isinstance(index, slice):
+            if (index.start is not None and -len(self._hot) <= index.start < 0
+                    and index.stop is None and index.step is None):
+                return list(self._hot)[index]
+            return list(self)[index]
+        if -len(self._hot) <= index < 0:
+            return self._hot[index]
+        return list(self)[index]
+
+    def tail(self, count):
+        """The last `count` messages, oldest first, without copying the whole buffer"""
+        if count <= len(self._hot):
+            return list(islice(reversed(self._hot), count))[::-1]
+        return list(self)[-count:] if count else []
+
+    def __repr__(self):
+        return repr(list(self))
+
+class BoundedEntitySet:
+    """
+    Insertion-ordered entity list with constant-time dedupe and a size cap.
+
+    Behaves like the list it replaces (append, len, iteration, [-1], [-3:]), but
+    append ignores an entity whose key is already present, and the oldest entity is
+    dropped once the cap is reached. Products are keyed by name, other entities by
+    value. With refresh=True a repeated entity moves to the end instead (price
+    ranges, where the latest mention counts).
+    """
+    def __init__(self, items=(), maxlen=20, key=None, refresh=False):
+        self.maxlen = maxlen
+        self.key = key or (lambda item: item)
+        self.refresh = refresh
+        self._items = OrderedDict()
+        # Incremented on every change, used to invalidate cached summaries
+        self.version = 0
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        """
+        Add an entity unless it is already present
+
+        Returns:
+            bool: True if the entity was added (or moved to the end)
+        """
+        key = self.key(item)
+        if key in self._items:
+            if not self.refresh:
+                return False
+            self._items.move_to_end(key)
+            self._items[key] = item
+            self.version += 1
+            return True
+        self._items[key] = item
+        if len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+        self.version += 1
+        return True
+
+    add = append
+
+    def contains_key(self, key):
+        """True if an entity with this key (e.g. product name) is present"""
+        return key in self._items
+
+    def clear(self):
+        self._items.clear()
+        self.version += 1
+
+    def __contains__(self, item):
+        return self.key(item) in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._items.values())[index]
+        if index == -1 and self._items:
+            return next(reversed(self._items.values()))
+        return list(self._items.values())[index]
+
+    def __repr__(self):
+        return repr(list(self._items.values()))
+
+def _serialized(method):
+    """Run a ConversationContext method that takes a user_id under the lock of that user"""
+    @functools.wraps(method)
+    def wrapper(self, user_id, *args, **kwargs):
+        with self.locks.hold(user_id):
+            return method(self, user_id, *args, **kwargs)
+    return wrapper
 
 class ConversationContext:
     """
     Enhanced conversation context manager to improve contextual understanding
     between messages in a conversation.
+    
+    Active contexts live in memory. With a persistent store, contexts handed out by
+    get_context are marked changed (callers update them in place) and written to the
+    store in batches by a background thread (write-behind), so a message never waits
+    for the disk. A user that is not in memory, e.g. after a restart, is loaded from
+    the store (read-through). The default memory store keeps nothing, so neither happens.
+    
+    Request threads are synchronised per user with a striped lock: the public methods
+    hold the lock of their user, and request handlers that change a context in place
+    hold it through locked() for the change only, never across network calls. The shared index of contexts is only touched under a
+    short structural lock, so different users proceed in parallel.
     """
-    def __init__(self):
-        # Main storage for conversation contexts by user ID
-        self.contexts = {}
+    def __init__(self, store=None):
+        """
+        Args:
+            store (ContextStore): Backend for persistence (see context_store), memory by default
+        """
+        # Main storage for conversation contexts by user ID, ordered by last update (oldest first)
+        self.contexts = OrderedDict()
         # Expiration time for contexts (in hours)
         self.expiration_hours = 48  # Increased from 24 to 48 hours
+        self.store = store or MemoryContextStore()
+        # Users whose context changed since the last flush
+        self._dirty = set()
+        # user_id -> {kind: (revision, summary)}, see _cached_summary
+        self._summaries = {}
+        self._flush_lock = threading.Lock()
+        self._flush_thread = None
+        # Restored snapshot whose records are decoded on first access, see restore()
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+        # Per-user locks, and a short lock for the contexts index and the dirty set
+        # (always taken after a user lock, never before one)
+        self.locks = StripedLock('conversation_context')
+        self._index_lock = threading.Lock()
+    
+    def locked(self, user_id):
+        """
+        Hold the lock of a user, e.g. while changing their context in place
+        
+        Usage: with conversation_context.locked(user_id): ...
+        """
+        return self.locks.hold(user_id)
     
+    def active_users(self):
+        """User ids from least to most recently active"""
+        with self._index_lock:
+            return list(self.contexts)
+    
+    def lock_stats(self):
+        """Context count and lock contention metrics"""
+        return {
+            'contexts': len(self.contexts),
+            'store': self.store.name,
+            'user_locks': self.locks.stats(),
+        }
+    
+    def _new_entities(self, stored=None):
+        """Entity containers, optionally filled from stored lists"""
+        stored = stored or {}
+        entities = {}
+        for name, limit in ENTITY_LIMITS.items():
+            items = stored.get(name, [])
+            if name == 'products':
+                entities[name] = BoundedEntitySet(items, limit, key=lambda product: product['name'])
+            elif name == 'price_ranges':
+                entities[name] = BoundedEntitySet((tuple(price_range) for price_range in items), limit, refresh=True)
+            else:
+                entities[name] = BoundedEntitySet(items, limit)
+        return entities
+    
+    def _new_context(self):
+        """Empty context for a new user"""
+        return {
+            'last_updated': time.time(),
+            'messages': MessageBuffer(),
+            'entities': self._new_entities(),
+            'current_topic': None,
+            'last_query_type': None,
+            'product_page': 0
+        }
+    
+    def _to_record(self, context):
+        """JSON-serialisable copy of a context for the store"""
+        record = dict(context)
+        record['messages'] = list(context['messages'])
+        record['entities'] = {name: list(values) for name, values in context['entities'].items()}
+        return record
+    
+    def _from_record(self, record):
+        """Context from a stored record"""
+        context = self._new_context()
+        context.update(record)
+        context['messages'] = MessageBuffer(record.get('messages', []))
+        context['entities'] = self._new_entities(record.get('entities'))
+        return context
+    
+    def _load_context(self, user_id):
+        """Load a context from the store or the restored snapshot, or None if it is unknown or expired"""
+        try:
+            record = self.store.load(user_id)
+        except Exception as e:
+            logger.error(f"Error loading context for {user_id}: {e}")
+            record = None
+        snapshot = self._snapshot
+        if snapshot is not None:
+            # The newer of the two wins, e.g. a snapshot taken after the last store write
+            snapshot_record = snapshot.pop(user_id)
+            if snapshot_record and (not record or snapshot_record.get('last_updated', 0) > record.get('last_updated', 0)):
+                record = snapshot_record
+        if not record or record.get('last_updated', 0) < time.time() - self.expiration_hours * 3600:
+            return None
+        return self._from_record(record)
+    
+    @_serialized
     def get_context(self, user_id):
         """Get the conversation context for a user"""
         # Clean expired contexts first
         self._clean_expired_contexts()
         
-        # Initialize context if it doesn't exist
-        if user_id not in self.contexts:
-            self.contexts[user_id] = {
-                'last_updated': time.time(),
-                'messages': [],
-                'entities': {
-                    'products': [],
-                    'categories': [],
-                    'price_ranges': [],
-                    'orders': [],
-                    'features': []
-                },
-                'current_topic': None,
-                'last_query_type': None,
-                'product_page': 0
-            }
-        
-        return self.contexts[user_id]
+        with self._index_lock:
+            context = self.contexts.get(user_id)
+        
+        # Load the context from the store or initialize it if it doesn't exist
+        # (outside the index lock; the user lock keeps a second thread from loading it too)
+        if context is None:
+            context = self._load_context(user_id) or self._new_context()
+            # It joins the young end of the index, so it counts as updated now; expiry stops
+            # at the first unexpired context and relies on that order
+            context['last_updated'] = time.time()
+            with self._index_lock:
+                self.contexts[user_id] = context
+        
+        # The caller may change the context in place, so it is written back on the next flush
+        # (unless the store keeps nothing)
+        if self.store.persistent:
+            with self._index_lock:
+                self._dirty.add(user_id)
+        return context
+    
+    def flush(self):
+        """
+        Write all changed contexts to the store in one batch
+        
+        Returns:
+            int: Number of contexts written
+        """
+        with self._flush_lock:
+            with self._index_lock:
+                dirty, self._dirty = self._dirty, set()
+            records = {}
+            for user_id in dirty:
+                # A consistent copy needs the user's lock, as request threads change contexts in place
+                with self.locks.hold(user_id):
+                    with self._index_lock:
+                        context = self.contexts.get(user_id)
+                    if context is not None:
+                        records[user_id] = self._to_record(context)
+            if not records:
+                return 0
+            
+            try:
+                self.store.save_many(records)
+            except Exception as e:
+                logger.error(f"Error writing {len(records)} contexts to the {self.store.name} store: {e}")
+                with self._index_lock:
+                    self._dirty.update(records)
+                return 0
+            return len(records)
+    
+    def start_write_behind(self, interval=None):
+        """
+        Start the background thread that flushes changed contexts and purges expired records
+        
+        Args:
+            interval (float): Seconds between flushes
+        """
+        if not self.store.persistent or (self._flush_thread and self._flush_thread.is_alive()):
+            return
+        interval = interval or CONTEXT_FLUSH_INTERVAL
+        
+        def flush_loop():
+            last_purge = time.time()
+            while True:
+                time.sleep(interval)
+                self.flush()
+                if time.time() - last_purge >= CONTEXT_PURGE_INTERVAL:
+                    last_purge = time.time()
+                    try:
+                        self.store.purge_expired(time.time() - self.expiration_hours * 3600)
+                    except Exception as e:
+                        logger.error(f"Error purging expired contexts: {e}")
+        
+        self._flush_thread = threading.Thread(target=flush_loop, daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.flush)
+        logger.info(f"Writing conversation contexts to the {self.store.name} store every {interval}s")
     
+    def snapshot(self, path=None):
+        """
+        Write all contexts to the snapshot file
+        
+        Contexts restored from the previous snapshot but not used since are carried over
+        without decoding them.
+        
+        Args:
+            path (str): Snapshot file (default CONTEXT_SNAPSHOT_FILE)
+        
+        Returns:
+            int: Number of contexts written
+        """
+        path = path or CONTEXT_SNAPSHOT_FILE
+        if not path:
+            return 0
+        cutoff = time.time() - self.expiration_hours * 3600
+        with self._snapshot_lock:
+            entries = {}
+            # Carried-over records first, so a user loaded meanwhile is still found in memory below
+            if self._snapshot is not None:
+                for user_id, last_updated, blob in self._snapshot.entries(cutoff):
+                    entries[user_id] = (user_id, last_updated, blob)
+            for user_id in self.active_users():
+                with self.locks.hold(user_id):
+                    with self._index_lock:
+                        context = self.contexts.get(user_id)
+                    if context is not None:
+                        record = self._to_record(context)
+                        entries[user_id] = (user_id, record['last_updated'], encode_record(record))
+            try:
+                count = write_snapshot(path, entries.values())
+            except Exception as e:
+                logger.error(f"Error writing the context snapshot {path}: {e}")
+                return 0
+            logger.info(f"Wrote {count} conversation contexts to {path}")
+            return count
+    
+    def restore(self, path=None):
+        """
+        Open the snapshot written before the last shutdown
+        
+        Only the user index is read; each context is decoded when its user writes again.
+        
+        Args:
+            path (str): Snapshot file (default CONTEXT_SNAPSHOT_FILE)
+        
+        Returns:
+            int: Number of contexts available
+        """
+        path = path or CONTEXT_SNAPSHOT_FILE
+        if not path:
+            return 0
+        start = time.perf_counter()
+        snapshot = ContextSnapshot(path)
+        with self._snapshot_lock:
+            if self._snapshot is not None:
+                self._snapshot.close()
+            self._snapshot = snapshot
+        if len(snapshot):
+            logger.info(f"Restored {len(snapshot)} conversation contexts from {path} "
+                        f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return len(snapshot)
+    
+    def start_snapshots(self, interval=None, path=None):
+        """
+        Start the background thread that writes the snapshot, and write it at exit
+        
+        Args:
+            interval (float): Seconds between snapshots (default CONTEXT_SNAPSHOT_INTERVAL)
+            path (str): Snapshot file (default CONTEXT_SNAPSHOT_FILE)
+        """
+        path = path or CONTEXT_SNAPSHOT_FILE
+        if not path or (self._snapshot_thread and self._snapshot_thread.is_alive()):
+            return
+        interval = interval or CONTEXT_SNAPSHOT_INTERVAL
+        
+        def snapshot_loop():
+            while True:
+                time.sleep(interval)
+                self.snapshot(path)
+        
+        self._snapshot_thread = threading.Thread(target=snapshot_loop, daemon=True)
+        self._snapshot_thread.start()
+        atexit.register(self.snapshot, path)
+        logger.info(f"Writing a conversation snapshot to {path} every {interval:.0f}s and at exit")
+    
+    @_serialized
     def update_context(self, user_id, message, is_user=True):
         """
         Update the conversation context with a new message
@@ -52,39 +504,76 @@ class ConversationContext:
         """
         context = self.get_context(user_id)
         
-        # Update last updated time
+        # Update last updated time and move the user to the young end of the expiry order
         context['last_updated'] = time.time()
+        with self._index_lock:
+            self.contexts[user_id] = context
+            self.contexts.move_to_end(user_id)
         
-        # Add message to history
+        # Add message to history (the buffer keeps the last MESSAGE_HISTORY messages)
         context['messages'].append({
             'text': message,
             'timestamp': time.time(),
             'is_user': is_user
         })
         
-        # Keep only the last 30 messages (increased from 10)
-        if len(context['messages']) > 30:
-            context['messages'] = context['messages'][-30:]
-        
         # If it's a user message, extract entities and determine topic
         if is_user:
             self._extract_entities(user_id, message)
             self._determine_topic(user_id, message)
     
+    @_serialized
     def get_recent_messages(self, user_id, count=5):
         """Get the most recent messages in the conversation"""
         context = self.get_context(user_id)
-        return context['messages'][-count:] if context['messages'] else []
+        return context['messages'].tail(count)
+    
+    def get_message_count(self, user_id):
+        """Number of messages in the conversation history"""
+        return len(self.get_context(user_id)['messages'])
     
+    @_serialized
     def get_full_conversation_history(self, user_id):
         """Get the complete conversation history for a user"""
         context = self.get_context(user_id)
-        return context['messages'] if context['messages'] else []
+        return list(context['messages'])
     
-    def get_conversation_summary(self, user_id):
-        """Generate a summary of the conversation context"""
+    def _revision(self, context):
+        """
+        Cheap fingerprint of everything a summary is built from
+        
+        The message buffer and entity sets count their changes, so comparing the
+        revision tells whether a cached summary is still valid without rebuilding it.
+        """
+        entities = context['entities']
+        return (
+            id(context['messages']), context['messages'].version,
+            tuple((id(values), getattr(values, 'version', len(values))) for values in entities.values()),
+            context['current_topic'], context['last_query_type']
+        )
+    
+    def _cached_summary(self, user_id, kind, build):
+        """Return the cached summary of this kind, rebuilding it only after the context changed"""
         context = self.get_context(user_id)
+        revision = self._revision(context)
+        cached = self._summaries.setdefault(user_id, {}).get(kind)
+        if cached and cached[0] == revision:
+            return cached[1]
+        summary = build(context)
+        self._summaries[user_id][kind] = (revision, summary)
+        return summary
+    
+    @_serialized
+    def get_conversation_summary(self, user_id):
+        """
+        Generate a summary of the conversation context
         
+        The summary is cached until the context changes; treat it as read-only.
+        """
+        return self._cached_summary(user_id, 'entities', self._build_conversation_summary)
+    
+    def _build_conversation_summary(self, context):
+        """Entity summary of a context (see get_conversation_summary)"""
         summary = {
             'current_topic': context['current_topic'],
             'last_query_type': context['last_query_type'],
@@ -92,11 +581,12 @@ class ConversationContext:
             'mentioned_categories': context['entities']['categories'][-3:] if context['entities']['categories'] else [],
             'mentioned_price_ranges': context['entities']['price_ranges'][-1] if context['entities']['price_ranges'] else None,
             'mentioned_orders': context['entities']['orders'][-1] if context['entities']['orders'] else None,
-            'mentioned_features': context['entities']['features'] if context['entities']['features'] else []
+            'mentioned_features': list(context['entities']['features'])
         }
         
         return summary
     
+    @_serialized
     def get_referenced_entities(self, user_id, message):
         """
         Identify entities that might be referenced in the message
@@ -105,204 +595,69 @@ class ConversationContext:
         "Show me the second one" by identifying what "that" or "second one" refers to.
         """
         context = self.get_context(user_id)
+        references = analyze(message).references
         referenced_entities = {}
         
-        # Check for references to previously mentioned products
-        product_references = [
-            r'(?:that|this|the) product',
-            r'(?:it|that one)',
-            r'(?:the|this) (?:first|second|third|last|previous) (?:one|product|item)',
-            r'(?:mehr|weitere) (?:details|informationen)',  # German: more details/information
-            r'(?:tell me more|more information)',
-            r'(?:zeig mir|zeige) (?:das|dieses)',  # German: show me this/that
-            r'(?:daha fazla|hakkında)',  # Turkish: more about/about it
-            r'dieses produkt',  # German: this product
-            r'das produkt',  # German: the product
-            r'das erste produkt',  # German: the first product
-            r'der preis für dieses',  # German: the price for this
-            r'ist das erste',  # German: is the first
-        ]
-        
-        if any(re.search(pattern, message.lower()) for pattern in product_references) and context['entities']['products']:
-            referenced_entities['product'] = context['entities']['products'][-1]
-        
-        # Check for references to previously mentioned categories
-        category_references = [
-            r'(?:that|this|the) category',
-            r'(?:in|from) (?:that|this|the) category',
-            r'(?:diese|jene|die) kategorie',  # German
-            r'(?:bu|o|şu) kategori',  # Turkish
-            r'in dieser kategorie',  # German: in this category
-            r'aus dieser kategorie',  # German: from this category
-        ]
-        
-        if any(re.search(pattern, message.lower()) for pattern in category_references) and context['entities']['categories']:
-            referenced_entities['category'] = context['entities']['categories'][-1]
-        
-        # Check for references to previously mentioned orders
-        order_references = [
-            r'(?:that|this|the|my) order',
-            r'(?:meine|diese) bestellung',  # German
-            r'(?:siparişim|bu sipariş)',  # Turkish
-            r'diese bestellung',  # German: this order
-            r'wann wird diese bestellung',  # German: when will this order
-        ]
-        
-        if any(re.search(pattern, message.lower()) for pattern in order_references) and context['entities']['orders']:
-            referenced_entities['order'] = context['entities']['orders'][-1]
+        # Each reference resolves to the most recently mentioned entity of its type
+        for kind, entity_type in (('product', 'products'), ('category', 'categories'), ('order', 'orders')):
+            if kind in references and context['entities'][entity_type]:
+                referenced_entities[kind] = context['entities'][entity_type][-1]
         
         return referenced_entities
     
     def _extract_entities(self, user_id, message):
         """Extract entities from the message"""
         context = self.get_context(user_id)
-        
-        # Extract product mentions
-        product_patterns = [
-            r'(?:embraco|danfoss|bitzer)\s+[a-z0-9\s\-\.]{2,10}',  # Brand + model
-            r'[a-z]{2,4}\s*\d{2,5}(?:\s*[a-z]{0,5})?',  # Model patterns like "EMY 80" or "NJ 9238"
-            r'dcb\d{2,3}',  # DCB models
-            r'ff\s*\d+\.?\d*'  # FF models
-        ]
-        
-        for pattern in product_patterns:
-            matches = re.findall(pattern, message.lower())
-            if matches:
-                for match in matches:
-                    # Add to products if not already there
-                    product = {'name': match.strip(), 'mentioned_at': time.time()}
-                    if not any(p['name'] == product['name'] for p in context['entities']['products']):
-                        context['entities']['products'].append(product)
-        
-        # Extract category mentions
-        category_patterns = {
-            'kompressor': 'Kompressoren',
-            'compressor': 'Kompressoren',
-            'kältesystem': 'Kältesysteme',
-            'cooling system': 'Kältesysteme',
-            'ventil': 'Expansionsventile',
-            'valve': 'Expansionsventile',
-            'thermostat': 'Thermostat',
-            'kühlschrank': 'Kühlschranke',
-            'refrigerator': 'Kühlschranke',
-            'tür': 'Tiefkühlraumtür',
-            'door': 'Tiefkühlraumtür',
-            'klimagerät': 'Klimageräte-Einheiten',
-            'air conditioner': 'Klimageräte-Einheiten'
-        }
-        
-        for keyword, category in category_patterns.items():
-            if keyword in message.lower():
-                if category not in context['entities']['categories']:
-                    context['entities']['categories'].append(category)
-        
-        # Extract price ranges
-        price_patterns = [
-            r'(?:unter|weniger\sals|bis\szu)\s(\d+)(?:\s?€|\s?euro)?',  # under X€
-            r'(?:zwischen|von)\s(\d+)(?:\s?€|\s?euro)?\s(?:bis|und|to)\s(\d+)(?:\s?€|\s?euro)?',  # between X€ and Y€
-            r'(?:under|less\sthan|up\sto)\s(\d+)(?:\s?€|\s?euro)?',  # under X€
-            r'(?:between)\s(\d+)(?:\s?€|\s?euro)?\s(?:and|to)\s(\d+)(?:\s?€|\s?euro)?',  # between X€ and Y€
-        ]
-        
-        for pattern in price_patterns:
-            match = re.search(pattern, message.lower())
-            if match:
-                if len(match.groups()) == 1:
-                    # Under X€
-                    price_range = (0, int(match.group(1)))
-                    context['entities']['price_ranges'].append(price_range)
-                elif len(match.groups()) == 2:
-                    # Between X€ and Y€
-                    price_range = (int(match.group(1)), int(match.group(2)))
-                    context['entities']['price_ranges'].append(price_range)
-        
-        # Extract order numbers
-        order_patterns = [
-            r'#(\d{4,})',  # #1234
-            r'order\s+(\d{4,})',  # order 1234
-            r'bestellung\s+(\d{4,})',  # bestellung 1234
-            r'auftrag\s+(\d{4,})',  # auftrag 1234
-            r'sipariş\s+(\d{4,})'  # sipariş 1234
-        ]
-        
-        for pattern in order_patterns:
-            match = re.search(pattern, message.lower())
-            if match:
-                order_number = match.group(1)
-                if order_number not in context['entities']['orders']:
-                    context['entities']['orders'].append(order_number)
-        
-        # Extract product features
-        feature_patterns = {
-            r'(?:leise|geräuscharm|quiet|low\snoise|sessiz)': 'quiet',
-            r'(?:energieeffizient|sparsam|energy.efficient|efficient|enerji\sverimli)': 'energy-efficient',
-            r'(?:kompakt|klein|compact|small|küçük)': 'compact',
-            r'(?:leistungsstark|stark|powerful|strong|güçlü)': 'powerful'
-        }
-        
-        for pattern, feature in feature_patterns.items():
-            if re.search(pattern, message.lower()):
-                if feature not in context['entities']['features']:
-                    context['entities']['features'].append(feature)
+        entities = context['entities']
+        analysis = analyze(message)
+        
+        # Add products and the other entities if not already there
+        now = time.time()
+        for name in analysis.products:
+            entities['products'].add({'name': name, 'mentioned_at': now})
+        for category in analysis.categories:
+            entities['categories'].add(category)
+        for price_range in analysis.price_ranges:
+            entities['price_ranges'].append(price_range)
+        for order_number in analysis.orders:
+            entities['orders'].add(order_number)
+        for feature in analysis.features:
+            entities['features'].add(feature)
     
     def _determine_topic(self, user_id, message):
         """Determine the current topic of conversation"""
         context = self.get_context(user_id)
+        topic = analyze(message).topic
         
-        # Topic detection patterns
-        topic_patterns = {
-            'product_info': [
-                r'(?:preis|kosten|price|cost|fiyat)',
-                r'(?:kompressor|compressor|kompresör)',
-                r'(?:produkt|product|ürün)',
-                r'(?:modell|model|typ|type)',
-                r'(?:embraco|danfoss|bitzer|secop|copeland|tecumseh)'
-            ],
-            'order_status': [
-                r'(?:bestellung|auftrag|order|sipariş)',
-                r'(?:status|zustand|durum)',
-                r'(?:lieferung|versand|delivery|shipping|teslimat)',
-                r'(?:wann|when|ne zaman)'
-            ],
-            'sales_inquiry': [
-                r'(?:empfehlen|recommend|öner)',
-                r'(?:angebot|offer|teklif)',
-                r'(?:suche|looking for|arıyorum)',
-                r'(?:kaufen|bestellen|buy|order|satın|sipariş)'
-            ],
-            'support': [
-                r'(?:hilfe|help|yardım)',
-                r'(?:problem|issue|sorun)',
-                r'(?:kontakt|contact|iletişim)',
-                r'(?:frage|question|soru)'
-            ]
-        }
-        
-        # Determine the topic based on patterns
-        for topic, patterns in topic_patterns.items():
-            if any(re.search(pattern, message.lower()) for pattern in patterns):
-                context['current_topic'] = topic
-                context['last_query_type'] = topic
-                return
+        if topic:
+            context['current_topic'] = topic
+            context['last_query_type'] = topic
+            return
         
         # If no topic is detected, keep the previous topic
         if not context['current_topic']:
             context['current_topic'] = 'general'
     
     def _clean_expired_contexts(self):
-        """Remove expired conversation contexts"""
-        current_time = time.time()
-        expired_ids = []
-        
-        for user_id, context in self.contexts.items():
-            last_updated = context['last_updated']
-            expiration_time = last_updated + (self.expiration_hours * 3600)
-            
-            if current_time > expiration_time:
-                expired_ids.append(user_id)
+        """
+        Remove expired conversation contexts
         
-        for user_id in expired_ids:
-            del self.contexts[user_id]
+        Contexts are kept in last-update order, so only the oldest entries need to be
+        looked at: the loop stops at the first context that has not expired. Each call
+        removes at most CLEANUP_BATCH contexts, which keeps the cost per call constant.
+        """
+        cutoff = time.time() - self.expiration_hours * 3600
+        
+        with self._index_lock:
+            for _ in range(CLEANUP_BATCH):
+                if not self.contexts:
+                    return
+                user_id, context = next(iter(self.contexts.items()))
+                if context['last_updated'] >= cutoff:
+                    return
+                del self.contexts[user_id]
+                self._dirty.discard(user_id)
+                self._summaries.pop(user_id, None)
 
     def detect_context_reference(self, user_id, message):
         """
@@ -315,54 +670,26 @@ class ConversationContext:
         Returns:
             bool: True if the message appears to reference past conversation
         """
-        # General reference patterns
-        general_reference_patterns = [
-            r'(?:as|like|what)\s+(?:i|we)\s+(?:said|mentioned|discussed|talked|spoke)\s+(?:before|earlier|previously)',
-            r'(?:regarding|about|concerning)\s+(?:what|the\s+thing)\s+(?:we|you)\s+(?:discussed|talked|mentioned)\s+(?:before|earlier|previously)',
-            r'(?:wie|was)\s+(?:ich|wir)\s+(?:gesagt|erwähnt|besprochen)\s+(?:habe|haben|vorhin|früher)',  # German
-            r'(?:bezüglich|über)\s+(?:was|das)\s+(?:wir|du|Sie)\s+(?:besprochen|erwähnt)\s+(?:haben|vorhin|früher)',  # German
-            r'(?:daha\s+önce|geçen)\s+(?:söylediğim|konuştuğumuz|bahsettiğim)\s+(?:gibi|şey)',  # Turkish
-            r'(?:zurück\s+zu|nochmal\s+zu)\s+(?:unserem|dem)\s+(?:gespräch|thema)',  # German: back to our conversation/topic
-            r'(?:let\'s|going)\s+(?:get|go)\s+(?:back|return)\s+(?:to|on)\s+(?:our|the)\s+(?:conversation|topic|discussion)',
-            r'(?:earlier|previous|last)\s+(?:conversation|chat|message)',
-            r'(?:vorherige|frühere|letzte)\s+(?:unterhaltung|nachricht|konversation)',  # German
-        ]
-        
-        # Check if any pattern matches
-        if any(re.search(pattern, message.lower()) for pattern in general_reference_patterns):
-            return True
-            
-        # Check for short responses that might need context
-        # These are typically short questions or statements that don't make sense without context
-        short_response_with_context_patterns = [
-            r'^(?:why|how|when|what|where|who)\s+(?:is|are|was|were|do|does|did|would|could|should|will)\s+(?:it|that|this|they|those|these)',
-            r'^(?:warum|wie|wann|was|wo|wer)\s+(?:ist|sind|war|waren|tut|macht|tat|würde|könnte|sollte|wird)\s+(?:es|das|dies|sie|jene|diese)',  # German
-            r'^(?:neden|nasıl|ne\s+zaman|ne|nerede|kim)\s+(?:dir|dır|midir|mıdır|oldu|yapıyor|yaptı|yapacak)\s+(?:o|bu|şu|onlar|bunlar)',  # Turkish
-            r'^(?:ja|nein|yes|no|evet|hayır)\s*[.?!]?$',  # Just yes/no answers
-            r'^(?:und|and|ve)\s+(?:dann|jetzt|now|then|sonra|şimdi)',  # And then/now
-            r'^(?:ich\s+verstehe|i\s+understand|anlıyorum)\s*[.?!]?$',  # I understand
-            r'^(?:das\s+ist|that\'s|it\'s|bu)\s+(?:gut|richtig|korrekt|good|right|correct|iyi|doğru)',  # That's good/right
-        ]
-        
-        # For short messages, check if they might need context
-        if len(message.split()) < 5:
-            if any(re.search(pattern, message.lower()) for pattern in short_response_with_context_patterns):
-                return True
-                
-        return False
+        return analyze(message).context_reference
 
+    @_serialized
     def summarize_conversation(self, user_id):
         """
         Generate a summary of the conversation when it gets too long.
         This helps maintain context without sending the entire conversation history.
         
+        The text is built only when asked for and cached until the context changes.
+        
         Args:
             user_id (str): User identifier
             
         Returns:
             str: A summary of the conversation
         """
-        context = self.get_context(user_id)
+        return self._cached_summary(user_id, 'text', self._build_summary_text)
+    
+    def _build_summary_text(self, context):
+        """Text summary of a context (see summarize_conversation)"""
         messages = context['messages']
         
         # If we don't have enough messages, no need to summarize
@@ -409,7 +736,7 @@ class ConversationContext:
         summary += "- Recent conversation points:\n"
         
         # Get the last 5 messages (excluding the current one)
-        recent_messages = messages[-6:-1] if len(messages) > 5 else messages[:-1]
+        recent_messages = messages.tail(6)[:-1]
         
         for msg in recent_messages:
             role = "User" if msg['is_user'] else "Bot"
@@ -422,7 +749,7 @@ class ConversationContext:
         return summary
 
 # Create a singleton instance
-conversation_context = ConversationContext()
+conversation_context = ConversationContext(store=create_context_store())
 
 def test_conversation_context():
     """Test the conversation context functionality"""
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Single-pass entity, topic and reference extraction for conversation messages.
+
+analyze() lowercases a message once and runs precompiled patterns: the pattern lists
+of each kind (topic, reference, feature) are merged into one alternation, and the
+category keywords into one keyword matcher. The result carries everything
+ConversationContext needs (entities, topic, reference flags) and is cached per message
+text, because one incoming message is analysed by several callers.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+# Product mentions: brand + model, model patterns like "EMY 80" or "NJ 9238", DCB and FF models
+PRODUCT_PATTERNS = [
+    r'(?:embraco|danfoss|bitzer)\s+[a-z0-9\s\-\.]{2,10}',
+    r'[a-z]{2,4}\s*\d{2,5}(?:\s*[a-z]{0,5})?',
+    r'dcb\d{2,3}',
+    r'ff\s*\d+\.?\d*'
+]
+
+# Keyword -> store category
+CATEGORY_KEYWORDS = {
+    'kompressor': 'Kompressoren',
+    'compressor': 'Kompressoren',
+    'kältesystem': 'Kältesysteme',
+    'cooling system': 'Kältesysteme',
+    'ventil': 'Expansionsventile',
+    'valve': 'Expansionsventile',
+    'thermostat': 'Thermostat',
+    'kühlschrank': 'Kühlschranke',
+    'refrigerator': 'Kühlschranke',
+    'tür': 'Tiefkühlraumtür',
+    'door': 'Tiefkühlraumtür',
+    'klimagerät': 'Klimageräte-Einheiten',
+    'air conditioner': 'Klimageräte-Einheiten'
+}
+
+# One group: "under X", two groups: "between X and Y"
+PRICE_PATTERNS = [
+    r'(?:unter|weniger\sals|bis\szu)\s(\d+)(?:\s?€|\s?euro)?',
+    r'(?:zwischen|von)\s(\d+)(?:\s?€|\s?euro)?\s(?:bis|und|to)\s(\d+)(?:\s?€|\s?euro)?',
+    r'(?:under|less\sthan|up\sto)\s(\d+)(?:\s?€|\s?euro)?',
+    r'(?:between)\s(\d+)(?:\s?€|\s?euro)?\s(?:and|to)\s(\d+)(?:\s?€|\s?euro)?',
+]
+
+ORDER_PATTERNS = [
+    r'#(\d{4,})',
+    r'order\s+(\d{4,})',
+    r'bestellung\s+(\d{4,})',
+    r'auftrag\s+(\d{4,})',
+    r'sipariş\s+(\d{4,})'
+]
+
+FEATURE_PATTERNS = {
+    'quiet': r'(?:leise|geräuscharm|quiet|low\snoise|sessiz)',
+    'energy-efficient': r'(?:energieeffizient|sparsam|energy.efficient|efficient|enerji\sverimli)',
+    'compact': r'(?:kompakt|klein|compact|small|küçük)',
+    'powerful': r'(?:leistungsstark|stark|powerful|strong|güçlü)'
+}
+
+# The first topic with a matching pattern wins
+TOPIC_PATTERNS = {
+    'product_info': [
+        r'(?:preis|kosten|price|cost|fiyat)',
+        r'(?:kompressor|compressor|kompresör)',
+        r'(?:produkt|product|ürün)',
+        r'(?:modell|model|typ|type)',
+        r'(?:embraco|danfoss|bitzer|secop|copeland|tecumseh)'
+    ],
+    'order_status': [
+        r'(?:bestellung|auftrag|order|sipariş)',
+        r'(?:status|zustand|durum)',
+        r'(?:lieferung|versand|delivery|shipping|teslimat)',
+        r'(?:wann|when|ne zaman)'
+    ],
+    'sales_inquiry': [
+        r'(?:empfehlen|recommend|öner)',
+        r'(?:angebot|offer|teklif)',
+        r'(?:suche|looking for|arıyorum)',
+        r'(?:kaufen|bestellen|buy|order|satın|sipariş)'
+    ],
+    'support': [
+        r'(?:hilfe|help|yardım)',
+        r'(?:problem|issue|sorun)',
+        r'(?:kontakt|contact|iletişim)',
+        r'(?:frage|question|soru)'
+    ]
+}
+
+# References to a previously mentioned product, category or order ("that product", "diese Bestellung")
+REFERENCE_PATTERNS = {
+    'product': [
+        r'(?:that|this|the) product',
+        r'(?:it|that one)',
+        r'(?:the|this) (?:first|second|third|last|previous) (?:one|product|item)',
+        r'(?:mehr|weitere) (?:details|informationen)',  # German: more details/information
+        r'(?:tell me more|more information)',
+        r'(?:zeig mir|zeige) (?:das|dieses)',  # German: show me this/that
+        r'(?:daha fazla|hakkında)',  # Turkish: more about/about it
+        r'dieses produkt',  # German: this product
+        r'das produkt',  # German: the product
+        r'das erste produkt',  # German: the first product
+        r'der preis für dieses',  # German: the price for this
+        r'ist das erste',  # German: is the first
+    ],
+    'category': [
+        r'(?:that|this|the) category',
+        r'(?:in|from) (?:that|this|the) category',
+        r'(?:diese|jene|die) kategorie',  # German
+        r'(?:bu|o|şu) kategori',  # Turkish
+        r'in dieser kategorie',  # German: in this category
+        r'aus dieser kategorie',  # German: from this category
+    ],
+    'order': [
+        r'(?:that|this|the|my) order',
+        r'(?:meine|diese) bestellung',  # German
+        r'(?:siparişim|bu sipariş)',  # Turkish
+        r'diese bestellung',  # German: this order
+        r'wann wird diese bestellung',  # German: when will this order
+    ],
+}
+
+# General references to the earlier conversation ("as I mentioned before")
+GENERAL_REFERENCE_PATTERNS = [
+    r'(?:as|like|what)\s+(?:i|we)\s+(?:said|mentioned|discussed|talked|spoke)\s+(?:before|earlier|previously)',
+    r'(?:regarding|about|concerning)\s+(?:what|the\s+thing)\s+(?:we|you)\s+(?:discussed|talked|mentioned)\s+(?:before|earlier|previously)',
+    r'(?:wie|was)\s+(?:ich|wir)\s+(?:gesagt|erwähnt|besprochen)\s+(?:habe|haben|vorhin|früher)',  # German
+    r'(?:bezüglich|über)\s+(?:was|das)\s+(?:wir|du|Sie)\s+(?:besprochen|erwähnt)\s+(?:haben|vorhin|früher)',  # German
+    r'(?:daha\s+önce|geçen)\s+(?:söylediğim|konuştuğumuz|bahsettiğim)\s+(?:gibi|şey)',  # Turkish
+    r'(?:zurück\s+zu|nochmal\s+zu)\s+(?:unserem|dem)\s+(?:gespräch|thema)',  # German: back to our conversation/topic
+    r'(?:let\'s|going)\s+(?:get|go)\s+(?:back|return)\s+(?:to|on)\s+(?:our|the)\s+(?:conversation|topic|discussion)',
+    r'(?:earlier|previous|last)\s+(?:conversation|chat|message)',
+    r'(?:vorherige|frühere|letzte)\s+(?:unterhaltung|nachricht|konversation)',  # German
+]
+
+# Short replies that only make sense with the conversation before them (messages under 5 words)
+SHORT_REPLY_PATTERNS = [
+    r'^(?:why|how|when|what|where|who)\s+(?:is|are|was|were|do|does|did|would|could|should|will)\s+(?:it|that|this|they|those|these)',
+    r'^(?:warum|wie|wann|was|wo|wer)\s+(?:ist|sind|war|waren|tut|macht|tat|würde|könnte|sollte|wird)\s+(?:es|das|dies|sie|jene|diese)',  # German
+    r'^(?:neden|nasıl|ne\s+zaman|ne|nerede|kim)\s+(?:dir|dır|midir|mıdır|oldu|yapıyor|yaptı|yapacak)\s+(?:o|bu|şu|onlar|bunlar)',  # Turkish
+    r'^(?:ja|nein|yes|no|evet|hayır)\s*[.?!]?$',  # Just yes/no answers
+    r'^(?:und|and|ve)\s+(?:dann|jetzt|now|then|sonra|şimdi)',  # And then/now
+    r'^(?:ich\s+verstehe|i\s+understand|anlıyorum)\s*[.?!]?$',  # I understand
+    r'^(?:das\s+ist|that\'s|it\'s|bu)\s+(?:gut|richtig|korrekt|good|right|correct|iyi|doğru)',  # That's good/right
+]
+
+class MessageAnalysis(NamedTuple):
+    """Everything extracted from one message (immutable, so it can be cached)"""
+    products: Tuple[str, ...]
+    categories: Tuple[str, ...]
+    price_ranges: Tuple[Tuple[int, int], ...]
+    orders: Tuple[str, ...]
+    features: Tuple[str, ...]
+    topic: Optional[str]
+    references: frozenset
+    context_reference: bool
+
+class KeywordMatcher:
+    """
+    Finds which of a set of keywords occur anywhere in a text with one regex scan.
+
+    A lookahead alternation (longest keywords first) reports the keyword starting at
+    every position, so overlapping keywords are found too; a keyword that is only found
+    inside a longer matched keyword is added from a precomputed containment table.
+    """
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in ordered) + '))')
+        self._contained = {
+            keyword: [other for other in self.keywords if other != keyword and other in keyword]
+            for keyword in self.keywords
+        }
+
+    def find(self, text):
+        """
+        Returns:
+            set: Keywords occurring in text
+        """
+        found = set(self._pattern.findall(text))
+        for keyword in list(found):
+            found.update(self._contained[keyword])
+        return found
+
+def _alternation(patterns):
+    """Compile a list of patterns into one regex matching if any of them matches"""
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+_PRODUCT_RES = [re.compile(pattern) for pattern in PRODUCT_PATTERNS]
+_CATEGORY_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS)
+_PRICE_RES = [re.compile(pattern) for pattern in PRICE_PATTERNS]
+_ORDER_RES = [re.compile(pattern) for pattern in ORDER_PATTERNS]
+_FEATURE_RES = [(feature, re.compile(pattern)) for feature, pattern in FEATURE_PATTERNS.items()]
+_TOPIC_RES = [(topic, _alternation(patterns)) for topic, patterns in TOPIC_PATTERNS.items()]
+_REFERENCE_RES = [(kind, _alternation(patterns)) for kind, patterns in REFERENCE_PATTERNS.items()]
+_GENERAL_REFERENCE_RE = _alternation(GENERAL_REFERENCE_PATTERNS)
+_SHORT_REPLY_RE = _alternation(SHORT_REPLY_PATTERNS)
+
+def _dedupe(values):
+    """Unique values in first-seen order"""
+    return tuple(dict.fromkeys(values))
+
+def _price_range(match):
+    """(min, max) from an "under X" or "between X and Y" match"""
+    if len(match.groups()) == 1:
+        return (0, int(match.group(1)))
+    return (int(match.group(1)), int(match.group(2)))
+
+@lru_cache(maxsize=1024)
+def analyze(message):
+    """
+    Extract entities, topic and reference flags from a message in one pass
+
+    Args:
+        message (str): Message text
+
+    Returns:
+        MessageAnalysis: Extraction result
+    """
+    text = message.lower()
+
+    products = _dedupe(match.strip() for regex in _PRODUCT_RES for match in regex.findall(text))
+    found_keywords = _CATEGORY_MATCHER.find(text)
+    categories = _dedupe(category for keyword, category in CATEGORY_KEYWORDS.items() if keyword in found_keywords)
+    price_ranges = tuple(_price_range(match) for match in (regex.search(text) for regex in _PRICE_RES) if match)
+    orders = _dedupe(match.group(1) for match in (regex.search(text) for regex in _ORDER_RES) if match)
+    features = tuple(feature for feature, regex in _FEATURE_RES if regex.search(text))
+    topic = next((topic for topic, regex in _TOPIC_RES if regex.search(text)), None)
+    references = frozenset(kind for kind, regex in _REFERENCE_RES if regex.search(text))
+    context_reference = bool(_GENERAL_REFERENCE_RE.search(text)) or (
+        len(message.split()) < 5 and bool(_SHORT_REPLY_RE.search(text))
+    )
+
+    return MessageAnalysis(products, categories, price_ranges, orders, features, topic, references, context_reference)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Sample messages and the original extraction logic, shared by test_entity_extraction.py
+and benchmark_entity_extraction.py.
+
+analyze_baseline() is the pattern-by-pattern extraction ConversationContext did before
+entity_extraction.analyze() replaced it (_extract_entities, _determine_topic,
+get_referenced_entities and detect_context_reference), with its own copy of the
+original patterns. It is not used by the bot.
+"""
+
+import re
+from entity_extraction import MessageAnalysis
+
+MESSAGES = [
+    "Hallo, ich suche einen Embraco Kompressor",
+    "Ich brauche etwas leises und energieeffizientes",
+    "Haben Sie Embraco NJ 9238 unter 400 Euro?",
+    "Können Sie mir mehr über dieses Produkt erzählen?",
+    "Zeigen Sie mir Kompressoren zwischen 100 und 300 Euro",
+    "Wo ist meine Bestellung #12345?",
+    "Wann wird diese Bestellung geliefert?",
+    "Do you have a quiet compressor between 200 and 500 euro? order 98765",
+    "Gibt es in dieser Kategorie etwas unter 500 Euro?",
+    "as I mentioned before, the DCB31 thermostat",
+    "yes",
+    "why is it so expensive",
+    "Bu kategoride sessiz kompresör var mı? sipariş 45678",
+    "Kühlschranktür und Klimagerät für FF 8.5 HBK",
+    "air conditioner with door valve",
+]
+
+def analyze_baseline(message):
+    """
+    Extract entities, topic and reference flags the way the context manager originally did
+
+    Args:
+        message (str): Message text
+
+    Returns:
+        MessageAnalysis: Extraction result
+    """
+    products = []
+    product_patterns = [
+        r'(?:embraco|danfoss|bitzer)\s+[a-z0-9\s\-\.]{2,10}',  # Brand + model
+        r'[a-z]{2,4}\s*\d{2,5}(?:\s*[a-z]{0,5})?',  # Model patterns like "EMY 80" or "NJ 9238"
+        r'dcb\d{2,3}',  # DCB models
+        r'ff\s*\d+\.?\d*'  # FF models
+    ]
+    for pattern in product_patterns:
+        for match in re.findall(pattern, message.lower()):
+            if match.strip() not in products:
+                products.append(match.strip())
+
+    categories = []
+    category_patterns = {
+        'kompressor': 'Kompressoren',
+        'compressor': 'Kompressoren',
+        'kältesystem': 'Kältesysteme',
+        'cooling system': 'Kältesysteme',
+        'ventil': 'Expansionsventile',
+        'valve': 'Expansionsventile',
+        'thermostat': 'Thermostat',
+        'kühlschrank': 'Kühlschranke',
+        'refrigerator': 'Kühlschranke',
+        'tür': 'Tiefkühlraumtür',
+        'door': 'Tiefkühlraumtür',
+        'klimagerät': 'Klimageräte-Einheiten',
+        'air conditioner': 'Klimageräte-Einheiten'
+    }
+    for keyword, category in category_patterns.items():
+        if keyword in message.lower() and category not in categories:
+            categories.append(category)
+
+    price_ranges = []
+    price_patterns = [
+        r'(?:unter|weniger\sals|bis\szu)\s(\d+)(?:\s?€|\s?euro)?',  # under X€
+        r'(?:zwischen|von)\s(\d+)(?:\s?€|\s?euro)?\s(?:bis|und|to)\s(\d+)(?:\s?€|\s?euro)?',  # between X€ and Y€
+        r'(?:under|less\sthan|up\sto)\s(\d+)(?:\s?€|\s?euro)?',  # under X€
+        r'(?:between)\s(\d+)(?:\s?€|\s?euro)?\s(?:and|to)\s(\d+)(?:\s?€|\s?euro)?',  # between X€ and Y€
+    ]
+    for pattern in price_patterns:
+        match = re.search(pattern, message.lower())
+        if match:
+            if len(match.groups()) == 1:
+                price_ranges.append((0, int(match.group(1))))
+            elif len(match.groups()) == 2:
+                price_ranges.append((int(match.group(1)), int(match.group(2))))
+
+    orders = []
+    order_patterns = [
+        r'#(\d{4,})',  # #1234
+        r'order\s+(\d{4,})',  # order 1234
+        r'bestellung\s+(\d{4,})',  # bestellung 1234
+        r'auftrag\s+(\d{4,})',  # auftrag 1234
+        r'sipariş\s+(\d{4,})'  # sipariş 1234
+    ]
+    for pattern in order_patterns:
+        match = re.search(pattern, message.lower())
+        if match and match.group(1) not in orders:
+            orders.append(match.group(1))
+
+    features = []
+    feature_patterns = {
+        r'(?:leise|geräuscharm|quiet|low\snoise|sessiz)': 'quiet',
+        r'(?:energieeffizient|sparsam|energy.efficient|efficient|enerji\sverimli)': 'energy-efficient',
+        r'(?:kompakt|klein|compact|small|küçük)': 'compact',
+        r'(?:leistungsstark|stark|powerful|strong|güçlü)': 'powerful'
+    }
+    for pattern, feature in feature_patterns.items():
+        if re.search(pattern, message.lower()) and feature not in features:
+            features.append(feature)
+
+    topic = None
+    topic_patterns = {
+        'product_info': [
+            r'(?:preis|kosten|price|cost|fiyat)',
+            r'(?:kompressor|compressor|kompresör)',
+            r'(?:produkt|product|ürün)',
+            r'(?:modell|model|typ|type)',
+            r'(?:embraco|danfoss|bitzer|secop|copeland|tecumseh)'
+        ],
+        'order_status': [
+            r'(?:bestellung|auftrag|order|sipariş)',
+            r'(?:status|zustand|durum)',
+            r'(?:lieferung|versand|delivery|shipping|teslimat)',
+            r'(?:wann|when|ne zaman)'
+        ],
+        'sales_inquiry': [
+            r'(?:empfehlen|recommend|öner)',
+            r'(?:angebot|offer|teklif)',
+            r'(?:suche|looking for|arıyorum)',
+            r'(?:kaufen|bestellen|buy|order|satın|sipariş)'
+        ],
+        'support': [
+            r'(?:hilfe|help|yardım)',
+            r'(?:problem|issue|sorun)',
+            r'(?:kontakt|contact|iletişim)',
+            r'(?:frage|question|soru)'
+        ]
+    }
+    for name, patterns in topic_patterns.items():
+        if any(re.search(pattern, message.lower()) for pattern in patterns):
+            topic = name
+            break
+
+    reference_patterns = {
+        'product': [
+            r'(?:that|this|the) product',
+            r'(?:it|that one)',
+            r'(?:the|this) (?:first|second|third|last|previous) (?:one|product|item)',
+            r'(?:mehr|weitere) (?:details|informationen)',  # German: more details/information
+            r'(?:tell me more|more information)',
+            r'(?:zeig mir|zeige) (?:das|dieses)',  # German: show me this/that
+            r'(?:daha fazla|hakkında)',  # Turkish: more about/about it
+            r'dieses produkt',  # German: this product
+            r'das produkt',  # German: the product
+            r'das erste produkt',  # German: the first product
+            r'der preis für dieses',  # German: the price for this
+            r'ist das erste',  # German: is the first
+        ],
+        'category': [
+            r'(?:that|this|the) category',
+            r'(?:in|from) (?:that|this|the) category',
+            r'(?:diese|jene|die) kategorie',  # German
+            r'(?:bu|o|şu) kategori',  # Turkish
+            r'in dieser kategorie',  # German: in this category
+            r'aus dieser kategorie',  # German: from this category
+        ],
+        'order': [
+            r'(?:that|this|the|my) order',
+            r'(?:meine|diese) bestellung',  # German
+            r'(?:siparişim|bu sipariş)',  # Turkish
+            r'diese bestellung',  # German: this order
+            r'wann wird diese bestellung',  # German: when will this order
+        ],
+    }
+    references = frozenset(kind for kind, patterns in reference_patterns.items()
+                           if any(re.search(pattern, message.lower()) for pattern in patterns))
+
+    general_reference_patterns = [
+        r'(?:as|like|what)\s+(?:i|we)\s+(?:said|mentioned|discussed|talked|spoke)\s+(?:before|earlier|previously)',
+        r'(?:regarding|about|concerning)\s+(?:what|the\s+thing)\s+(?:we|you)\s+(?:discussed|talked|mentioned)\s+(?:before|earlier|previously)',
+        r'(?:wie|was)\s+(?:ich|wir)\s+(?:gesagt|erwähnt|besprochen)\s+(?:habe|haben|vorhin|früher)',  # German
+        r'(?:bezüglich|über)\s+(?:was|das)\s+(?:wir|du|Sie)\s+(?:besprochen|erwähnt)\s+(?:haben|vorhin|früher)',  # German
+        r'(?:daha\s+önce|geçen)\s+(?:söylediğim|konuştuğumuz|bahsettiğim)\s+(?:gibi|şey)',  # Turkish
+        r'(?:zurück\s+zu|nochmal\s+zu)\s+(?:unserem|dem)\s+(?:gespräch|thema)',  # German: back to our conversation/topic
+        r'(?:let\'s|going)\s+(?:get|go)\s+(?:back|return)\s+(?:to|on)\s+(?:our|the)\s+(?:conversation|topic|discussion)',
+        r'(?:earlier|previous|last)\s+(?:conversation|chat|message)',
+        r'(?:vorherige|frühere|letzte)\s+(?:unterhaltung|nachricht|konversation)',  # German
+    ]
+    short_response_with_context_patterns = [
+        r'^(?:why|how|when|what|where|who)\s+(?:is|are|was|were|do|does|did|would|could|should|will)\s+(?:it|that|this|they|those|these)',
+        r'^(?:warum|wie|wann|was|wo|wer)\s+(?:ist|sind|war|waren|tut|macht|tat|würde|könnte|sollte|wird)\s+(?:es|das|dies|sie|jene|diese)',  # German
+        r'^(?:neden|nasıl|ne\s+zaman|ne|nerede|kim)\s+(?:dir|dır|midir|mıdır|oldu|yapıyor|yaptı|yapacak)\s+(?:o|bu|şu|onlar|bunlar)',  # Turkish
+        r'^(?:ja|nein|yes|no|evet|hayır)\s*[.?!]?$',  # Just yes/no answers
+        r'^(?:und|and|ve)\s+(?:dann|jetzt|now|then|sonra|şimdi)',  # And then/now
+        r'^(?:ich\s+verstehe|i\s+understand|anlıyorum)\s*[.?!]?$',  # I understand
+        r'^(?:das\s+ist|that\'s|it\'s|bu)\s+(?:gut|richtig|korrekt|good|right|correct|iyi|doğru)',  # That's good/right
+    ]
+    context_reference = any(re.search(pattern, message.lower()) for pattern in general_reference_patterns) or (
+        len(message.split()) < 5
+        and any(re.search(pattern, message.lower()) for pattern in short_response_with_context_patterns)
+    )
+
+    return MessageAnalysis(tuple(products), tuple(categories), tuple(price_ranges), tuple(orders),
+                           tuple(features), topic, references, context_reference)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Offline stand-in for the WooCommerce REST API (wc/v3) for tests and load benchmarks.
+
+Serves products, products/{id}, products/categories, orders, orders/{id} and customers
+with pagination headers, search, category, price range, after, include and _fields, seeded from
+durmusbaba_products_chatbot.json or a synthetic generator. Latency and error rate are
+configurable.
+
+    python fake_woocommerce_server.py --port 8089 --orders 5000 --latency 0.05 --error-rate 0.01
+    WC_STORE_URL=http://127.0.0.1:8089 WC_CONSUMER_KEY=ck WC_CONSUMER_SECRET=cs python main.py
+
+Authentication parameters are accepted and ignored.
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import Flask, request
+from woocommerce_fields import project_fields
+
+API_PREFIX = "/wp-json/wc/v3"
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "durmusbaba_products_chatbot.json")
+STORE_URL = "https://durmusbaba.de"
+MAX_PER_PAGE = 100
+
+# Same IDs as the live store (see category_service.DEFAULT_CATEGORIES): id -> (name, slug, parent)
+CATEGORIES = {
+    132: ("Kompressoren", "kompressoren", 0),
+    86: ("Halbhermetische Kompressoren", "halbhermetische-kompressoren", 132),
+    74: ("Kältesysteme", "kaltesysteme", 0),
+    95: ("Expansionsventile", "expansionsventile", 0),
+    161: ("Thermostat", "thermostat", 0),
+    90: ("Kühlschranke", "kuhlschranke", 0),
+    94: ("Tiefkühlraumtür", "tiefkuhlraumtur", 0),
+    93: ("Klimageräte-Einheiten", "klimagerate-einheiten", 0),
+}
+
+# First matching keyword decides the category of a catalog product
+CATEGORY_KEYWORDS = [
+    (("halbhermet", "semi-hermet", "semi-hemetic", "bitzer"), 86),
+    (("thermostatic element", " ten ", " tgen ", " tes ", "expansion"), 95),
+    (("dcb", "dijital", "thermostat", "eliwell"), 161),
+    (("kühlschrank",), 90),
+    (("tür",), 94),
+    (("klima", "split"), 93),
+    (("lüfter", "axial", "verflüssiger", "verdampfer"), 74),
+    (("embraco", "danfoss", "kompressor", "compressor"), 132),
+]
+
+BRANDS = ["Embraco", "Danfoss", "Bitzer", "Copeland", "Tecumseh", "Secop", "Eliwell", "Ebmpapst"]
+FIRST_NAMES = ["Ahmet", "Anna", "Mehmet", "Lukas", "Ayşe", "Sophie", "Murat", "Jonas", "Elif", "Lena"]
+LAST_NAMES = ["Yılmaz", "Müller", "Kaya", "Schmidt", "Demir", "Schneider", "Şahin", "Fischer"]
+CITIES = [("Berlin", "10115"), ("Hamburg", "20095"), ("Köln", "50667"), ("München", "80331"), ("Essen", "45127")]
+ORDER_STATUSES = ["completed"] * 6 + ["processing"] * 2 + ["pending", "on-hold", "cancelled", "refunded"]
+DESCRIPTION = ("Für gewerbliche Kälteanlagen ausgelegt, geeignet für Kühlräume, Kühltheken und "
+               "Tiefkühlanwendungen. Lieferung mit Anlaufvorrichtung und Montagematerial. ")
+
+def categorize(name):
+    """Guess the category ID of a catalog product from its name"""
+    text = f" {name.lower()} "
+    for keywords, category_id in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category_id
+    return 74
+
+def _iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+def _links(path, object_id):
+    return {
+        "self": [{"href": f"{STORE_URL}{API_PREFIX}/{path}/{object_id}"}],
+        "collection": [{"href": f"{STORE_URL}{API_PREFIX}/{path}"}],
+    }
+
+def make_product(product_id, name, slug, price, stock_status, permalink, category_id, created):
+    """Product shaped like a full wc/v3 response"""
+    category_name, category_slug, _ = CATEGORIES[category_id]
+    price = f"{float(price):.2f}"
+    sku = slug.upper().replace("-", "")[:20]
+    return {
+        "id": product_id, "name": name, "slug": slug, "permalink": permalink,
+        "date_created": _iso(created), "date_created_gmt": _iso(created - timedelta(hours=2)),
+        "date_modified": _iso(created), "type": "simple", "status": "publish", "featured": False,
+        "catalog_visibility": "visible",
+        "description": f"<p><strong>{name}</strong></p><p>{DESCRIPTION * 8}</p>",
+        "short_description": f"<p>{name}. {DESCRIPTION}</p>",
+        "sku": sku, "price": price, "regular_price": price, "sale_price": "",
+        "price_html": f"<span class=\"woocommerce-Price-amount amount\"><bdi>{price}&nbsp;€</bdi></span>",
+        "on_sale": False, "purchasable": True, "total_sales": product_id % 37, "tax_status": "taxable",
+        "manage_stock": stock_status == "instock", "stock_quantity": 5 if stock_status == "instock" else 0,
+        "stock_status": stock_status, "weight": "10.5",
+        "dimensions": {"length": "30", "width": "25", "height": "30"},
+        "categories": [{"id": category_id, "name": category_name, "slug": category_slug}],
+        "tags": [],
+        "images": [{
+            "id": product_id * 10 + n, "src": f"{STORE_URL}/wp-content/uploads/{slug}-{n}.jpg",
+            "name": f"{slug}-{n}", "alt": name, "date_created": _iso(created),
+        } for n in range(3)],
+        "attributes": [], "related_ids": [], "upsell_ids": [], "cross_sell_ids": [],
+        "meta_data": [{"id": product_id * 100 + m, "key": f"_yoast_wpseo_{m}", "value": DESCRIPTION} for m in range(4)],
+        "_links": _links("products", product_id),
+    }
+
+def make_customer(customer_id, rng):
+    """Customer with a German phone number in one of the spellings customers actually use"""
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city, postcode = rng.choice(CITIES)
+    number = f"{rng.choice(['151', '160', '170', '176', '178'])}{rng.randint(1000000, 9999999)}"
+    phone = rng.choice([f"+49{number}", f"0{number}", f"0049 {number[:3]} {number[3:]}", f"+49 {number[:3]} {number[3:]}"])
+    address = {
+        "first_name": first_name, "last_name": last_name, "company": "", "address_1": f"Hauptstraße {customer_id}",
+        "address_2": "", "city": city, "state": "", "postcode": postcode, "country": "DE",
+    }
+    return {
+        "id": customer_id, "email": f"kunde{customer_id}@example.com", "first_name": first_name,
+        "last_name": last_name, "role": "customer", "username": f"kunde{customer_id}",
+        "billing": dict(address, email=f"kunde{customer_id}@example.com", phone=phone),
+        "shipping": dict(address, phone=""),
+        "is_paying_customer": True, "meta_data": [], "_links": _links("customers", customer_id),
+    }
+
+def make_order(order_id, customer, items, created, status):
+    """Order shaped like a full wc/v3 response"""
+    line_items = []
+    for n, (product, quantity) in enumerate(items):
+        total = f"{float(product['price']) * quantity:.2f}"
+        line_items.append({
+            "id": order_id * 10 + n, "name": product["name"], "product_id": product["id"], "variation_id": 0,
+            "quantity": quantity, "tax_class": "", "subtotal": total, "subtotal_tax": "0.00", "total": total,
+            "total_tax": "0.00", "taxes": [], "meta_data": [], "sku": product["sku"], "price": float(product["price"]),
+            "image": {"id": product["id"], "src": product["images"][0]["src"]},
+        })
+    total = sum(float(item["total"]) for item in line_items) + 9.90
+    return {
+        "id": order_id, "parent_id": 0, "status": status, "currency": "EUR", "version": "8.5.2",
+        "prices_include_tax": True, "date_created": _iso(created), "date_modified": _iso(created),
+        "date_created_gmt": _iso(created - timedelta(hours=2)), "discount_total": "0.00",
+        "shipping_total": "9.90", "total": f"{total:.2f}", "total_tax": f"{total * 0.19 / 1.19:.2f}",
+        "customer_id": customer["id"], "order_key": f"wc_order_{order_id:012d}",
+        "billing": dict(customer["billing"]), "shipping": dict(customer["shipping"]),
+        "payment_method": "paypal", "payment_method_title": "PayPal", "transaction_id": f"TX{order_id:010d}",
+        "customer_ip_address": "127.0.0.1", "customer_user_agent": "Mozilla/5.0", "customer_note": "",
+        "date_paid": _iso(created) if status in ("processing", "completed") else None,
+        "meta_data": [{"id": order_id * 100 + m, "key": f"_ppcp_meta_{m}", "value": "x" * 40} for m in range(6)],
+        "line_items": line_items, "tax_lines": [], "fee_lines": [], "coupon_lines": [], "refunds": [],
+        "shipping_lines": [{"id": order_id, "method_title": "DHL", "method_id": "flat_rate", "total": "9.90",
+                            "total_tax": "0.00", "taxes": [], "meta_data": []}],
+        "_links": _links("orders", order_id),
+    }
+
+class FakeWooCommerceStore:
+    """In-memory store data behind the fake server"""
+    def __init__(self, products, orders, customers):
+        self.products = sorted(products, key=lambda p: p["id"], reverse=True)
+        self.orders = sorted(orders, key=lambda o: o["date_created"], reverse=True)
+        self.customers = customers
+        self.products_by_id = {p["id"]: p for p in self.products}
+        self.orders_by_id = {o["id"]: o for o in self.orders}
+        self.next_order_id = max(self.orders_by_id, default=10000) + 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_catalog(cls, path=CATALOG_FILE, orders=500, customers=None, seed=42):
+        """Store seeded with the real product catalog and synthetic orders"""
+        rng = random.Random(seed)
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+
+        start = datetime(2024, 1, 1)
+        products = [
+            make_product(1000 + i, item["product_name"], item["slug"], item["price_eur"], item["status"],
+                         item["url"], categorize(item["product_name"]), start + timedelta(hours=i))
+            for i, item in enumerate(catalog)
+        ]
+        return cls._with_orders(products, orders, customers, rng)
+
+    @classmethod
+    def synthetic(cls, products=1000, orders=5000, customers=None, seed=42):
+        """Store with generated products and orders of any size"""
+        rng = random.Random(seed)
+        start = datetime(2024, 1, 1)
+        generated = []
+        for i in range(products):
+            brand = rng.choice(BRANDS)
+            model = f"{rng.choice(['NEK', 'EMY', 'SC', 'MTZ', 'NTZ', 'FF', '4FES', 'TEN'])}{rng.randint(2, 9999)}"
+            name = f"{brand} {model} {rng.choice(['GK', 'CLP', 'HLR', 'Kompressor', 'R404A', ''])}".strip()
+            slug = name.lower().replace(" ", "-")
+            generated.append(make_product(
+                1000 + i, name, slug, rng.uniform(15, 2500), rng.choice(["instock", "outofstock"]),
+                f"{STORE_URL}/product/{slug}/", categorize(name), start + timedelta(minutes=i)
+            ))
+        return cls._with_orders(generated, orders, customers, rng)
+
+    @classmethod
+    def _with_orders(cls, products, order_count, customer_count, rng):
+        customer_count = customer_count or max(1, order_count // 3)
+        customers = [make_customer(i, rng) for i in range(1, customer_count + 1)]
+        start = datetime(2023, 1, 1)
+        span = (datetime(2025, 1, 1) - start).total_seconds()
+        orders = []
+        for i in range(order_count):
+            items = [(rng.choice(products), rng.randint(1, 3)) for _ in range(rng.randint(1, 3))]
+            created = start + timedelta(seconds=span * i / max(order_count, 1))
+            orders.append(make_order(10001 + i, rng.choice(customers), items, created, rng.choice(ORDER_STATUSES)))
+        return cls(products, orders, customers)
+
+    def categories(self):
+        """Categories with product counts"""
+        counts = Counter(c["id"] for p in self.products for c in p["categories"])
+        return [
+            {"id": category_id, "name": name, "slug": slug, "parent": parent, "description": "",
+             "display": "default", "image": None, "menu_order": 0, "count": counts.get(category_id, 0),
+             "_links": _links("products/categories", category_id)}
+            for category_id, (name, slug, parent) in sorted(CATEGORIES.items())
+        ]
+
+    def add_order(self, order):
+        """Add or replace an order (e.g. to simulate a new order before sending its webhook)"""
+        with self._lock:
+            self.orders_by_id[order["id"]] = order
+            self.orders = sorted(self.orders_by_id.values(), key=lambda o: o["date_created"], reverse=True)
+            self.next_order_id = max(self.next_order_id, order["id"] + 1)
+
+def _category_ids_with_children(category_ids):
+    """WooCommerce includes products of child categories in a category filter"""
+    result = set(category_ids)
+    for category_id, (_, _, parent) in CATEGORIES.items():
+        if parent in result:
+            result.add(category_id)
+    return result
+
+def _id_list(value):
+    return [int(v) for v in str(value).split(",") if v.strip().isdigit()]
+
+class InvalidParam(Exception):
+    """Request parameter rejected the way WordPress rejects it (400 rest_invalid_param)"""
+
+def _error(code, message, status):
+    return json.dumps({"code": code, "message": message, "data": {"status": status}}), status, \
+        {"Content-Type": "application/json"}
+
+def create_app(store=None, latency=0.0, error_rate=0.0, seed=None):
+    """
+    Create the fake WooCommerce REST app
+
+    Args:
+        store (FakeWooCommerceStore): Store data (defaults to the product catalog with synthetic orders)
+        latency (float): Mean artificial latency per request in seconds
+        error_rate (float): Fraction of requests answered with 503 Service Unavailable
+        seed (int): Seed for latency jitter and injected errors
+
+    Returns:
+        Flask: The app; app.config['STORE'] holds the store and app.config['STATS'] counts requests
+    """
+    app = Flask(__name__)
+    store = store or FakeWooCommerceStore.from_catalog()
+    rng = random.Random(seed)
+    stats = Counter()
+    app.config.update(STORE=store, STATS=stats, LATENCY=latency, ERROR_RATE=error_rate)
+
+    def respond(data, total=None, per_page=None):
+        """JSON response with _fields projection and pagination headers"""
+        data = project_fields(data, request.args.get("_fields"))
+        headers = {"Content-Type": "application/json; charset=UTF-8"}
+        if total is not None:
+            headers["X-WP-Total"] = str(total)
+            headers["X-WP-TotalPages"] = str(max(1, -(-total // per_page)) if total else 0)
+        return json.dumps(data, ensure_ascii=False), 200, headers
+
+    def paginate(items):
+        """Apply page/per_page and respond with the page and the pagination headers"""
+        try:
+            page = int(request.args.get("page", 1))
+            per_page = int(request.args.get("per_page", 10))
+        except ValueError:
+            raise InvalidParam("page, per_page")
+        if per_page < 1 or per_page > MAX_PER_PAGE or page < 1:
+            raise InvalidParam("per_page")
+        start = (page - 1) * per_page
+        return respond(items[start:start + per_page], len(items), per_page)
+
+    @app.errorhandler(InvalidParam)
+    def invalid_param(e):
+        return _error("rest_invalid_param", f"Invalid parameter(s): {e}", 400)
+
+    def filter_common(items):
+        """include, after and before filters shared by the collection endpoints"""
+        args = request.args
+        if args.get("include"):
+            ids = set(_id_list(args["include"]))
+            items = [item for item in items if item["id"] in ids]
+        if args.get("after"):
+            after = args["after"][:19]
+            items = [item for item in items if item["date_created"] > after]
+        if args.get("before"):
+            before = args["before"][:19]
+            items = [item for item in items if item["date_created"] < before]
+        return items
+
+    @app.before_request
+    def simulate_network():
+        stats[request.path.split("?")[0]] += 1
+        stats["total"] += 1
+        if app.config["LATENCY"]:
+            time.sleep(app.config["LATENCY"] * rng.uniform(0.5, 1.5))
+        if app.config["ERROR_RATE"] and rng.random() < app.config["ERROR_RATE"]:
+            stats["errors"] += 1
+            body, status, headers = _error("service_unavailable", "Service temporarily unavailable", 503)
+            headers["Retry-After"] = "1"
+            return body, status, headers
+
+    @app.route(f"{API_PREFIX}/products", methods=["GET"])
+    def list_products():
+        args = request.args
+        products = filter_common(store.products)
+        if args.get("search"):
+            term = args["search"].lower()
+            products = [p for p in products if term in p["name"].lower() or term in p["sku"].lower()
+                        or term in p["short_description"].lower()]
+        if args.get("category"):
+            category_ids = _category_ids_with_children(_id_list(args["category"]))
+            products = [p for p in products if any(c["id"] in category_ids for c in p["categories"])]
+        if args.get("sku"):
+            products = [p for p in products if p["sku"] == args["sku"]]
+        if args.get("stock_status"):
+            products = [p for p in products if p["stock_status"] == args["stock_status"]]
+        if args.get("min_price") or args.get("max_price"):
+            low, high = float(args.get("min_price") or 0), float(args.get("max_price") or "inf")
+            products = [p for p in products if p["price"] and low <= float(p["price"]) <= high]
+
+        orderby, order = args.get("orderby", "date"), args.get("order", "desc")
+        sort_keys = {
+            "date": lambda p: p["date_created"], "id": lambda p: p["id"],
+            "title": lambda p: p["name"].lower(), "price": lambda p: float(p["price"] or 0),
+            "popularity": lambda p: p["total_sales"],
+        }
+        if orderby in sort_keys:
+            products = sorted(products, key=sort_keys[orderby], reverse=(order == "desc"))
+
+        return paginate(products)
+
+    @app.route(f"{API_PREFIX}/products/<int:product_id>", methods=["GET"])
+    def get_product(product_id):
+        product = store.products_by_id.get(product_id)
+        if not product:
+            return _error("woocommerce_rest_product_invalid_id", "Invalid ID.", 404)
+        return respond(product)
+
+    @app.route(f"{API_PREFIX}/products/categories", methods=["GET"])
+    def list_categories():
+        args = request.args
+        categories = store.categories()
+        if args.get("include"):
+            ids = set(_id_list(args["include"]))
+            categories = [c for c in categories if c["id"] in ids]
+        if args.get("search"):
+            categories = [c for c in categories if args["search"].lower() in c["name"].lower()]
+        if args.get("parent") is not None and args.get("parent") != "":
+            categories = [c for c in categories if c["parent"] == int(args["parent"])]
+        if args.get("hide_empty") in ("1", "true"):
+            categories = [c for c in categories if c["count"]]
+
+        return paginate(categories)
+
+    @app.route(f"{API_PREFIX}/orders", methods=["GET"])
+    def list_orders():
+        args = request.args
+        orders = filter_common(store.orders)
+        if args.get("status") and args["status"] != "any":
+            statuses = set(args["status"].split(","))
+            orders = [o for o in orders if o["status"] in statuses]
+        if args.get("customer"):
+            orders = [o for o in orders if o["customer_id"] == int(args["customer"])]
+        if args.get("order") == "asc":
+            orders = list(reversed(orders))
+
+        return paginate(orders)
+
+    @app.route(f"{API_PREFIX}/orders/<int:order_id>", methods=["GET"])
+    def get_order(order_id):
+        order = store.orders_by_id.get(order_id)
+        if not order:
+            return _error("woocommerce_rest_shop_order_invalid_id", "Invalid ID.", 404)
+        return respond(order)
+
+    @app.route(f"{API_PREFIX}/customers", methods=["GET"])
+    def list_customers():
+        args = request.args
+        customers = store.customers
+        if args.get("include"):
+            ids = set(_id_list(args["include"]))
+            customers = [c for c in customers if c["id"] in ids]
+        if args.get("email"):
+            customers = [c for c in customers if c["email"].lower() == args["email"].lower()]
+        if args.get("search"):
+            term = args["search"].lower()
+            customers = [c for c in customers if term in c["email"] or term in f"{c['first_name']} {c['last_name']}".lower()]
+
+        return paginate(customers)
+
+    @app.route("/__fake/stats", methods=["GET"])
+    def request_stats():
+        """Requests served per path, for caching benchmarks"""
+        return json.dumps(dict(stats)), 200, {"Content-Type": "application/json"}
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline WooCommerce REST API stand-in")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--synthetic", type=int, metavar="PRODUCTS",
+                        help="Generate this many products instead of loading the catalog")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        fake_store = FakeWooCommerceStore.synthetic(products=args.synthetic, orders=args.orders, seed=args.seed)
+    else:
+        fake_store = FakeWooCommerceStore.from_catalog(orders=args.orders, seed=args.seed)
+
+    print(f"Fake WooCommerce store: {len(fake_store.products)} products, {len(fake_store.orders)} orders, "
+          f"{len(fake_store.customers)} customers on http://127.0.0.1:{args.port}{API_PREFIX}")
+    create_app(fake_store, latency=args.latency, error_rate=args.error_rate, seed=args.seed).run(
+        host="127.0.0.1", port=args.port, threaded=True
+    )
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Downscaling and re-encoding of customer photos before Gemini Vision.
+
+Phone photos of compressor nameplates arrive with 4-12 megapixels, far more than the
+model needs to read a label. Each image is rotated according to its EXIF orientation,
+cropped to its content (uniform borders such as the bars of a screenshot are removed),
+downscaled to IMAGE_MAX_EDGE pixels on the long edge and re-encoded as JPEG or WebP.
+
+The work runs in a process pool, so decoding large photos does not hold the GIL of the
+request threads; any failure falls back to the original image. The workers are started
+by a fork server rather than forked from the app, whose threads may hold locks at the
+time of the fork; like spawned processes, they import the main module as __mp_main__.
+"""
+
+import io
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageChops, ImageOps
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('image_preprocessing')
+
+# Long edge of the image sent to Gemini (pixels)
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1600"))
+# Output format (JPEG or WEBP) and quality
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+# Worker processes for preprocessing
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Seconds to wait for a worker before sending the original image
+IMAGE_TIMEOUT = 10
+# Colour difference still counted as border when cropping
+TRIM_TOLERANCE = 12
+
+OUTPUT_MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+def _trim_border(image):
+    """Crop a uniform border in the colour of the top left pixel, if there is one"""
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    difference = ImageChops.difference(image, background).convert('L')
+    box = difference.point(lambda value: 255 if value > TRIM_TOLERANCE else 0).getbbox()
+    if not box or box == (0, 0) + image.size:
+        return image
+    return image.crop(box)
+
+def preprocess_image(data, max_edge=None, output_format=None, quality=None):
+    """
+    Rotate, crop, downscale and re-encode an image
+
+    Args:
+        data (bytes): Image file contents
+        max_edge (int): Long edge of the result (default IMAGE_MAX_EDGE)
+        output_format (str): JPEG or WEBP (default IMAGE_FORMAT)
+        quality (int): Encoder quality (default IMAGE_QUALITY)
+
+    Returns:
+        tuple: (image bytes, MIME type); the original bytes (and None) if re-encoding does not make it smaller
+    """
+    max_edge = max_edge or IMAGE_MAX_EDGE
+    output_format = (output_format or IMAGE_FORMAT).upper()
+    quality = quality or IMAGE_QUALITY
+
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    # JPEG can be decoded at a reduced scale directly, which is much faster than a full decode
+    scale = min(1.0, max_edge / max(original_size))
+    image.draft('RGB', (round(original_size[0] * scale), round(original_size[1] * scale)))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, (255, 255, 255))
+        flattened.paste(image, mask=image.getchannel('A'))
+        image = flattened
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    image = _trim_border(image)
+
+    output = io.BytesIO()
+    image.save(output, format=output_format, quality=quality, optimize=True)
+    result = output.getvalue()
+    if len(result) >= len(data) and image.size == original_size:
+        return data, None
+    return result, OUTPUT_MIME_TYPES.get(output_format, 'image/jpeg')
+
+class ImagePreprocessor:
+    """
+    Runs preprocess_image in a process pool and keeps savings statistics
+    """
+    def __init__(self, workers=None, timeout=IMAGE_TIMEOUT):
+        """
+        Args:
+            workers (int): Worker processes (default IMAGE_WORKERS); 0 runs in the calling thread
+            timeout (float): Seconds to wait for a result
+        """
+        self.workers = IMAGE_WORKERS if workers is None else workers
+        self.timeout = timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'images': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+
+    def _executor(self):
+        """The process pool, started on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def preprocess(self, data, mime_type):
+        """
+        Prepare an image for Gemini Vision
+
+        Args:
+            data (bytes): Image file contents
+            mime_type (str): MIME type of data
+
+        Returns:
+            tuple: (image bytes, MIME type), the original on failure
+        """
+        start = time.perf_counter()
+        try:
+            if self.workers:
+                result, result_type = self._executor().submit(preprocess_image, data).result(timeout=self.timeout)
+            else:
+                result, result_type = preprocess_image(data)
+        except Exception as e:
+            logger.error(f"Image preprocessing failed, sending the original: {e}")
+            with self._stats_lock:
+                self._stats['failed'] += 1
+            return data, mime_type
+
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats['images'] += 1
+            self._stats['bytes_in'] += len(data)
+            self._stats['bytes_out'] += len(result)
+            self._stats['seconds'] += elapsed
+        logger.info(f"Image preprocessed in {elapsed * 1000:.0f} ms: {len(data)} -> {len(result)} bytes "
+                    f"({(1 - len(result) / len(data)) * 100:.0f}% saved)")
+        return result, result_type or mime_type
+
+    def stats(self):
+        """Totals and per-image averages"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        images = stats['images']
+        return {
+            'images': images,
+            'failed': stats['failed'],
+            'bytes_in': stats['bytes_in'],
+            'bytes_out': stats['bytes_out'],
+            'bytes_saved_per_image': (stats['bytes_in'] - stats['bytes_out']) // images if images else 0,
+            'preprocess_ms_per_image': round(stats['seconds'] / images * 1000, 1) if images else 0.0,
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+# Create a singleton instance
+image_preprocessor = ImagePreprocessor()
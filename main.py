@@ -9,10 +9,21 @@ import traceback
 from dotenv import load_dotenv
 import google.generativeai as genai
 import re
+import copy
 from woocommerce_client import woocommerce
+from woocommerce_async import sync_woocommerce
+from category_service import category_service
+from product_price_index import ProductPriceIndex
 from sales_assistant import is_sales_inquiry, handle_sales_inquiry
 from conversation_context import conversation_context
 from conversation_context import ConversationContext
+from memory_budget import MemoryBudget
+from media_download import download_image
+from image_preprocessing import image_preprocessor
+from vision_cache import vision_cache, image_hash
+from vision_search import plan_queries, search_with_plan
+from vision_analysis import VISION_PROMPT, VISION_GENERATION_CONFIG, parse_vision_response
+from message_workers import message_workers
 
 
 def handle_message_with_intent_router(user_id, message_text):
@@ -107,6 +118,8 @@ else:
 
 # Add these global variables after CHAT_HISTORY declaration
 CHAT_HISTORY = {}  # Store chat history for different users
+# Memory accounting for contexts and chat sessions, with a global budget (CONTEXT_MEMORY_BUDGET_MB)
+memory_budget = MemoryBudget(conversation_context, CHAT_HISTORY)
 
 # Conversation context tracking - DEPRECATED, using conversation_context module instead
 # USER_CONTEXT = {}  # Store context for different users: last query type, last products found, etc.
@@ -117,16 +130,26 @@ PHONE_NUMBER_ID = os.getenv("META_PHONE_NUMBER_ID", "725422520644608")
 VERIFY_TOKEN = os.getenv("WEBHOOK_VERIFY_TOKEN", "whatsapptoken")
 
 # Initialize WooCommerce connection
-USE_WOOCOMMERCE = True
-try:
-    if woocommerce.is_connected:
-        print("✅ WooCommerce API connected successfully")
+# The connection is probed in the background; USE_WOOCOMMERCE only says whether the store is
+# configured, and woocommerce.is_connected says whether it is reachable right now. While it is
+# not, the client answers from its cache (stale entries included), product lookups that miss
+# the cache use the local product database, and it switches back automatically.
+USE_WOOCOMMERCE = woocommerce.is_configured
+
+# The image preprocessing workers import this module again as __mp_main__; only the app
+# itself probes the store and persists the conversation contexts
+if __name__ != "__mp_main__":
+    if USE_WOOCOMMERCE:
+        woocommerce.start_health_probe()
+        print("✅ WooCommerce API configured, connecting in the background")
     else:
-        print("⚠️ WooCommerce API connection failed, falling back to local product database")
-        USE_WOOCOMMERCE = False
-except Exception as e:
-    print(f"⚠️ Error initializing WooCommerce API: {e}")
-    USE_WOOCOMMERCE = False
+        print("⚠️ WooCommerce API not configured, using local product database")
+    
+    # Persist conversation contexts in the background (CONTEXT_STORE selects the backend)
+    conversation_context.start_write_behind()
+    # Restore the contexts of the previous run and snapshot them periodically and at shutdown
+    conversation_context.restore()
+    conversation_context.start_snapshots()
 
 def load_product_db():
     """Load product database from JSON file."""
@@ -141,7 +164,108 @@ def load_product_db():
 
 # Load product database
 PRODUCT_DB = load_product_db()
+PRODUCT_PRICE_INDEX = ProductPriceIndex(PRODUCT_DB)
 
+def create_chat_session():
+    """
+    Start a Gemini chat session primed with the system prompt
+    
+    Returns:
+        ChatSession: New session
+    """
+    # System prompt in German
+    system_prompt = """
+    Du bist ein freundlicher Kundendienstassistent für durmusbaba.de, einen Online-Shop für Kältetechnik und Kompressoren.
+    
+    Über durmusbaba.de:
+    - durmusbaba.de ist ein spezialisierter Online-Shop für Kältetechnik, Kompressoren und Kühlsysteme
+    - Wir bieten Produkte von führenden Herstellern wie Embraco, Bitzer, Danfoss und anderen an
+    - Unser Hauptfokus liegt auf Kompressoren, Kühltechnik und Zubehör
+    
+    Produktinformationen:
+    - Wir haben eine große Auswahl an Kompressoren verschiedener Marken und Modelle
+    - Die Produktdatenbank enthält genaue Informationen zu Produktnamen und Preisen in Euro
+    - Alle Preise sind in Euro (EUR) angegeben
+    - Wenn ein Benutzer nach einem bestimmten Produkt fragt, sollst du IMMER den genauen Preis aus der Datenbank angeben
+    - Wenn ein Benutzer nur den Produktnamen sendet, verstehe dies als Preisanfrage und gib den Preis zurück
+    - Wenn du Produktinformationen bereitstellst, füge IMMER den Link zum Produkt hinzu
+    - Gib auch die Verfügbarkeit des Produkts an (auf Lager oder nicht auf Lager)
+    - Bei nicht verfügbaren Produkten, erwähne immer, dass Sonderbestellungen per E-Mail oder Telefon möglich sind
+    - WICHTIG: Verwende NIEMALS Platzhalter wie "[Bitte geben Sie den Preis ein]" oder ähnliches
+    - Wenn du die Produktinformationen nicht kennst, sage ehrlich, dass du das Produkt nicht finden konntest
+    - Verwende IMMER die tatsächlichen Daten aus der Datenbank, nicht Vorlagen oder Platzhalter
+    - Verwende NIEMALS eckige Klammern wie [Produktname] oder [Preis] in deinen Antworten
+    - Wenn du unsicher bist, ob ein Produkt existiert, sage, dass du es nicht finden konntest
+    
+    Kundenservice:
+    - Bei Fragen zur Verfügbarkeit oder technischen Details können Kunden uns kontaktieren
+    - Wir bieten Beratung zur Auswahl des richtigen Kompressors oder Kühlsystems
+    - Für detaillierte technische Informationen können Kunden unsere Website besuchen oder uns direkt kontaktieren
+    - E-Mail-Kontakt: info@durmusbaba.com
+    - Telefonnummer: +4915228474571
+    - Reguläre Lieferzeit: 3-5 Werktage
+    
+    Bestellung und Versand:
+    - Bestellungen können über unsere Website durmusbaba.de aufgegeben werden
+    - Wir versenden in ganz Europa
+    - Die reguläre Lieferzeit beträgt 3-5 Werktage
+    - Bei Fragen zum Versand oder zur Lieferzeit stehen wir zur Verfügung
+    
+    Stil und Ton:
+    - Sei freundlich, hilfsbereit und professionell
+    - Verwende gelegentlich passende Emojis, um deine Antworten freundlicher zu gestalten
+    - Stelle dich bei der ersten Nachricht eines Benutzers als KI-Kundendienstassistent für durmusbaba.de vor
+    - Sei präzise und informativ, aber halte einen freundlichen Ton
+    
+    WICHTIG: Erkenne die Sprache des Benutzers und antworte IMMER in derselben Sprache, in der der Benutzer dich anspricht.
+    Wenn der Benutzer auf Türkisch schreibt, antworte auf Türkisch.
+    Wenn der Benutzer auf Englisch schreibt, antworte auf Englisch.
+    Wenn der Benutzer auf Deutsch schreibt, antworte auf Deutsch.
+    Wenn der Benutzer in einer anderen Sprache schreibt, versuche in dieser Sprache zu antworten.
+    """
+    
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    print(f"Using Gemini model: {GEMINI_MODEL}")
+    return model.start_chat(history=[
+        {"role": "user", "parts": ["Systeminfo"]},
+        {"role": "model", "parts": [system_prompt]}
+    ])
+
+def send_chat_message(user_id, text):
+    """
+    Send a message in the user's Gemini chat session
+    
+    The user's lock is held only to read and extend the session history, not during the
+    Gemini request, so other messages of the user are not blocked for its duration.
+    
+    Args:
+        user_id (str): User ID whose session in CHAT_HISTORY is used
+        text (str): Message to send
+        
+    Returns:
+        GenerateContentResponse: Gemini's answer
+    """
+    with conversation_context.locked(user_id):
+        # The memory budget may have dropped the session since the caller created it
+        session = CHAT_HISTORY.get(user_id)
+        if session is None:
+            session = CHAT_HISTORY[user_id] = create_chat_session()
+        history = session.history
+    
+    message = {"role": "user", "parts": [text]}
+    response = session.model.generate_content(history + [message])
+    
+    # Blocked or empty answers are not added, as in ChatSession.send_message
+    if response.candidates and response.candidates[0].content.parts:
+        reply = response.candidates[0].content
+        if not reply.role:
+            reply.role = "model"
+        with conversation_context.locked(user_id):
+            session.history = session.history + [message, reply]
+    return response
+
+# Context and CHAT_HISTORY changes are made under the user's lock (conversation_context.locked),
+# Gemini and store requests run outside it
 def get_gemini_response(user_id, text):
     print(f"Getting Gemini response for text: '{text}'")
     try:
@@ -182,67 +306,15 @@ def get_gemini_response(user_id, text):
         
         # Initialize or get existing chat session
         if user_id not in CHAT_HISTORY:
-            # Create a new chat session with system prompt in German
-            system_prompt = """
-            Du bist ein freundlicher Kundendienstassistent für durmusbaba.de, einen Online-Shop für Kältetechnik und Kompressoren.
-            
-            Über durmusbaba.de:
-            - durmusbaba.de ist ein spezialisierter Online-Shop für Kältetechnik, Kompressoren und Kühlsysteme
-            - Wir bieten Produkte von führenden Herstellern wie Embraco, Bitzer, Danfoss und anderen an
-            - Unser Hauptfokus liegt auf Kompressoren, Kühltechnik und Zubehör
-            
-            Produktinformationen:
-            - Wir haben eine große Auswahl an Kompressoren verschiedener Marken und Modelle
-            - Die Produktdatenbank enthält genaue Informationen zu Produktnamen und Preisen in Euro
-            - Alle Preise sind in Euro (EUR) angegeben
-            - Wenn ein Benutzer nach einem bestimmten Produkt fragt, sollst du IMMER den genauen Preis aus der Datenbank angeben
-            - Wenn ein Benutzer nur den Produktnamen sendet, verstehe dies als Preisanfrage und gib den Preis zurück
-            - Wenn du Produktinformationen bereitstellst, füge IMMER den Link zum Produkt hinzu
-            - Gib auch die Verfügbarkeit des Produkts an (auf Lager oder nicht auf Lager)
-            - Bei nicht verfügbaren Produkten, erwähne immer, dass Sonderbestellungen per E-Mail oder Telefon möglich sind
-            - WICHTIG: Verwende NIEMALS Platzhalter wie "[Bitte geben Sie den Preis ein]" oder ähnliches
-            - Wenn du die Produktinformationen nicht kennst, sage ehrlich, dass du das Produkt nicht finden konntest
-            - Verwende IMMER die tatsächlichen Daten aus der Datenbank, nicht Vorlagen oder Platzhalter
-            - Verwende NIEMALS eckige Klammern wie [Produktname] oder [Preis] in deinen Antworten
-            - Wenn du unsicher bist, ob ein Produkt existiert, sage, dass du es nicht finden konntest
-            
-            Kundenservice:
-            - Bei Fragen zur Verfügbarkeit oder technischen Details können Kunden uns kontaktieren
-            - Wir bieten Beratung zur Auswahl des richtigen Kompressors oder Kühlsystems
-            - Für detaillierte technische Informationen können Kunden unsere Website besuchen oder uns direkt kontaktieren
-            - E-Mail-Kontakt: info@durmusbaba.com
-            - Telefonnummer: +4915228474571
-            - Reguläre Lieferzeit: 3-5 Werktage
-            
-            Bestellung und Versand:
-            - Bestellungen können über unsere Website durmusbaba.de aufgegeben werden
-            - Wir versenden in ganz Europa
-            - Die reguläre Lieferzeit beträgt 3-5 Werktage
-            - Bei Fragen zum Versand oder zur Lieferzeit stehen wir zur Verfügung
-            
-            Stil und Ton:
-            - Sei freundlich, hilfsbereit und professionell
-            - Verwende gelegentlich passende Emojis, um deine Antworten freundlicher zu gestalten
-            - Stelle dich bei der ersten Nachricht eines Benutzers als KI-Kundendienstassistent für durmusbaba.de vor
-            - Sei präzise und informativ, aber halte einen freundlichen Ton
-            
-            WICHTIG: Erkenne die Sprache des Benutzers und antworte IMMER in derselben Sprache, in der der Benutzer dich anspricht.
-            Wenn der Benutzer auf Türkisch schreibt, antworte auf Türkisch.
-            Wenn der Benutzer auf Englisch schreibt, antworte auf Englisch.
-            Wenn der Benutzer auf Deutsch schreibt, antworte auf Deutsch.
-            Wenn der Benutzer in einer anderen Sprache schreibt, versuche in dieser Sprache zu antworten.
-            """
-            
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            print(f"Using Gemini model: {GEMINI_MODEL}")
-            CHAT_HISTORY[user_id] = model.start_chat(history=[
-                {"role": "user", "parts": ["Systeminfo"]},
-                {"role": "model", "parts": [system_prompt]}
-            ])
+            session = create_chat_session()
+            # A concurrent message of the same user may have created the session already
+            with conversation_context.locked(user_id):
+                new_session = CHAT_HISTORY.setdefault(user_id, session) is session
             
             # Send a welcome message for first-time users
-            welcome_message = generate_welcome_message()
-            CHAT_HISTORY[user_id].send_message(welcome_message)
+            if new_session:
+                welcome_message = generate_welcome_message()
+                send_chat_message(user_id, welcome_message)
         
         # Cold storage flow is now handled by Node.js server
         # Check if this is a follow-up request for more products
@@ -310,7 +382,7 @@ def get_gemini_response(user_id, text):
         recent_messages = conversation_context.get_recent_messages(user_id, count=message_count)
         
         # For very long conversations, include a summary instead of all messages
-        conversation_length = len(conversation_context.get_full_conversation_history(user_id))
+        conversation_length = conversation_context.get_message_count(user_id)
         if conversation_length > 20:  # If we have more than 20 messages in total
             conversation_summary = conversation_context.summarize_conversation(user_id)
             if conversation_summary:
@@ -328,7 +400,7 @@ def get_gemini_response(user_id, text):
         else:
             enhanced_text = text
             
-        response = CHAT_HISTORY[user_id].send_message(enhanced_text)
+        response = send_chat_message(user_id, enhanced_text)
         response_text = response.text
         
         # Update conversation context with the bot's response
@@ -369,12 +441,12 @@ def format_product_response(product, user_id):
     
     # Update conversation context
     context = conversation_context.get_context(user_id)
-    context['current_topic'] = 'product_info'
+    with conversation_context.locked(user_id):
+        context['current_topic'] = 'product_info'
     
-    # Add product to entities if not already there
-    product_entity = {'name': product_name, 'mentioned_at': time.time()}
-    if not any(p['name'] == product_name for p in context['entities']['products']):
-        context['entities']['products'].append(product_entity)
+        # Add product to entities if not already there
+        product_entity = {'name': product_name, 'mentioned_at': time.time()}
+        context['entities']['products'].add(product_entity)
     
     # Format status message
     status_message = ""
@@ -519,29 +591,33 @@ Do you have any other questions? 😊"""
 
 Haben Sie weitere Fragen? 😊"""
 
+def woocommerce_to_local_product(product):
+    """Convert a WooCommerce product to the local product database format."""
+    return {
+        'product_name': product['name'],
+        'price_eur': product['price'],
+        'status': 'instock' if product.get('stock_status') == 'instock' else 'outofstock',
+        'url': product['permalink'],
+        'sku': product.get('sku', '')
+    }
+
 def find_exact_product(text):
     """Find a product by its exact name in the database."""
     # Use WooCommerce API if available
-    if USE_WOOCOMMERCE and woocommerce.is_connected:
+    if USE_WOOCOMMERCE:
         try:
             # Clean up the input text
             cleaned_text = text.strip()
             
             # Use advanced product search
-            products = woocommerce.advanced_product_search(cleaned_text, limit=5)
+            products = sync_woocommerce.advanced_product_search(cleaned_text, limit=5)
             
             if products:
                 # Return the best match (first result from advanced search)
                 best_match = products[0]
                 
                 # Create a compatible product object
-                return {
-                    'product_name': best_match['name'],
-                    'price_eur': best_match['price'],
-                    'status': 'instock' if best_match['stock_status'] == 'instock' else 'outofstock',
-                    'url': best_match['permalink'],
-                    'sku': best_match.get('sku', '')
-                }
+                return woocommerce_to_local_product(best_match)
             
             # If no match found in WooCommerce, fall back to local database
             print("No exact match found in WooCommerce, falling back to local database")
@@ -650,26 +726,21 @@ def check_product_query(text, user_id=None):
                         search_term = f"{identified_brand} {search_term}"
                     
                     # Search for the product
-                    products = woocommerce.advanced_product_search(search_term)
+                    products = sync_woocommerce.advanced_product_search(search_term)
                     
                     if products:
                         # Found products, format the response
                         product = products[0]  # Take the first match
                         
-                        # Update context with found product
+                        # Update context with found product (the ID lets later requests fetch it in a batch)
                         if context:
-                            context['current_topic'] = 'product_info'
-                            product_entity = {'name': product_name, 'mentioned_at': time.time()}
-                            if not any(p['name'] == product_name for p in context['entities']['products']):
-                                context['entities']['products'].append(product_entity)
+                            with conversation_context.locked(user_id):
+                                context['current_topic'] = 'product_info'
+                                product_entity = {'name': product_name, 'id': product['id'], 'mentioned_at': time.time()}
+                                context['entities']['products'].add(product_entity)
                         
                         # Format the response based on language
-                        return format_product_response({
-                            'product_name': product['name'],
-                            'price_eur': product['price'],
-                            'url': product['permalink'],
-                            'status': 'instock' if product['in_stock'] else 'outofstock'
-                        }, user_id)
+                        return format_product_response(woocommerce_to_local_product(product), user_id)
                 
                 # If we get here, no products were found in WooCommerce
                 print("No products found in WooCommerce")
@@ -692,10 +763,10 @@ def check_product_query(text, user_id=None):
                     if identified_brand in product_lower and search_term in product_lower:
                         # Update context with found product
                         if context:
-                            context['current_topic'] = 'product_info'
-                            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                            if not any(p['name'] == product['product_name'] for p in context['entities']['products']):
-                                context['entities']['products'].append(product_entity)
+                            with conversation_context.locked(user_id):
+                                context['current_topic'] = 'product_info'
+                                product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                                context['entities']['products'].add(product_entity)
                         
                         # Format the response based on language
                         return format_product_response(product, user_id)
@@ -709,10 +780,10 @@ def check_product_query(text, user_id=None):
                     if search_term in product_lower.replace(" ", "").replace("-", ""):
                         # Update context with found product
                         if context:
-                            context['current_topic'] = 'product_info'
-                            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                            if not any(p['name'] == product['product_name'] for p in context['entities']['products']):
-                                context['entities']['products'].append(product_entity)
+                            with conversation_context.locked(user_id):
+                                context['current_topic'] = 'product_info'
+                                product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                                context['entities']['products'].add(product_entity)
                         
                         # Format the response based on language
                         return format_product_response(product, user_id)
@@ -720,10 +791,10 @@ def check_product_query(text, user_id=None):
                 elif search_term.lower() in product_lower:
                     # Update context with found product
                     if context:
-                        context['current_topic'] = 'product_info'
-                        product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                        if not any(p['name'] == product['product_name'] for p in context['entities']['products']):
-                            context['entities']['products'].append(product_entity)
+                        with conversation_context.locked(user_id):
+                            context['current_topic'] = 'product_info'
+                            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                            context['entities']['products'].add(product_entity)
                     
                     # Format the response based on language
                     return format_product_response(product, user_id)
@@ -733,11 +804,12 @@ def check_product_query(text, user_id=None):
             if similar_products:
                 # Update context with found products
                 if context:
-                    context['current_topic'] = 'product_info'
-                    context['entities']['products'] = []
-                    for product in similar_products[:3]:  # Store top 3 matches
-                        product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                        context['entities']['products'].append(product_entity)
+                    with conversation_context.locked(user_id):
+                        context['current_topic'] = 'product_info'
+                        context['entities']['products'].clear()
+                        for product in similar_products[:3]:  # Store top 3 matches
+                            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                            context['entities']['products'].append(product_entity)
                 
                 # Format a response with multiple products
                 if len(similar_products) == 1:
@@ -998,13 +1070,13 @@ def check_category_request(text, user_id=None):
             if matching_products:
                 # Store search results in conversation context if user_id is provided
                 if context:
-                    context['current_topic'] = 'category_search'
-                    # Add category to entities if not already there
-                    if category not in context['entities']['categories']:
-                        context['entities']['categories'].append(category)
+                    with conversation_context.locked(user_id):
+                        context['current_topic'] = 'category_search'
+                        # Add category to entities if not already there
+                        context['entities']['categories'].add(category)
                     
-                    # Update product page
-                    context['product_page'] = 0
+                        # Update product page
+                        context['product_page'] = 0
                 
                 # Detect language
                 is_turkish = any(word in text.lower() for word in ['fiyat', 'fiyatı', 'kaç', 'ne kadar', 'ürün', 'kompresör'])
@@ -1022,9 +1094,9 @@ def check_category_request(text, user_id=None):
                 for i, product in enumerate(matching_products[:5]):
                     # Add product to entities in context
                     if context:
-                        product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                        if not any(p['name'] == product_entity['name'] for p in context['entities']['products']):
-                            context['entities']['products'].append(product_entity)
+                        with conversation_context.locked(user_id):
+                            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                            context['entities']['products'].add(product_entity)
                     
                     status_text = "auf Lager" if product.get('status') == "instock" else "nicht auf Lager"
                     if is_turkish:
@@ -1089,24 +1161,18 @@ def check_price_range_request(text, user_id=None):
     if price_range:
         min_price, max_price = price_range
         
-        # Find products in this price range
-        matching_products = []
-        for product in PRODUCT_DB:
-            try:
-                price = float(product.get('price_eur', '0').replace('€', '').replace(',', '.').strip())
-                if min_price <= price <= max_price:
-                    matching_products.append(product)
-            except (ValueError, TypeError):
-                continue
+        # Find products in this price range (sorted by price)
+        matching_products = PRODUCT_PRICE_INDEX.query(min_price, max_price)
         
         if matching_products:
             # Store search results in conversation context if user_id is provided
             if context:
-                context['current_topic'] = 'price_search'
-                # Add price range to entities
-                context['entities']['price_ranges'].append((min_price, max_price))
-                # Update product page
-                context['product_page'] = 0
+                with conversation_context.locked(user_id):
+                    context['current_topic'] = 'price_search'
+                    # Add price range to entities
+                    context['entities']['price_ranges'].append((min_price, max_price))
+                    # Update product page
+                    context['product_page'] = 0
             
             # Detect language
             is_turkish = any(word in text.lower() for word in ['fiyat', 'fiyatı', 'kaç', 'ne kadar', 'ürün', 'kompresör'])
@@ -1120,16 +1186,13 @@ def check_price_range_request(text, user_id=None):
             else:
                 result = f"💰 Ich habe {len(matching_products)} Produkte im Preisbereich von {min_price}-{max_price} EUR gefunden:\n\n"
             
-            # Sort products by price
-            matching_products.sort(key=lambda x: float(x.get('price_eur', '0').replace('€', '').replace(',', '.').strip()))
-            
             # Show up to 5 products
             for i, product in enumerate(matching_products[:5]):
                 # Add product to entities in context
                 if context:
-                    product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-                    if not any(p['name'] == product_entity['name'] for p in context['entities']['products']):
-                        context['entities']['products'].append(product_entity)
+                    with conversation_context.locked(user_id):
+                        product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+                        context['entities']['products'].add(product_entity)
                 
                 status_text = "auf Lager" if product.get('status') == "instock" else "nicht auf Lager"
                 if is_turkish:
@@ -1252,20 +1315,168 @@ def handle_order_query(text, user_id):
     if order_id:
         # If we have an order ID, look it up directly
         # Add order to context
-        if context and order_id not in context['entities']['orders']:
-            context['entities']['orders'].append(order_id)
+        if context:
+            with conversation_context.locked(user_id):
+                context['entities']['orders'].add(order_id)
         
         return get_order_status(order_id=order_id)
     else:
         # If no order ID, try to look up by phone number
         # Extract the phone number from the WhatsApp ID (format: 491234567890:12)
         phone = user_id.split(':')[0] if ':' in user_id else user_id
+        
+        # Orders are found by phone through an index that is built in the background on first use
+        if USE_WOOCOMMERCE and not woocommerce.order_index.is_built:
+            if woocommerce.is_connected:
+                woocommerce.order_index.ensure_built_in_background()
+            # While the store is down the index cannot be built; ask for the order number instead
+            return generate_order_index_pending_response(text, loading=not woocommerce.probe_failed)
         return get_order_status(phone=phone)
 
+def generate_order_index_pending_response(text, loading=True):
+    """
+    Reply to a phone order lookup while the phone order index is not built
+    
+    Args:
+        text (str): User message, used to detect the language
+        loading (bool): True while the index is being built, False if the store is unreachable
+        
+    Returns:
+        str: Response text
+    """
+    # Detect language
+    if any(word in text.lower() for word in ['sipariş', 'kargo', 'nerede', 'durum']):
+        # Turkish
+        if loading:
+            return "⏳ Sipariş kayıtlarımız şu anda yükleniyor. Lütfen birazdan tekrar deneyin veya bana sipariş numaranızı gönderin."
+        return "📦 Siparişinizi bulabilmem için lütfen sipariş numaranızı gönderin (ör. #12345)."
+    elif any(word in text.lower() for word in ['order', 'where', 'status', 'track']):
+        # English
+        if loading:
+            return "⏳ I'm still loading our order records. Please try again shortly, or send me your order number."
+        return "📦 To look up your order, please send me your order number (e.g. #12345)."
+    else:
+        # Default to German
+        if loading:
+            return "⏳ Unsere Bestelldaten werden gerade geladen. Bitte versuchen Sie es gleich noch einmal oder senden Sie mir Ihre Bestellnummer."
+        return "📦 Um Ihre Bestellung zu finden, senden Sie mir bitte Ihre Bestellnummer (z. B. #12345)."
+
 @app.route("/", methods=["GET"])
 def home():
     return "WhatsApp Gemini Bot for durmusbaba.de is running. Use /webhook endpoint for WhatsApp API."
 
+def send_whatsapp_text(recipient_phone_id, to, text):
+    """
+    Send a text message through the WhatsApp API
+    
+    Args:
+        recipient_phone_id (str): Phone number ID the message was received on
+        to (str): WhatsApp ID of the recipient
+        text (str): Message text
+    """
+    url = f"https://graph.facebook.com/v18.0/{recipient_phone_id}/messages"
+    headers = {
+        "Authorization": f"Bearer {ACCESS_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": to,
+        "type": "text",
+        "text": {"body": text}
+    }
+    print(f"Sending response to WhatsApp API: {json.dumps(payload)}")
+    print(f"Request URL: {url}")
+    try:
+        response = requests.post(url, headers=headers, json=payload)
+        print(f"WhatsApp API response: {response.status_code} - {response.text}")
+    except requests.RequestException as e:
+        print(f"Error sending WhatsApp message: {e}")
+
+def reply_to_message(sender, recipient_phone_id, response_text):
+    """
+    Send the reply to a message and account the sender's state
+    
+    Args:
+        sender (str): WhatsApp ID of the sender
+        recipient_phone_id (str): Phone number ID the message was received on
+        response_text (str): Reply text
+    """
+    # Log user context for debugging
+    user_context = conversation_context.get_context(sender)
+    if user_context:
+        # The message buffer and entity sets are serialised as lists
+        print(f"User context: {json.dumps({k: v for k, v in user_context.items() if k != 'entities'}, default=list)}")
+        print(f"Entities in context: {json.dumps(user_context.get('entities', {}), default=list)}")
+    
+    # Account the user's state and evict from idle users if over the memory budget
+    memory_budget.account(sender)
+    
+    # Debug info about phone IDs
+    print(f"Default PHONE_NUMBER_ID from env: {PHONE_NUMBER_ID}")
+    print(f"Extracted phone_number_id: {recipient_phone_id}")
+    
+    # Send response back to WhatsApp using the phone number ID the message arrived on
+    send_whatsapp_text(recipient_phone_id, sender, response_text)
+
+def process_text_message(sender, recipient_phone_id, message_text):
+    """
+    Answer a text message (text lane job)
+    
+    Args:
+        sender (str): WhatsApp ID of the sender
+        recipient_phone_id (str): Phone number ID the message was received on
+        message_text (str): Message text
+    """
+    # Process message through Node.js intent router
+    print(f"Processing message '{message_text}' through Node.js intent router")
+    response_text = handle_message_with_intent_router(sender, message_text)
+    print(f"Response from intent router: {response_text}")
+    reply_to_message(sender, recipient_phone_id, response_text)
+
+def process_image_message(sender, recipient_phone_id, image_id):
+    """
+    Download an image and answer with matching products (vision lane job)
+    
+    Args:
+        sender (str): WhatsApp ID of the sender
+        recipient_phone_id (str): Phone number ID the message was received on
+        image_id (str): WhatsApp media ID of the image
+    """
+    print(f"Processing image with ID: {image_id}")
+    # Sent from the job itself, so it always arrives before the answer (a vision cache hit
+    # can finish before a message sent by the webhook after queueing the job)
+    send_whatsapp_text(recipient_phone_id, sender, "📷 Analysing your photo… I'll send you the matching products in a moment.")
+    
+    # Get image URL using the Media API
+    image_url = get_media_url(image_id, recipient_phone_id)
+    
+    if not image_url:
+        print("Failed to get image URL")
+        response_text = "I received your image but couldn't download it. Could you please try sending it again?"
+    else:
+        # Download the image into memory (size-capped and checked to be an image)
+        try:
+            download_headers = {
+                "Authorization": f"Bearer {ACCESS_TOKEN}"
+            }
+            
+            print(f"Downloading image {image_id}")
+            image = download_image(image_url, headers=download_headers)
+            
+            if not image:
+                response_text = "I received your image but couldn't download it. Could you please try sending it again?"
+            else:
+                # Process the image with Gemini Vision as inline data
+                image_data, mime_type = image
+                print(f"Processing {mime_type} image of {len(image_data)} bytes with Gemini Vision")
+                response_text = process_image_with_gemini(sender, image_data, mime_type)
+        except Exception as e:
+            print(f"Error downloading or processing image: {e}")
+            traceback.print_exc()
+            response_text = "I had trouble processing your image. Could you please try sending it again or describe what you're looking for?"
+    reply_to_message(sender, recipient_phone_id, response_text)
+
 @app.route("/webhook", methods=["GET", "POST"])
 def webhook():
     print(f"Received {request.method} request to /webhook")
@@ -1327,108 +1538,29 @@ def webhook():
                     message_type = msg["type"]
                     print(f"Message type: {message_type}")
                     
-                    # Handle different message types
+                    # Handle different message types; the reply is sent from a worker thread
                     if message_type == "text" and "text" in msg and "body" in msg["text"]:
                         # Handle text messages
                         message_text = msg["text"]["body"]
                         print(f"Message text: {message_text}")
                         
-                        # Process message through Node.js intent router
-                        print(f"Processing message '{message_text}' through Node.js intent router")
-                        response_text = handle_message_with_intent_router(sender, message_text)
-                        print(f"Response from intent router: {response_text}")
+                        if message_workers.submit('text', process_text_message, sender, recipient_phone_id, message_text) is None:
+                            # The text lane is full: answer in the request thread rather than drop the message
+                            process_text_message(sender, recipient_phone_id, message_text)
                     
                     elif message_type == "image" and "image" in msg:
-                        # Handle image messages
+                        # Handle image messages in the vision lane, so they do not hold up text replies
                         print("Received image message")
-                        
-                        # Get image ID
                         image_id = msg["image"].get("id")
                         if not image_id:
                             print("No image ID found in message")
-                            response_text = "I received your image but couldn't process it. Could you please try sending it again?"
-                        else:
-                            print(f"Processing image with ID: {image_id}")
-                            # Get image URL using the Media API
-                            image_url = get_media_url(image_id, recipient_phone_id)
-                            
-                            if not image_url:
-                                print("Failed to get image URL")
-                                response_text = "I received your image but couldn't download it. Could you please try sending it again?"
-                            else:
-                                # Download the image
-                                try:
-                                    # Create temp directory if it doesn't exist
-                                    temp_dir = os.path.join(os.getcwd(), "temp")
-                                    os.makedirs(temp_dir, exist_ok=True)
-                                    
-                                    # Create a unique filename
-                                    image_path = os.path.join(temp_dir, f"whatsapp_image_{image_id}.jpg")
-                                    
-                                    # Download the image
-                                    download_headers = {
-                                        "Authorization": f"Bearer {ACCESS_TOKEN}"
-                                    }
-                                    
-                                    print(f"Downloading image from URL to {image_path}")
-                                    image_response = requests.get(image_url, headers=download_headers)
-                                    
-                                    if image_response.status_code != 200:
-                                        print(f"Failed to download image: {image_response.status_code}")
-                                        response_text = "I received your image but couldn't download it. Could you please try sending it again?"
-                                    else:
-                                        # Save the image to a file
-                                        with open(image_path, 'wb') as f:
-                                            f.write(image_response.content)
-                                        
-                                        print(f"Image downloaded successfully to {image_path}")
-                                        
-                                        # Process the image with Gemini Vision using local file path
-                                        print(f"Processing image with Gemini Vision")
-                                        response_text = process_image_with_gemini(f"file://{image_path}", sender)
-                                        
-                                        # Clean up the temporary file
-                                        try:
-                                            os.remove(image_path)
-                                            print(f"Removed temporary image file: {image_path}")
-                                        except Exception as e:
-                                            print(f"Error removing temporary file: {e}")
-                                except Exception as e:
-                                    print(f"Error downloading or processing image: {e}")
-                                    traceback.print_exc()
-                                    response_text = "I had trouble processing your image. Could you please try sending it again or describe what you're looking for?"
+                            reply_to_message(sender, recipient_phone_id, "I received your image but couldn't process it. Could you please try sending it again?")
+                        elif message_workers.submit('vision', process_image_message, sender, recipient_phone_id, image_id) is None:
+                            reply_to_message(sender, recipient_phone_id, "I'm receiving a lot of photos right now. Could you please send yours again in a minute or describe what you're looking for?")
                     else:
                         # Unsupported message type
                         print(f"Unsupported message type: {message_type}")
-                        response_text = "I received your message but I can only process text and images at the moment."
-                    
-                    # Log user context for debugging
-                    user_context = conversation_context.get_context(sender)
-                    if user_context:
-                        print(f"User context: {json.dumps({k: v for k, v in user_context.items() if k != 'entities'})}")
-                        print(f"Entities in context: {json.dumps(user_context.get('entities', {}))}")
-                    
-                    # Debug info about phone IDs
-                    print(f"Default PHONE_NUMBER_ID from env: {PHONE_NUMBER_ID}")
-                    print(f"Extracted phone_number_id: {recipient_phone_id}")
-                    
-                    # Send response back to WhatsApp using the correct phone number ID
-                    url = f"https://graph.facebook.com/v18.0/{recipient_phone_id}/messages"
-                    headers = {
-                        "Authorization": f"Bearer {ACCESS_TOKEN}",
-                        "Content-Type": "application/json"
-                    }
-                    payload = {
-                        "messaging_product": "whatsapp",
-                        "to": sender,
-                        "type": "text",
-                        "text": {"body": response_text}
-                    }
-                    print(f"Sending response to WhatsApp API: {json.dumps(payload)}")
-                    print(f"Request URL: {url}")
-                    print(f"Request Headers: {headers}")
-                    response = requests.post(url, headers=headers, json=payload)
-                    print(f"WhatsApp API response: {response.status_code} - {response.text}")
+                        reply_to_message(sender, recipient_phone_id, "I received your message but I can only process text and images at the moment.")
                 else:
                     print("Message type not specified in the message")
                     print("Full message structure:", json.dumps(msg, indent=2))
@@ -1495,6 +1627,13 @@ def woocommerce_webhook():
         data = request.get_json()
         print(f"WooCommerce webhook data: {json.dumps(data, indent=2)}")
         
+        # Product webhooks only need to invalidate the cached catalog data
+        topic = request.headers.get("X-WC-Webhook-Topic", "")
+        if topic.startswith("product.") and data and 'id' in data:
+            print(f"Processing product webhook ({topic}) for product #{data['id']}")
+            woocommerce.invalidate_product(data['id'])
+            return "OK", 200
+        
         # Check if this is an order-related webhook
         if data and 'id' in data and 'status' in data:
             print(f"Processing order webhook: Order #{data['id']} with status {data['status']}")
@@ -1532,7 +1671,7 @@ def test_notification():
         # If "latest", get the most recent order
         if order_id == "latest":
             print("Getting most recent order for test notification")
-            recent_orders = woocommerce.get_orders(limit=1)
+            recent_orders = sync_woocommerce.get_orders(limit=1)
             if not recent_orders:
                 return "No orders found", 404
             order = recent_orders[0]
@@ -1540,7 +1679,7 @@ def test_notification():
         else:
             # Get order details from WooCommerce API
             print(f"Getting order #{order_id} for test notification")
-            order = woocommerce.get_order(order_id)
+            order = sync_woocommerce.get_order(order_id)
             if not order:
                 return f"Order #{order_id} not found", 404
             
@@ -1559,12 +1698,98 @@ def test_notification():
         traceback.print_exc()
         return f"Error: {str(e)}", 500
 
+@app.route("/health/woocommerce", methods=["GET"])
+def woocommerce_health():
+    """WooCommerce connection, circuit breaker and cache metrics"""
+    auth_token = request.args.get("token")
+    if auth_token != VERIFY_TOKEN:
+        return "Unauthorized", 401
+    
+    return json.dumps(woocommerce.health(), indent=2), 200, {"Content-Type": "application/json"}
+
+@app.route("/health/conversations", methods=["GET"])
+def conversations_health():
+    """Conversation context count, store and per-user lock contention"""
+    auth_token = request.args.get("token")
+    if auth_token != VERIFY_TOKEN:
+        return "Unauthorized", 401
+    
+    return json.dumps(conversation_context.lock_stats(), indent=2), 200, {"Content-Type": "application/json"}
+
+@app.route("/health/memory", methods=["GET"])
+def memory_health():
+    """Memory used by conversational state and the largest consumers"""
+    auth_token = request.args.get("token")
+    if auth_token != VERIFY_TOKEN:
+        return "Unauthorized", 401
+    
+    top = request.args.get("top", default=10, type=int)
+    return json.dumps(memory_budget.report(top), indent=2), 200, {"Content-Type": "application/json"}
+
+@app.route("/health/workers", methods=["GET"])
+def workers_health():
+    """Queue lengths, running jobs and wait times of the text and vision lanes"""
+    auth_token = request.args.get("token")
+    if auth_token != VERIFY_TOKEN:
+        return "Unauthorized", 401
+    
+    return json.dumps(message_workers.stats(), indent=2), 200, {"Content-Type": "application/json"}
+
+@app.route("/health/vision", methods=["GET"])
+def vision_health():
+    """Image preprocessing savings and vision cache hit rate for Snap-to-Shop"""
+    auth_token = request.args.get("token")
+    if auth_token != VERIFY_TOKEN:
+        return "Unauthorized", 401
+    
+    return json.dumps({"preprocessing": image_preprocessor.stats(), "cache": vision_cache.stats()}, indent=2), 200, {"Content-Type": "application/json"}
+
+def process_image_with_gemini(user_id, image_data, mime_type):
+    """
+    Identify the product in an image and reply with matching products (Snap-to-Shop)
+    
+    Args:
+        user_id (str): User ID for conversation context
+        image_data (bytes): Image file contents
+        mime_type (str): Image MIME type, e.g. image/jpeg
+        
+    Returns:
+        str: Response text
+    """
+    try:
+        # The same photo (or a rescaled copy of it) reuses an earlier analysis; the products are
+        # searched again, so matches found during a store outage are not served later
+        fingerprint = image_hash(image_data)
+        analysis = vision_cache.get(fingerprint)
+        if analysis is None:
+            # Rotate, downscale and re-encode the photo (in a worker process) to cut upload time and tokens
+            image_data, mime_type = image_preprocessor.preprocess(image_data, mime_type)
+            
+            vision_model = genai.GenerativeModel(GEMINI_MODEL)
+            start = time.time()
+            # The answer follows VISION_RESPONSE_SCHEMA and is parsed once for the search and the reply
+            response = vision_model.generate_content([VISION_PROMPT, {"mime_type": mime_type, "data": image_data}],
+                                                     generation_config=VISION_GENERATION_CONFIG)
+            print(f"Gemini Vision response ({len(image_data)} bytes in {time.time() - start:.2f}s): {response.text}")
+            analysis = parse_vision_response(response.text)
+            vision_cache.put(fingerprint, analysis)
+        
+        products = search_products_from_vision(analysis)
+        
+        conversation_context.update_context(user_id, f"[Image sent: {analysis.describe()}]")
+        return format_vision_product_response(analysis, products, user_id)
+        
+    except Exception as e:
+        print(f"Error processing image with Gemini Vision: {e}")
+        traceback.print_exc()
+        return "I had trouble processing your image. Could you please try sending it again or describe what you're looking for?"
+
 def format_vision_product_response(vision_analysis, products, user_id):
     """
     Format the response with product matches from vision analysis
     
     Args:
-        vision_analysis (str): Gemini Vision's analysis of the image
+        vision_analysis (VisionAnalysis or str): Parsed Gemini Vision analysis, or its raw text
         products (list): List of matching products
         user_id (str): User ID for conversation context
         
@@ -1574,72 +1799,53 @@ def format_vision_product_response(vision_analysis, products, user_id):
     try:
         # Update user context with found products
         context = conversation_context.get_context(user_id)
-        if 'last_products' not in context:
-            context['last_products'] = []
-        
-        # Store the products in context
-        context['last_products'] = products
-        context['current_topic'] = 'product_search'
-        context['last_search_page'] = 1
-        
-        # Extract key information from vision analysis
-        product_type = "product"
-        brand_name = ""
-        
-        # Try to extract product type
-        product_type_match = re.search(r'product type[:\s]*(.*?)(?:\n|$)', vision_analysis, re.IGNORECASE)
-        if product_type_match:
-            product_type_raw = product_type_match.group(1).strip()
-            # Clean up product type
-            product_type = re.sub(r'\*\*|\*|not visible|unknown', '', product_type_raw, flags=re.IGNORECASE).strip()
-        
-        # If no product type found, look for it in the text
-        if not product_type or product_type.lower() == "product":
+        with conversation_context.locked(user_id):
+            if 'last_products' not in context:
+                context['last_products'] = []
+        
+            # Store copies of the products in context: the search results may be objects of the
+            # WooCommerce cache, and the memory budget must only count and slim what the context owns
+            context['last_products'] = copy.deepcopy(products)
+            context['current_topic'] = 'product_search'
+            context['last_search_page'] = 1
+        
+            # Remember the matches by ID so "show more" can fetch them in one batch
+            for product in products:
+                if isinstance(product, dict) and 'id' in product:
+                    context['entities']['products'].add(
+                        {'name': product['name'], 'id': product['id'], 'mentioned_at': time.time()}
+                    )
+        
+        analysis = parse_vision_response(vision_analysis)
+        brand_name = analysis.brand
+        product_type = analysis.product_type
+        
+        # If no product type was given, look for one in the description
+        if not product_type:
+            product_type = "product"
+            described = analysis_text(analysis)
             # Check for common product types
             product_types = ["thermostat", "controller", "temperature controller", "compressor", 
                             "refrigeration controller", "digital controller", "valve", "expansion valve"]
             for p_type in product_types:
-                if p_type.lower() in vision_analysis.lower():
+                if p_type in described:
                     product_type = p_type
                     break
         
-        # Try to extract brand name
-        brand_match = re.search(r'brand name[:\s]*(.*?)(?:\n|$)', vision_analysis, re.IGNORECASE)
-        if not brand_match:
-            brand_match = re.search(r'brand[:\s]*(.*?)(?:\n|$)', vision_analysis, re.IGNORECASE)
-            
-        if brand_match:
-            brand_raw = brand_match.group(1).strip()
-            # Check if the brand is not visible
-            if re.search(r'not visible|unknown|none', brand_raw, re.IGNORECASE):
-                brand_name = ""
-            else:
-                # Clean up brand name
-                brand_name = re.sub(r'\*\*|\*', '', brand_raw).strip()
-        
-        # Check for common brand names directly in the text
-        if not brand_name or brand_name.lower() in ["", "not", "none"]:
-            common_brands = ["DRC", "Embraco", "Danfoss", "Bitzer", "Copeland", "Tecumseh", "Aspera"]
-            for brand in common_brands:
-                if brand.lower() in vision_analysis.lower():
-                    brand_name = brand
-                    break
-        
         # Format the response
-        if brand_name and brand_name.lower() not in ["not", "none", ""]:
+        if brand_name:
             response = f"I analyzed your image and identified it as a {brand_name} {product_type}.\n\n"
         else:
             response = f"I analyzed your image and identified it as a {product_type}.\n\n"
         
         # Add a summary of the analysis
-        summary = extract_summary_from_vision(vision_analysis)
-        if summary:
-            response += f"{summary}\n\n"
+        if analysis.summary:
+            response += f"{analysis.summary}\n\n"
         
         # Add matching products section
         if products:
             # Determine if we're showing brand-specific products or category recommendations
-            if brand_name and brand_name.lower() not in ["not", "none", ""]:
+            if brand_name:
                 response += f"Here are some matching {brand_name} products from our inventory:\n\n"
             else:
                 response += f"Here are some {product_type} products from our inventory that might match your needs:\n\n"
@@ -1685,7 +1891,7 @@ def format_vision_product_response(vision_analysis, products, user_id):
                 response += "\n"
             
             # Add follow-up suggestions
-            if brand_name and brand_name.lower() not in ["not", "none", ""]:
+            if brand_name:
                 response += "Would you like more information about any of these products? You can ask for details about a specific product by number or name."
             else:
                 response += f"These are some {product_type} options from our inventory. Would you like more information about any specific product or would you like to see more options?"
@@ -1694,7 +1900,7 @@ def format_vision_product_response(vision_analysis, products, user_id):
             response += "I couldn't find exact matches in our inventory, but I can help you find similar products.\n\n"
             
             # Suggest search terms based on what we know
-            if brand_name and brand_name.lower() not in ["not", "none", ""]:
+            if brand_name:
                 # If we have a brand name, suggest searching for that brand
                 response += f"Would you like to search for other {brand_name} products or similar {product_type}s?"
             elif "temperature controller" in product_type.lower() or "controller" in product_type.lower():
@@ -1720,61 +1926,24 @@ def format_vision_product_response(vision_analysis, products, user_id):
         traceback.print_exc()
         return "I found some products that might match what you're looking for, but I'm having trouble formatting the details. Could you please describe what you're looking for?"
 
-def extract_summary_from_vision(vision_analysis):
+def analysis_text(analysis):
     """
-    Extract a concise summary from the vision analysis
+    Lowercase text of a vision analysis for keyword matching
     
     Args:
-        vision_analysis (str): Gemini Vision's analysis of the image
+        analysis (VisionAnalysis): Parsed Gemini Vision analysis
         
     Returns:
-        str: Concise summary of the product
+        str: Product type, summary and features
     """
-    try:
-        # Extract key features section
-        features_match = re.search(r'key features(.*?)(?:technical specifications|\d\.|$)', vision_analysis, re.IGNORECASE | re.DOTALL)
-        if features_match:
-            features_text = features_match.group(1).strip()
-            # Clean up the text
-            features_text = re.sub(r'\*\*|\*', '', features_text)  # Remove markdown
-            features_text = re.sub(r'\n+', '\n', features_text)    # Remove extra newlines
-            
-            # Limit to a reasonable length
-            if len(features_text) > 200:
-                sentences = re.split(r'[.!?]', features_text)
-                summary = ""
-                for sentence in sentences:
-                    if len(summary) + len(sentence) < 200:
-                        if sentence.strip():
-                            summary += sentence.strip() + ". "
-                    else:
-                        break
-                return summary.strip()
-            return features_text
-        
-        # If no features section, extract the first paragraph
-        paragraphs = vision_analysis.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph and not paragraph.startswith('#') and len(paragraph) > 20:
-                # Clean up the text
-                paragraph = re.sub(r'\*\*|\*', '', paragraph)  # Remove markdown
-                
-                # Limit to a reasonable length
-                if len(paragraph) > 200:
-                    return paragraph[:197] + "..."
-                return paragraph
-                
-        return ""
-    except Exception as e:
-        print(f"Error extracting summary from vision: {e}")
-        return ""
+    return " ".join([analysis.product_type, analysis.summary, *analysis.features]).lower()
 
 def search_products_from_vision(vision_response):
     """
     Search for products based on Gemini Vision's analysis
     
     Args:
-        vision_response (str): Gemini Vision's analysis of the image
+        vision_response (VisionAnalysis or str): Parsed Gemini Vision analysis, or its raw text
         
     Returns:
         list: List of matching products
@@ -1782,21 +1951,9 @@ def search_products_from_vision(vision_response):
     try:
         print(f"Searching products based on vision analysis")
         
-        # Extract key terms from the vision response
-        # Focus on brand names, model numbers, and product types
+        analysis = parse_vision_response(vision_response)
+        described = analysis_text(analysis)
         
-        # Look for product type mentions
-        product_type_patterns = [
-            r'product type[:\s]*(.*?)(?:\n|$)',
-            r'type[:\s]*(.*?)(?:\n|$)',
-            r'identified as[:\s]*(.*?)(?:\n|$)'
-        ]
-        
-        product_types = []
-        for pattern in product_type_patterns:
-            matches = re.findall(pattern, vision_response, re.IGNORECASE)
-            product_types.extend(matches)
-            
         # Extract specific product types we're interested in
         specific_types = ["compressor", "refrigeration", "cooling", "hvac", "air conditioner", "freezer", 
                          "controller", "temperature controller", "digital controller", "thermostat",
@@ -1804,97 +1961,18 @@ def search_products_from_vision(vision_response):
         
         found_types = []
         for p_type in specific_types:
-            if p_type.lower() in vision_response.lower():
+            if p_type in described:
                 found_types.append(p_type)
-                
-        # Add any found product types from patterns
-        for p_type in product_types:
-            # Clean up the product type
-            cleaned_type = re.sub(r'\*\*|\*|not visible|unknown', '', p_type, flags=re.IGNORECASE).strip()
-            if cleaned_type:
-                found_types.append(cleaned_type)
-        
-        # Look for brand names
-        brand_patterns = [
-            r'brand[:\s]*(.*?)(?:\n|$)',
-            r'brand name[:\s]*(.*?)(?:\n|$)',
-            r'manufacturer[:\s]*(.*?)(?:\n|$)'
-        ]
+        if analysis.product_type:
+            found_types.append(analysis.product_type)
         
-        brand_matches = []
-        for pattern in brand_patterns:
-            matches = re.findall(pattern, vision_response, re.IGNORECASE)
-            brand_matches.extend(matches)
-            
-        # Clean up brand matches
-        cleaned_brands = []
-        has_brand = False
-        for brand in brand_matches:
-            # Check if the brand is not visible
-            if re.search(r'not visible|unknown|none', brand, re.IGNORECASE):
-                continue
-                
-            # Remove common words and markdown
-            brand = re.sub(r'not visible|visible|if visible|unknown|\*\*|\*', '', brand, flags=re.IGNORECASE).strip()
-            if brand and len(brand) > 1:  # Ensure it's not empty and more than one character
-                cleaned_brands.append(brand)
-                has_brand = True
-        
-        # Look for model numbers
-        model_patterns = [
-            r'model(?:\s*number|\s*no)?[:\s]*(.*?)(?:\n|$)',
-            r'model(?:\s*name|\s*style)?[:\s]*(.*?)(?:\n|$)',
-            r'(?:part|product)\s*number[:\s]*(.*?)(?:\n|$)'
-        ]
+        cleaned_brands = [analysis.brand] if analysis.brand else []
+        has_brand = analysis.has_brand
+        
+        # Model numbers with the confidence the analysis gave them; it ranks the store queries
+        model_confidence = analysis.model_confidence()
+        cleaned_models = list(model_confidence)
         
-        model_matches = []
-        for pattern in model_patterns:
-            matches = re.findall(pattern, vision_response, re.IGNORECASE)
-            model_matches.extend(matches)
-            
-        # Clean up model matches
-        cleaned_models = []
-        for model in model_matches:
-            # Check if the model is not visible
-            if re.search(r'not visible|unknown|none', model, re.IGNORECASE):
-                continue
-                
-            # Remove common words and markdown
-            model = re.sub(r'not visible|visible|if visible|unknown|\*\*|\*', '', model, flags=re.IGNORECASE).strip()
-            if model and len(model) > 1:  # Ensure it's not empty and more than one character
-                cleaned_models.append(model)
-        
-        # Extract any alphanumeric patterns that might be model numbers
-        # This is a more aggressive approach to find potential model numbers
-        alphanumeric_pattern = r'([A-Z0-9]{2,}[-]?[A-Z0-9]{2,})'
-        potential_models = re.findall(alphanumeric_pattern, vision_response)
-        for model in potential_models:
-            if model not in cleaned_models:
-                cleaned_models.append(model)
-        
-        # Directly check for common brand names in the text
-        common_brands = ["DRC", "Embraco", "Danfoss", "Bitzer", "Copeland", "Tecumseh", "Aspera", "Eliwell", "Carel"]
-        for brand in common_brands:
-            if brand.lower() in vision_response.lower() and brand not in cleaned_brands:
-                cleaned_brands.append(brand)
-                has_brand = True
-                
-        # Extract specific model numbers for Embraco products
-        if "embraco" in vision_response.lower():
-            embraco_model_patterns = [
-                r'(NJ\s*\d{4}\s*[A-Z]{1,2})',  # NJ 6220 Z
-                r'(NEU\s*\d{4}\s*[A-Z]{1,2})',  # NEU 6215 GK
-                r'(EMY\s*\d{2,3})',  # EMY 80
-                r'(FFI\s*\d{2,3})',  # FFI 12
-                r'(NT\s*\d{4}\s*[A-Z]{1,2})'   # NT 6220 GK
-            ]
-            
-            for pattern in embraco_model_patterns:
-                matches = re.findall(pattern, vision_response, re.IGNORECASE)
-                for match in matches:
-                    if match not in cleaned_models:
-                        cleaned_models.append(match)
-                        
         # First identify product categories
         product_categories = []
         
@@ -1953,7 +2031,7 @@ def search_products_from_vision(vision_response):
         if not search_queries:
             # Extract key phrases (sentences containing product-related terms)
             key_phrases = []
-            sentences = re.split(r'[.!?]', vision_response)
+            sentences = re.split(r'[.!?]', analysis.summary)
             product_related_terms = ["product", "device", "equipment", "system", "controller", "compressor", "refrigeration"]
             
             for sentence in sentences:
@@ -1964,24 +2042,24 @@ def search_products_from_vision(vision_response):
                 # Use the first few key phrases as search queries
                 search_queries.extend(key_phrases[:3])
             else:
-                # Fallback to using the first part of the response
-                search_queries = [vision_response[:100]]
+                # Fallback to using the first part of the summary
+                search_queries = [analysis.summary[:100]]
         
         # Remove duplicates and empty strings
         search_queries = list(set([q.strip() for q in search_queries if q.strip()]))
         
         # Additional search queries for common product types
-        if "temperature controller" in vision_response.lower() or "refrigeration controller" in vision_response.lower():
+        if "temperature controller" in described or "refrigeration controller" in described:
             search_queries.extend(["temperature controller", "refrigeration controller", "digital temperature controller"])
-        elif "thermostat" in vision_response.lower():
+        elif "thermostat" in described:
             search_queries.extend(["thermostat", "digital thermostat", "temperature control"])
-        elif "compressor" in vision_response.lower():
+        elif "compressor" in described:
             search_queries.extend(["compressor", "refrigeration compressor", "cooling compressor"])
-        elif "valve" in vision_response.lower():
+        elif "valve" in described:
             search_queries.extend(["expansion valve", "solenoid valve", "refrigeration valve"])
-        elif "condenser" in vision_response.lower():
+        elif "condenser" in described:
             search_queries.extend(["condenser", "refrigeration condenser", "cooling condenser"])
-        elif "evaporator" in vision_response.lower():
+        elif "evaporator" in described:
             search_queries.extend(["evaporator", "refrigeration evaporator", "cooling evaporator"])
             
         # Map general product types to specific categories
@@ -2023,81 +2101,27 @@ def search_products_from_vision(vision_response):
         # Search for products using WooCommerce API if available
         matching_products = []
         
-        if USE_WOOCOMMERCE and woocommerce.is_connected:
+        if USE_WOOCOMMERCE:
             try:
-                # First, try to search by category and model number if available
-                if product_categories and cleaned_models:
-                    print(f"Searching by category and model number")
-                    for category in product_categories:
-                        for model in cleaned_models:
-                            # Get category ID
-                            category_id = None
-                            for cat_id, cat_name in PRODUCT_CATEGORIES.items():
-                                if cat_name == category:
-                                    category_id = cat_id
-                                    break
-                            
-                            if category_id:
-                                # Search in this category with the model number
-                                category_products = woocommerce.get_products(category=category_id, search=model)
-                                if category_products:
-                                    print(f"Found {len(category_products)} products in category {category} with model {model}")
-                                    matching_products.extend(category_products)
-                
-                # If no products found by category and model, try by brand and model
-                if not matching_products and cleaned_brands and cleaned_models:
-                    print(f"Searching by brand and model number")
-                    for brand in cleaned_brands:
-                        for model in cleaned_models:
-                            search_term = f"{brand} {model}"
-                            brand_model_products = woocommerce.advanced_product_search(search_term)
-                            if brand_model_products:
-                                print(f"Found {len(brand_model_products)} products with brand {brand} and model {model}")
-                                matching_products.extend(brand_model_products)
-                
-                # If still no products, try by category only
-                if not matching_products and product_categories:
-                    print(f"Searching by category only")
-                    for category in product_categories:
-                        # Get category ID
-                        category_id = None
-                        for cat_id, cat_name in PRODUCT_CATEGORIES.items():
-                            if cat_name == category:
-                                category_id = cat_id
-                                break
-                        
-                        if category_id:
-                            # Get products from this category
-                            category_products = woocommerce.get_products(category=category_id)
-                            if category_products:
-                                print(f"Found {len(category_products)} products in category {category}")
-                                matching_products.extend(category_products)
+                # Category filters include subcategories, so a child listed with its parent is searched once
+                category_ids = category_service.collapse(
+                    [category_id for category_id in map(category_service.resolve, product_categories) if category_id]
+                )
                 
-                # If still no products, try with search queries
-                if not matching_products:
-                    print(f"Searching with general search queries")
-                    for query in search_queries:
-                        # Use advanced search for better results
-                        query_products = woocommerce.advanced_product_search(query)
-                        if query_products:
-                            print(f"Found {len(query_products)} products for query: {query}")
-                            matching_products.extend(query_products)
-                
-                # Remove duplicates
-                unique_products = {}
-                for product in matching_products:
-                    if product['id'] not in unique_products:
-                        unique_products[product['id']] = product
-                
-                # Return up to 5 unique products
-                return list(unique_products.values())[:5]
+                # Rank the candidate queries and run the best ones within the request budget concurrently
+                plan = plan_queries(brands=cleaned_brands, models=model_confidence, category_ids=category_ids,
+                                    product_types=found_types, queries=search_queries)
+                matching_products = search_with_plan(plan, limit=5)
+                print(f"Found {len(matching_products)} products with {len(plan)} planned queries")
+                if matching_products:
+                    return matching_products
                 
             except Exception as e:
                 print(f"Error searching WooCommerce products: {e}")
                 traceback.print_exc()
                 # Fall back to local database
         
-        # If WooCommerce search failed or is not available, search in local database
+        # If WooCommerce search failed, found nothing or is not available, search in local database
         if not matching_products:
             print("Searching in local database")
             local_matches = []
@@ -2129,13 +2153,13 @@ def search_products_from_vision(vision_response):
 
 def download_whatsapp_image(image_id):
     """
-    Download an image from WhatsApp API
+    Download an image from WhatsApp API into memory
     
     Args:
         image_id (str): The image ID from WhatsApp
         
     Returns:
-        str: Path to the downloaded image or None if failed
+        tuple: (image bytes, MIME type) or None if failed
     """
     try:
         # Get access token from environment
@@ -2165,26 +2189,8 @@ def download_whatsapp_image(image_id):
             
         media_url = media_data['url']
         
-        # Download the actual media file
-        media_response = requests.get(media_url, headers=headers)
-        
-        if media_response.status_code != 200:
-            print(f"Failed to download media: {media_response.status_code}")
-            return None
-            
-        # Create a temporary file to store the image
-        temp_dir = os.path.join(os.getcwd(), "temp")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Create a unique filename
-        filename = os.path.join(temp_dir, f"whatsapp_image_{image_id}.jpg")
-        
-        # Write the image data to the file
-        with open(filename, 'wb') as f:
-            f.write(media_response.content)
-            
-        print(f"Image downloaded successfully to {filename}")
-        return filename
+        # Stream the actual media file into memory (size-capped and checked to be an image)
+        return download_image(media_url, headers=headers)
         
     except Exception as e:
         print(f"Error downloading WhatsApp image: {e}")
@@ -2326,9 +2332,10 @@ def handle_more_products_request(user_id, text):
             return "❓ Es tut mir leid, es gibt derzeit keine weiteren Produkte zum Anzeigen. Bitte versuchen Sie eine neue Suche."
     
     # Increment the product page
-    if 'product_page' not in context:
-        context['product_page'] = 0
-    context['product_page'] += 1
+    with conversation_context.locked(user_id):
+        if 'product_page' not in context:
+            context['product_page'] = 0
+        context['product_page'] += 1
     
     # Get the current topic
     current_topic = context['current_topic']
@@ -2383,18 +2390,8 @@ def handle_more_products_request(user_id, text):
         # Get products for the most recent price range
         min_price, max_price = context['entities']['price_ranges'][-1]
         
-        # Find products in this price range
-        all_products = []
-        for product in PRODUCT_DB:
-            try:
-                price = float(product.get('price_eur', '0').replace('€', '').replace(',', '.').strip())
-                if min_price <= price <= max_price:
-                    all_products.append(product)
-            except (ValueError, TypeError):
-                continue
-        
-        # Sort products by price
-        all_products.sort(key=lambda x: float(x.get('price_eur', '0').replace('€', '').replace(',', '.').strip()))
+        # Find products in this price range (sorted by price)
+        all_products = PRODUCT_PRICE_INDEX.query(min_price, max_price)
         
         # Get the current page of products
         start_idx = (context['product_page'] - 1) * 5
@@ -2409,10 +2406,22 @@ def handle_more_products_request(user_id, text):
     
     else:
         # Just show the next 5 products from the entities
-        all_products = [{'product_name': p['name'], 'price_eur': '?', 'status': '', 'url': ''} for p in context['entities']['products']]
+        entities = context['entities']['products']
+        all_products = [{'product_name': p['name'], 'price_eur': '?', 'status': '', 'url': ''} for p in entities]
         
-        # Try to find full product info for each product
+        # Products found in WooCommerce are fetched in one batch by ID
+        if USE_WOOCOMMERCE:
+            ids = [p['id'] for p in entities if p.get('id')]
+            by_id = {product['id']: woocommerce_to_local_product(product)
+                     for product in sync_woocommerce.get_products_by_ids(ids)}
+            for i, entity in enumerate(entities):
+                if entity.get('id') in by_id:
+                    all_products[i] = by_id[entity['id']]
+        
+        # Try to find full product info for the remaining products in the local database
         for i, product in enumerate(all_products):
+            if product['url']:
+                continue
             for db_product in PRODUCT_DB:
                 if product['product_name'].lower() in db_product['product_name'].lower():
                     all_products[i] = db_product
@@ -2460,9 +2469,9 @@ def handle_more_products_request(user_id, text):
     # Add product information
     for i, product in enumerate(products_to_show):
         # Add product to entities in context
-        product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
-        if not any(p['name'] == product_entity['name'] for p in context['entities']['products']):
-            context['entities']['products'].append(product_entity)
+        with conversation_context.locked(user_id):
+            product_entity = {'name': product['product_name'], 'mentioned_at': time.time()}
+            context['entities']['products'].add(product_entity)
         
         status_text = "auf Lager" if product.get('status') == "instock" else "nicht auf Lager"
         if is_turkish:
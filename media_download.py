@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+In-memory download of WhatsApp media for the Snap-to-Shop image search.
+
+Images are streamed into memory with a hard size cap and checked by their first bytes,
+then passed to Gemini as inline data; nothing is written to disk.
+"""
+
+import os
+import logging
+import requests
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('media_download')
+
+# Hard cap on the bytes read per image (WhatsApp allows images up to 5 MB)
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+# Seconds to connect / between received bytes
+MEDIA_TIMEOUT = (5, 20)
+CHUNK_SIZE = 64 * 1024
+
+# Image formats accepted by Gemini, by file signature
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+HEIF_BRANDS = {b'heic': 'image/heic', b'heix': 'image/heic', b'mif1': 'image/heif', b'msf1': 'image/heif'}
+
+def detect_image_type(data):
+    """
+    MIME type of an image from its first bytes
+
+    The signature is checked instead of the Content-Type header, which is not always
+    accurate for forwarded media.
+
+    Args:
+        data (bytes): Start of the file (at least 12 bytes)
+
+    Returns:
+        str: MIME type, or None if the data is not a supported image
+    """
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp':
+        return HEIF_BRANDS.get(data[8:12])
+    return None
+
+def download_image(url, headers=None, max_bytes=None):
+    """
+    Stream an image into memory
+
+    The download is aborted as soon as it exceeds max_bytes (or the announced
+    Content-Length does), or when the first bytes are not a supported image.
+
+    Args:
+        url (str): Media URL
+        headers (dict): Request headers, e.g. the Authorization header of the WhatsApp API
+        max_bytes (int): Size cap (default MAX_IMAGE_BYTES)
+
+    Returns:
+        tuple: (image bytes, MIME type), or None if the download failed or was rejected
+    """
+    max_bytes = max_bytes or MAX_IMAGE_BYTES
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=MEDIA_TIMEOUT) as response:
+            if response.status_code != 200:
+                logger.error(f"Failed to download image: {response.status_code}")
+                return None
+
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > max_bytes:
+                logger.warning(f"Image rejected: {length} bytes exceeds the limit of {max_bytes}")
+                return None
+
+            buffer = bytearray()
+            mime_type = None
+            for chunk in response.iter_content(CHUNK_SIZE):
+                buffer += chunk
+                if len(buffer) > max_bytes:
+                    logger.warning(f"Image rejected: more than {max_bytes} bytes")
+                    return None
+                if mime_type is None and len(buffer) >= 12:
+                    mime_type = detect_image_type(bytes(buffer[:12]))
+                    if mime_type is None:
+                        logger.warning(f"Rejected media that is not a supported image: {bytes(buffer[:12])!r}")
+                        return None
+
+            if mime_type is None:
+                logger.warning(f"Rejected media of {len(buffer)} bytes that is not a supported image")
+                return None
+            logger.info(f"Downloaded {mime_type} image of {len(buffer)} bytes")
+            return bytes(buffer), mime_type
+
+    except requests.RequestException as e:
+        logger.error(f"Error downloading image: {e}")
+        return None
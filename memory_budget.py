@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Memory accounting and a global budget for per-user conversational state.
+
+Three structures grow with the number of users: the conversation contexts, the Gemini
+chat sessions in main.CHAT_HISTORY and the product payloads stored in a context by the
+image search ('last_products', copies owned by the context, never shared with the
+WooCommerce cache). MemoryBudget measures them per user after each message
+and, once the total exceeds the budget, reclaims memory from the least recently active
+users, cheapest loss first:
+
+    1. product payloads are reduced to the fields needed for follow-up questions
+    2. message and chat histories are cut to the last few exchanges
+    3. chat sessions are dropped (recreated on the user's next message)
+
+Sizes are estimates (sys.getsizeof of the object graph), good enough to rank users and
+structures, not an exact RSS figure.
+"""
+
+import os
+import sys
+import logging
+import threading
+from collections import deque
+
+from conversation_context import MessageBuffer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('memory_budget')
+
+# Global budget for conversational state
+MEMORY_BUDGET_MB = float(os.getenv("CONTEXT_MEMORY_BUDGET_MB", "256"))
+# Eviction stops once usage is below this share of the budget
+LOW_WATERMARK = 0.9
+# Messages / chat exchanges kept when histories are cut
+KEEP_MESSAGES = 6
+KEEP_CHAT_TURNS = 3
+# Product fields kept when 'last_products' payloads are reduced
+SLIM_PRODUCT_FIELDS = ('id', 'name', 'price', 'permalink', 'stock_status', 'sku')
+# Sessions start with the system prompt exchange, which is always kept
+SESSION_PROMPT_ENTRIES = 2
+
+STRUCTURES = ('messages', 'entities', 'last_products', 'context_other', 'chat_session')
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate bytes held by an object and everything it references
+
+    Args:
+        obj: Object to measure
+        seen (set): Ids already counted (shared objects are counted once)
+
+    Returns:
+        int: Size in bytes
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+def session_sizeof(session):
+    """
+    Approximate bytes held by a Gemini chat session
+
+    The history entries are protobuf messages, for which sys.getsizeof says little;
+    the text of their parts is what grows.
+    """
+    size = sys.getsizeof(session)
+    for content in getattr(session, 'history', None) or []:
+        size += sys.getsizeof(content)
+        for part in getattr(content, 'parts', None) or []:
+            size += sys.getsizeof(getattr(part, 'text', '') or '')
+    return size
+
+def slim_product(product):
+    """Product payload reduced to the fields used by follow-up questions"""
+    if not isinstance(product, dict):
+        return product
+    return {field: product[field] for field in SLIM_PRODUCT_FIELDS if field in product}
+
+class MemoryBudget:
+    """
+    Per-user memory accounting for ConversationContext and the chat sessions, with
+    eviction of heavy fields from the least recently active users over budget.
+    """
+    def __init__(self, contexts, sessions, budget_mb=None):
+        """
+        Args:
+            contexts (ConversationContext): Context manager (its contexts are ordered by activity)
+            sessions (dict): user_id -> chat session (main.CHAT_HISTORY)
+            budget_mb (float): Budget in MB (default CONTEXT_MEMORY_BUDGET_MB)
+        """
+        self.contexts = contexts
+        self.sessions = sessions
+        self.budget = int((budget_mb if budget_mb is not None else MEMORY_BUDGET_MB) * 1024 * 1024)
+        # user_id -> {structure: bytes}
+        self._usage = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._enforce_lock = threading.Lock()
+        self.evictions = {'last_products': 0, 'messages': 0, 'chat_session': 0}
+
+    def measure(self, user_id):
+        """
+        Bytes held for one user, per structure
+
+        Must be called while holding the user's lock (see ConversationContext.locked).
+        """
+        usage = dict.fromkeys(STRUCTURES, 0)
+        context = self.contexts.contexts.get(user_id)
+        if context is not None:
+            seen = set()
+            usage['messages'] = deep_sizeof(context.get('messages'), seen)
+            usage['entities'] = deep_sizeof(context.get('entities'), seen)
+            usage['last_products'] = deep_sizeof(context.get('last_products'), seen)
+            usage['context_other'] = deep_sizeof(context, seen)
+        session = self.sessions.get(user_id)
+        if session is not None:
+            usage['chat_session'] = session_sizeof(session)
+        return usage
+
+    def _record(self, user_id, usage):
+        """Store the usage of a user and update the total"""
+        with self._lock:
+            previous = self._usage.pop(user_id, None)
+            if previous:
+                self._total -= sum(previous.values())
+            if any(usage.values()):
+                self._usage[user_id] = usage
+                self._total += sum(usage.values())
+
+    def account(self, user_id):
+        """
+        Re-measure a user after a message and enforce the budget
+
+        Call outside the user's request handler (it takes other users' locks when evicting).
+
+        Returns:
+            int: Bytes reclaimed by eviction
+        """
+        with self.contexts.locked(user_id):
+            usage = self.measure(user_id)
+        self._record(user_id, usage)
+        if self._total > self.budget:
+            return self.enforce(protect=user_id)
+        return 0
+
+    def _prune(self):
+        """Forget users whose context expired and who have no chat session"""
+        with self._lock:
+            gone = [user_id for user_id in self._usage
+                    if user_id not in self.contexts.contexts and user_id not in self.sessions]
+            for user_id in gone:
+                self._total -= sum(self._usage.pop(user_id).values())
+
+    def _eviction_order(self):
+        """Users from least to most recently active; sessions without a context come first"""
+        active = self.contexts.active_users()
+        known = set(active)
+        return [user_id for user_id in list(self.sessions) if user_id not in known] + active
+
+    def _slim_products(self, user_id, context, session):
+        """Stage 1: reduce the stored product payloads"""
+        products = context.get('last_products') if context else None
+        if not products or all(product == slim_product(product) for product in products):
+            return False
+        context['last_products'] = [slim_product(product) for product in products]
+        return True
+
+    def _trim_history(self, user_id, context, session):
+        """Stage 2: keep the last messages and chat exchanges"""
+        trimmed = False
+        if context and len(context['messages']) > KEEP_MESSAGES:
+            messages = MessageBuffer(context['messages'].tail(KEEP_MESSAGES))
+            messages.version = context['messages'].version + 1
+            context['messages'] = messages
+            trimmed = True
+        history = getattr(session, 'history', None) if session is not None else None
+        keep = SESSION_PROMPT_ENTRIES + KEEP_CHAT_TURNS * 2
+        if history and len(history) > keep:
+            try:
+                session.history = list(history[:SESSION_PROMPT_ENTRIES]) + list(history[-KEEP_CHAT_TURNS * 2:])
+                trimmed = True
+            except Exception as e:
+                logger.debug(f"Chat history cannot be trimmed: {e}")
+        return trimmed
+
+    def _drop_session(self, user_id, context, session):
+        """Stage 3: drop the chat session"""
+        return self.sessions.pop(user_id, None) is not None
+
+    def enforce(self, protect=None):
+        """
+        Evict heavy fields of the least recently active users until usage is below
+        the low watermark. Runs in one thread at a time; concurrent calls return at once.
+
+        Args:
+            protect (str): User that is never evicted (the one just served)
+
+        Returns:
+            int: Bytes reclaimed
+        """
+        if not self._enforce_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._prune()
+            start = self._total
+            target = self.budget * LOW_WATERMARK
+            stages = (
+                ('last_products', self._slim_products),
+                ('messages', self._trim_history),
+                ('chat_session', self._drop_session),
+            )
+            for name, evict in stages:
+                for user_id in self._eviction_order():
+                    if self._total <= target:
+                        break
+                    if user_id == protect:
+                        continue
+                    with self.contexts.locked(user_id):
+                        context = self.contexts.contexts.get(user_id)
+                        if evict(user_id, context, self.sessions.get(user_id)):
+                            self.evictions[name] += 1
+                            usage = self.measure(user_id)
+                        else:
+                            continue
+                    self._record(user_id, usage)
+            reclaimed = start - self._total
+            if reclaimed:
+                logger.info(f"Memory budget: reclaimed {reclaimed / 1024:.0f} KB, "
+                            f"now {self._total / 1024 / 1024:.1f} of {self.budget / 1024 / 1024:.0f} MB")
+            if self._total > self.budget:
+                logger.warning(f"Memory budget exceeded after eviction: {self._total / 1024 / 1024:.1f} MB")
+            return reclaimed
+        finally:
+            self._enforce_lock.release()
+
+    def report(self, top=10):
+        """
+        Usage totals and the largest consumers
+
+        Args:
+            top (int): Number of users to list
+
+        Returns:
+            dict: JSON-serialisable report
+        """
+        self._prune()
+        with self._lock:
+            usage = {user_id: dict(values) for user_id, values in self._usage.items()}
+            total = self._total
+        by_structure = dict.fromkeys(STRUCTURES, 0)
+        for values in usage.values():
+            for name, size in values.items():
+                by_structure[name] += size
+        largest = sorted(usage.items(), key=lambda item: sum(item[1].values()), reverse=True)[:top]
+        return {
+            'budget_bytes': self.budget,
+            'used_bytes': total,
+            'users': len(usage),
+            'by_structure': by_structure,
+            'evictions': dict(self.evictions),
+            'top_users': [{'user_id': user_id, 'bytes': sum(values.values()), 'structures': values}
+                          for user_id, values in largest],
+        }
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Background processing of incoming WhatsApp messages in two lanes.
+
+Image messages take 5-20 times longer than text (download, Gemini Vision, several store
+searches). Each message becomes a job in the text or the vision lane, and the webhook
+returns at once. Every lane has its own queue cap and concurrency limit. The worker
+threads always take queued text jobs first, and at most MESSAGE_VISION_WORKERS of them
+run vision jobs at a time, so a burst of photos cannot delay simple text replies.
+Jobs hold a user's context lock only while changing in-memory state, never across
+network calls, so a running vision job does not stall text jobs sharing its lock stripe.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('message_workers')
+
+# Concurrent jobs per lane; text jobs may also use threads idle under the vision limit
+MESSAGE_TEXT_WORKERS = int(os.getenv("MESSAGE_TEXT_WORKERS", "8"))
+MESSAGE_VISION_WORKERS = int(os.getenv("MESSAGE_VISION_WORKERS", "2"))
+# Jobs waiting per lane before new ones are rejected
+MESSAGE_TEXT_QUEUE = int(os.getenv("MESSAGE_TEXT_QUEUE", "200"))
+MESSAGE_VISION_QUEUE = int(os.getenv("MESSAGE_VISION_QUEUE", "20"))
+
+# Lanes in priority order
+LANES = ('text', 'vision')
+
+class MessageWorkers:
+    """
+    Worker threads serving a text and a vision lane, text first
+
+    The pool has text_workers + vision_workers threads. A free thread takes the oldest
+    text job; it only takes a vision job when no text job is waiting and fewer than
+    vision_workers vision jobs are running.
+    """
+    def __init__(self, text_workers=None, vision_workers=None, text_queue=None, vision_queue=None):
+        """
+        Args:
+            text_workers (int): Threads reserved for text jobs (default MESSAGE_TEXT_WORKERS)
+            vision_workers (int): Maximum concurrent vision jobs (default MESSAGE_VISION_WORKERS)
+            text_queue (int): Waiting text jobs allowed (default MESSAGE_TEXT_QUEUE)
+            vision_queue (int): Waiting vision jobs allowed (default MESSAGE_VISION_QUEUE)
+        """
+        self.limits = {
+            'text': MESSAGE_TEXT_WORKERS if text_workers is None else text_workers,
+            'vision': MESSAGE_VISION_WORKERS if vision_workers is None else vision_workers,
+        }
+        self.queue_caps = {
+            'text': MESSAGE_TEXT_QUEUE if text_queue is None else text_queue,
+            'vision': MESSAGE_VISION_QUEUE if vision_queue is None else vision_queue,
+        }
+        # lane -> deque of (queued at, function, args)
+        self._queues = {lane: deque() for lane in LANES}
+        self._running = dict.fromkeys(LANES, 0)
+        self._stats = {lane: {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0,
+                              'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'run_seconds': 0.0}
+                       for lane in LANES}
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def _start(self):
+        """Start the worker threads on first use (called with the condition held)"""
+        if self._threads:
+            return
+        for number in range(sum(self.limits.values())):
+            thread = threading.Thread(target=self._work, name=f"message-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {len(self._threads)} message workers "
+                    f"(at most {self.limits['vision']} on vision jobs)")
+
+    def submit(self, lane, func, *args):
+        """
+        Queue a job
+
+        Args:
+            lane (str): 'text' or 'vision'
+            func (callable): Job, called as func(*args) on a worker thread
+            *args: Arguments of the job
+
+        Returns:
+            int: Jobs ahead of it in its lane (0 means it starts right away when a thread is free),
+                 or None if the lane's queue is full
+        """
+        with self._condition:
+            queue = self._queues[lane]
+            if len(queue) >= self.queue_caps[lane]:
+                self._stats[lane]['rejected'] += 1
+                logger.warning(f"{lane} queue full ({len(queue)} jobs), job rejected")
+                return None
+            self._start()
+            queue.append((time.perf_counter(), func, args))
+            self._stats[lane]['submitted'] += 1
+            self._condition.notify()
+            return len(queue) - 1
+
+    def _next_job(self):
+        """Lane and job to run next, text first (called with the condition held)"""
+        if self._queues['text']:
+            return 'text', self._queues['text'].popleft()
+        if self._queues['vision'] and self._running['vision'] < self.limits['vision']:
+            return 'vision', self._queues['vision'].popleft()
+        return None, None
+
+    def _work(self):
+        """Worker thread loop"""
+        while True:
+            with self._condition:
+                lane, job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    lane, job = self._next_job()
+                self._running[lane] += 1
+
+            queued_at, func, args = job
+            start = time.perf_counter()
+            failed = False
+            try:
+                func(*args)
+            except Exception as e:
+                failed = True
+                logger.error(f"{lane} job {getattr(func, '__name__', func)} failed: {e}", exc_info=True)
+
+            with self._condition:
+                self._running[lane] -= 1
+                stats = self._stats[lane]
+                stats['failed' if failed else 'completed'] += 1
+                stats['wait_seconds'] += start - queued_at
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], start - queued_at)
+                stats['run_seconds'] += time.perf_counter() - start
+                # A finished vision job may let a waiting one start
+                if lane == 'vision' and self._queues['vision']:
+                    self._condition.notify()
+
+    def join(self, timeout=None):
+        """
+        Wait until all queued and running jobs are done
+
+        Returns:
+            bool: True if the lanes are idle
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._condition:
+                if not any(self._queues.values()) and not any(self._running.values()):
+                    return True
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(0.01)
+
+    def stats(self):
+        """Queue lengths, running jobs and wait times per lane"""
+        with self._condition:
+            report = {}
+            for lane in LANES:
+                stats = self._stats[lane]
+                finished = stats['completed'] + stats['failed']
+                report[lane] = {
+                    'limit': self.limits[lane],
+                    'queue_cap': self.queue_caps[lane],
+                    'queued': len(self._queues[lane]),
+                    'running': self._running[lane],
+                    'submitted': stats['submitted'],
+                    'rejected': stats['rejected'],
+                    'completed': stats['completed'],
+                    'failed': stats['failed'],
+                    'wait_ms_per_job': round(stats['wait_seconds'] / finished * 1000, 1) if finished else 0.0,
+                    'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 1),
+                    'run_ms_per_job': round(stats['run_seconds'] / finished * 1000, 1) if finished else 0.0,
+                }
+            return report
+
+# Create a singleton instance
+message_workers = MessageWorkers()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from woocommerce_fields import ORDER_INDEX_FIELDS, fields_param
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('order_index')
+
+# Phone numbers are matched on their last digits so that "+49 1781 234567", "00491781234567"
+# and "01781234567" all map to the same key
+PHONE_KEY_DIGITS = 9
+MIN_PHONE_DIGITS = 6
+
+# Orders per page during the backfill (WooCommerce maximum) and parallel page fetches
+BACKFILL_PAGE_SIZE = 100
+BACKFILL_WORKERS = 8
+
+# Only the fields the index needs are requested from the store
+INDEX_FIELDS = fields_param(ORDER_INDEX_FIELDS)
+
+def normalize_phone(phone):
+    """
+    Normalise a phone number to its index key
+
+    Args:
+        phone (str): Phone number in any format (WhatsApp ID, +49..., 0049..., 0...)
+
+    Returns:
+        str: Last PHONE_KEY_DIGITS digits, or None if the number is too short
+    """
+    if not phone:
+        return None
+    digits = ''.join(filter(str.isdigit, str(phone)))
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return digits[-PHONE_KEY_DIGITS:]
+
+class PhoneOrderIndex:
+    """
+    Normalised phone -> order IDs index.
+
+    Built once by a parallel paginated backfill, then kept current by add_order()
+    (order webhook and poller) and persisted to a JSON file, so looking up a
+    customer's orders is a dictionary hit instead of a scan over every order.
+    """
+    def __init__(self, fetch_page, persist_path=None):
+        """
+        Args:
+            fetch_page (callable): fetch_page(params) -> (orders, total_pages) for the
+                "orders" endpoint; orders is None if the request failed
+            persist_path (str): JSON file the index is stored in (optional)
+        """
+        self.fetch_page = fetch_page
+        self.persist_path = persist_path
+        self._phone_to_orders = {}
+        self._order_to_phone = {}
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._dirty = False
+        self._autosave_thread = None
+        self.is_built = False
+        # Creation time (GMT, ISO 8601) of the newest indexed order, used to catch up after a restart
+        self.last_order_date = None
+        self.needs_catch_up = False
+        # Newest order date of the loaded file; kept until the catch-up succeeded, as orders
+        # added meanwhile by the webhook or the poller move last_order_date past the downtime
+        self._catch_up_from = None
+
+        if self.persist_path:
+            self.load()
+
+    def add_order(self, order):
+        """
+        Add or update one order in the index
+
+        Args:
+            order (dict): Order data with at least 'id' and 'billing.phone'
+        """
+        order_id = order.get('id')
+        if not order_id:
+            return
+
+        key = normalize_phone((order.get('billing') or {}).get('phone'))
+        created = order.get('date_created_gmt')
+
+        with self._lock:
+            old_key = self._order_to_phone.get(order_id)
+            if old_key and old_key != key:
+                self._phone_to_orders.get(old_key, set()).discard(order_id)
+
+            if key:
+                self._phone_to_orders.setdefault(key, set()).add(order_id)
+                self._order_to_phone[order_id] = key
+            else:
+                self._order_to_phone.pop(order_id, None)
+
+            if created and (not self.last_order_date or created > self.last_order_date):
+                self.last_order_date = created
+            self._dirty = True
+
+    def add_orders(self, orders):
+        """Add a list of orders to the index"""
+        for order in orders:
+            self.add_order(order)
+
+    def lookup(self, phone):
+        """
+        Find the orders placed with a phone number
+
+        Args:
+            phone (str): Phone number in any format
+
+        Returns:
+            list: Order IDs, newest first
+        """
+        key = normalize_phone(phone)
+        if not key:
+            return []
+        with self._lock:
+            return sorted(self._phone_to_orders.get(key, ()), reverse=True)
+
+    def size(self):
+        """Return the number of indexed orders"""
+        with self._lock:
+            return len(self._order_to_phone)
+
+    def ensure_built(self):
+        """
+        Make the index usable: backfill it if it was never built, or fetch the orders
+        created since the last persisted state if it was loaded from disk
+
+        Returns:
+            bool: True if the index is ready
+        """
+        if self.is_built and not self.needs_catch_up:
+            return True
+
+        with self._build_lock:
+            if not self.is_built:
+                return self.build()
+            if self.needs_catch_up:
+                self.catch_up()
+            return True
+
+    def ensure_built_in_background(self):
+        """Run ensure_built on a daemon thread, unless a build or catch-up is already running"""
+        if self._build_lock.locked():
+            return
+        threading.Thread(target=self.ensure_built, daemon=True).start()
+
+    def build(self):
+        """
+        Backfill the index from every order in the store, fetching pages in parallel
+
+        Returns:
+            bool: True if all pages were fetched
+        """
+        start = time.time()
+        params = {"page": 1, "per_page": BACKFILL_PAGE_SIZE, "_fields": INDEX_FIELDS}
+        orders, total_pages = self.fetch_page(params)
+        if orders is None:
+            logger.error("Order index backfill failed on the first page")
+            return False
+
+        self.add_orders(orders)
+        complete = True
+
+        if total_pages > 1:
+            def fetch(page):
+                return self.fetch_page(dict(params, page=page))[0]
+
+            with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as executor:
+                for page_orders in executor.map(fetch, range(2, total_pages + 1)):
+                    if page_orders is None:
+                        complete = False
+                        continue
+                    self.add_orders(page_orders)
+
+        if not complete:
+            logger.error("Order index backfill incomplete, will retry on next use")
+            return False
+
+        with self._lock:
+            self.is_built = True
+            self.needs_catch_up = False
+        logger.info(f"Built phone order index: {len(self._order_to_phone)} orders, "
+                    f"{len(self._phone_to_orders)} phone numbers, {total_pages} pages in {time.time() - start:.1f}s")
+        self.save()
+        return True
+
+    def catch_up(self):
+        """Index the orders created since the newest order in the persisted index"""
+        params = {"page": 1, "per_page": BACKFILL_PAGE_SIZE, "_fields": INDEX_FIELDS}
+        if self._catch_up_from:
+            params["after"] = self._catch_up_from
+
+        page = 1
+        while True:
+            orders, total_pages = self.fetch_page(dict(params, page=page))
+            if orders is None:
+                logger.error("Order index catch-up failed, will retry on next use")
+                return False
+            self.add_orders(orders)
+            if page >= total_pages:
+                break
+            page += 1
+
+        with self._lock:
+            self.needs_catch_up = False
+            self._catch_up_from = None
+        self.save()
+        return True
+
+    def save(self, path=None):
+        """
+        Persist the index to a JSON file
+
+        Returns:
+            bool: True if the index was written
+        """
+        path = path or self.persist_path
+        if not path:
+            return False
+
+        try:
+            with self._lock:
+                data = {
+                    'version': 1,
+                    'saved_at': datetime.utcnow().isoformat(),
+                    # While a catch-up is pending, a restart must catch up from the same point
+                    'last_order_date': self._catch_up_from if self.needs_catch_up else self.last_order_date,
+                    'orders': {str(order_id): key for order_id, key in self._order_to_phone.items()},
+                }
+                self._dirty = False
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving order index to {path}: {e}")
+            return False
+
+    def load(self, path=None):
+        """
+        Load a persisted index; it is marked as needing a catch-up with the store
+
+        Returns:
+            int: Number of loaded orders
+        """
+        path = path or self.persist_path
+        if not path or not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            with self._lock:
+                for order_id, key in data.get('orders', {}).items():
+                    order_id = int(order_id)
+                    self._order_to_phone[order_id] = key
+                    self._phone_to_orders.setdefault(key, set()).add(order_id)
+                self.last_order_date = self._catch_up_from = data.get('last_order_date')
+                self.is_built = True
+                self.needs_catch_up = True
+
+            logger.info(f"Loaded phone order index with {len(self._order_to_phone)} orders from {path}")
+            return len(self._order_to_phone)
+        except Exception as e:
+            logger.error(f"Error loading order index from {path}: {e}")
+            return 0
+
+    def start_autosave(self, interval=60):
+        """Persist the index periodically when it changed, and once more at exit"""
+        if not self.persist_path or self._autosave_thread:
+            return
+
+        def autosave():
+            while True:
+                time.sleep(interval)
+                if self._dirty:
+                    self.save()
+
+        self._autosave_thread = threading.Thread(target=autosave, daemon=True)
+        self._autosave_thread.start()
+        atexit.register(lambda: self._dirty and self.save())
@@ -10,6 +10,7 @@ import threading
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from woocommerce_client import woocommerce
+from woocommerce_async import sync_woocommerce
 import traceback
 
 # Load environment variables from .env file
@@ -178,6 +179,14 @@ def handle_order_webhook(data):
             
         logger.info(f"Processing webhook for order #{order_id} with status {order_status}")
         
+        # The order changed, so any cached copy is out of date
+        woocommerce.invalidate_order(order_id)
+        # Keep the phone -> orders index current (the payload carries the billing phone)
+        woocommerce.order_index.add_order(data)
+        # The payload is the full order, so get_order() below is served from the cache
+        if data.get('line_items') is not None and data.get('billing'):
+            woocommerce.prime_order(data)
+        
         # Only process new orders
         if order_status in ['processing', 'pending']:
             # Add to processed orders set to avoid duplicate notifications
@@ -188,7 +197,7 @@ def handle_order_webhook(data):
                 
             # Get full order details from WooCommerce API
             logger.info(f"Fetching full details for order #{order_id}")
-            order = woocommerce.get_order(order_id)
+            order = sync_woocommerce.get_order(order_id)
             
             if order:
                 # Add to processed orders set
@@ -220,13 +229,21 @@ def check_for_new_orders():
             current_time = datetime.now()
             # Check every 5 minutes instead of every hour
             if current_time - last_checked_time > timedelta(minutes=5):
+                # Don't advance the check window while the store is unreachable,
+                # otherwise orders placed during the outage would be skipped
+                if not woocommerce.is_connected:
+                    logger.info("WooCommerce API not reachable, postponing order check")
+                    time.sleep(60)
+                    continue
+                
                 logger.info("Checking for new orders")
                 
                 # Get new orders from WooCommerce API
-                new_orders = woocommerce.get_orders(status=['processing', 'pending'], after=last_checked_time)
+                new_orders = sync_woocommerce.get_orders(status=['processing', 'pending'], after=last_checked_time)
                 
                 if new_orders:
                     logger.info(f"Found {len(new_orders)} new orders")
+                    woocommerce.order_index.add_orders(new_orders)
                     for order in new_orders:
                         order_id = order.get('id')
                         if order_id and order_id not in last_processed_orders:
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import bisect
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('product_price_index')
+
+def parse_price(value):
+    """
+    Parse a price from the product database or the store
+
+    Accepts numbers and strings such as "79.45", "79,45 €", "1.234,56" or "EUR 1,234.56".
+
+    Args:
+        value: Price as number or string
+
+    Returns:
+        float: Price, or None if it cannot be parsed
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = re.sub(r'[^\d.,-]', '', str(value))
+    if not text:
+        return None
+    # With both separators the last one is the decimal separator
+    if ',' in text and '.' in text:
+        decimal = ',' if text.rfind(',') > text.rfind('.') else '.'
+        thousands = '.' if decimal == ',' else ','
+        text = text.replace(thousands, '').replace(decimal, '.')
+    elif ',' in text:
+        # A lone comma is decimal when followed by 1-2 digits ("79,45"), thousands otherwise ("1,234")
+        head, _, tail = text.rpartition(',')
+        text = f"{head.replace(',', '')}.{tail}" if len(tail) <= 2 else text.replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+class ProductPriceIndex:
+    """
+    Local product database sorted by price.
+
+    Price-range questions are answered with two binary searches instead of parsing
+    every product price per request. Products without a parsable price are left out.
+    """
+    def __init__(self, products):
+        """
+        Args:
+            products (list): Product database entries (product_name, price_eur, status, url)
+        """
+        priced = []
+        for product in products:
+            price = parse_price(product.get('price_eur'))
+            if price is not None:
+                priced.append((price, product))
+        priced.sort(key=lambda item: item[0])
+        self._prices = [price for price, _ in priced]
+        self._products = [product for _, product in priced]
+        logger.info(f"Price index built with {len(self._products)} of {len(products)} products")
+
+    def __len__(self):
+        return len(self._products)
+
+    def query(self, min_price=None, max_price=None, stock_status=None, order='asc', limit=None):
+        """
+        Products in a price range, sorted by price
+
+        Args:
+            min_price (float): Lowest price (inclusive)
+            max_price (float): Highest price (inclusive)
+            stock_status (str): Only products with this status, e.g. 'instock' (optional)
+            order (str): 'asc' or 'desc'
+            limit (int): Maximum number of products (optional)
+
+        Returns:
+            list: Matching products
+        """
+        start = 0 if min_price is None else bisect.bisect_left(self._prices, min_price)
+        end = len(self._prices) if max_price is None else bisect.bisect_right(self._prices, max_price)
+        indexes = range(start, end) if order == 'asc' else range(end - 1, start - 1, -1)
+
+        result = []
+        for i in indexes:
+            product = self._products[i]
+            if stock_status and product.get('status') != stock_status:
+                continue
+            result.append(product)
+            if limit and len(result) >= limit:
+                break
+        return result
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('resilience')
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Status codes worth retrying: rate limiting and server-side errors
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class RetryPolicy:
+    """
+    Limited retries with exponential backoff and full jitter.
+
+    The delay before retry n is a random value between 0 and
+    min(max_delay, base_delay * 2**n); a Retry-After header takes precedence.
+    """
+    def __init__(self, max_attempts=None, base_delay=0.5, max_delay=4.0):
+        """
+        Args:
+            max_attempts (int): Total attempts including the first request
+            base_delay (float): Backoff base in seconds
+            max_delay (float): Upper bound of a single delay in seconds
+        """
+        self.max_attempts = max_attempts or int(os.getenv("WC_RETRY_ATTEMPTS", "3"))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, status_code):
+        """True for status codes that are worth retrying"""
+        return status_code in RETRYABLE_STATUS_CODES
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Seconds to wait before the next attempt
+
+        Args:
+            attempt (int): Number of the failed attempt, starting at 0
+            retry_after (str): Value of the Retry-After response header (optional)
+
+        Returns:
+            float: Delay in seconds
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a remote dependency.
+
+    closed: requests pass; failure_threshold consecutive failures open the breaker.
+    open: requests are rejected immediately until reset_timeout has passed.
+    half_open: one trial request is let through; success closes, failure reopens.
+
+    State transitions are counted and kept in a short history for the health endpoint.
+    """
+    def __init__(self, name, failure_threshold=None, reset_timeout=None, on_open=None):
+        """
+        Args:
+            name (str): Name used in logs and metrics
+            failure_threshold (int): Consecutive failures that open the breaker
+            reset_timeout (float): Seconds the breaker stays open before a trial request
+            on_open (callable): Called whenever the breaker opens (optional)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("WC_BREAKER_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("WC_BREAKER_RESET", "30"))
+        self.on_open = on_open
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.state_since = time.time()
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.metrics = {
+            'successes': 0,
+            'failures': 0,
+            'rejected': 0,
+            'transitions': {},
+        }
+        self.history = deque(maxlen=20)
+
+    def _transition(self, new_state):
+        """Switch state and record the transition (caller holds the lock)"""
+        old_state = self.state
+        if old_state == new_state:
+            return
+        self.state = new_state
+        self.state_since = time.time()
+        name = f"{old_state}->{new_state}"
+        self.metrics['transitions'][name] = self.metrics['transitions'].get(name, 0) + 1
+        self.history.append({'transition': name, 'at': datetime.utcnow().isoformat()})
+        logger.warning(f"Circuit breaker '{self.name}' {name}")
+
+    def _refresh_state(self):
+        """Move from open to half-open once the reset timeout has passed (caller holds the lock)"""
+        if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+            self._trial_in_flight = False
+
+    def is_open(self):
+        """True while requests would be rejected (no trial slot is consumed)"""
+        with self._lock:
+            self._refresh_state()
+            return self.state == OPEN or (self.state == HALF_OPEN and self._trial_in_flight)
+
+    def allow_request(self):
+        """
+        Ask permission for one request
+
+        Returns:
+            bool: True if the request may be sent
+        """
+        with self._lock:
+            self._refresh_state()
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.metrics['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """Report a successful request"""
+        with self._lock:
+            self.metrics['successes'] += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        """Report a failed request (after retries)"""
+        opened = False
+        with self._lock:
+            self.metrics['failures'] += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self._transition(OPEN)
+                self.opened_at = time.time()
+                opened = True
+
+        if opened and self.on_open:
+            self.on_open()
+
+    def release(self):
+        """Give back a half-open trial slot when a request ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def snapshot(self):
+        """
+        Current state and metrics
+
+        Returns:
+            dict: JSON-serialisable breaker metrics
+        """
+        with self._lock:
+            self._refresh_state()
+            return {
+                'name': self.name,
+                'state': self.state,
+                'state_since': datetime.utcfromtimestamp(self.state_since).isoformat(),
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'successes': self.metrics['successes'],
+                'failures': self.metrics['failures'],
+                'rejected': self.metrics['rejected'],
+                'transitions': dict(self.metrics['transitions']),
+                'history': list(self.history),
+            }
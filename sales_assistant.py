@@ -4,6 +4,9 @@
 import re
 import random
 from woocommerce_client import woocommerce
+from woocommerce_async import sync_woocommerce
+from woocommerce_fields import PRODUCT_RECOMMENDATION_FIELDS
+from category_service import category_service, DEFAULT_CATEGORIES
 import logging
 
 # Configure logging
@@ -110,17 +113,8 @@ SALES_PHRASES = {
     }
 }
 
-# Product categories with their IDs from WooCommerce
-PRODUCT_CATEGORIES = {
-    'Kompressoren': 132,
-    'Halbhermetische Kompressoren': 86,
-    'Kältesysteme': 74,
-    'Expansionsventile': 95,
-    'Thermostat': 161,
-    'Kühlschranke': 90,
-    'Tiefkühlraumtür': 94,
-    'Klimageräte-Einheiten': 93
-}
+# Built-in category name -> ID map; lookups go through category_service, which follows the store
+PRODUCT_CATEGORIES = {name: category_id for category_id, (name, _slug, _parent) in DEFAULT_CATEGORIES.items()}
 
 def detect_language(text):
     """Detect the language of the input text"""
@@ -278,12 +272,8 @@ def extract_product_requirements(text):
 
 def get_category_products(category_id, limit=5):
     """Get products from a specific category"""
-    if not woocommerce.is_connected:
-        logger.error("WooCommerce API not connected")
-        return []
-    
     try:
-        products = woocommerce.get_products(per_page=limit, category=category_id)
+        products = sync_woocommerce.get_products(per_page=limit, category=category_id)
         return products
     except Exception as e:
         logger.error(f"Error getting category products: {e}")
@@ -291,55 +281,55 @@ def get_category_products(category_id, limit=5):
 
 def get_recommended_products(requirements, limit=3):
     """Get recommended products based on requirements"""
-    if not woocommerce.is_connected:
-        logger.error("WooCommerce API not connected")
-        return []
-    
     try:
-        params = {"per_page": 10}
+        # Category, price range and stock are filtered by the store, so every fetched product is a candidate
+        # (feature matching below needs the long description as well)
+        filters = {"stock_status": "instock", "fields": PRODUCT_RECOMMENDATION_FIELDS}
         
         # Add category filter if specified
-        if requirements['category'] and requirements['category'] in PRODUCT_CATEGORIES:
-            params["category"] = PRODUCT_CATEGORIES[requirements['category']]
+        category_id = category_service.resolve(requirements['category']) if requirements['category'] else None
+        if category_id:
+            filters["category"] = category_id
         
         # Add brand filter if specified
         if requirements['brand']:
-            # We'll filter by brand manually since WooCommerce API doesn't directly support it
-            params["search"] = requirements['brand']
-        
-        products = woocommerce.get_products(**params)
+            # WooCommerce has no brand filter, the brand name is matched by the search instead
+            filters["search"] = requirements['brand']
+        else:
+            # Without a search term, recommend the best sellers first
+            filters["orderby"] = "popularity"
         
-        # Filter by price range if specified
+        # Add price range filter if specified
         if requirements['price_range']:
-            min_price, max_price = requirements['price_range']
-            products = [p for p in products if p.get('price') and float(p['price']) >= min_price and float(p['price']) <= max_price]
+            filters["min_price"], filters["max_price"] = requirements['price_range']
         
-        # Sort by relevance (this is a simple implementation)
-        # In a real system, you'd use a more sophisticated relevance algorithm
-        if products:
-            # If we have features, prioritize products that might match those features
-            if requirements['features']:
-                # This is a simple heuristic - in reality, you'd need product feature data
-                feature_keywords = {
-                    'quiet': ['quiet', 'silent', 'low noise', 'geräuscharm', 'leise'],
-                    'energy-efficient': ['energy', 'efficient', 'saving', 'sparsam', 'energieeffizient'],
-                    'compact': ['compact', 'small', 'mini', 'kompakt', 'klein'],
-                    'powerful': ['powerful', 'strong', 'high performance', 'leistungsstark', 'stark']
-                }
-                
-                # Score products based on feature matches in name and description
-                for product in products:
-                    product['feature_score'] = 0
-                    product_text = (product.get('name', '') + ' ' + product.get('description', '')).lower()
-                    
-                    for feature in requirements['features']:
-                        if feature in feature_keywords:
-                            for keyword in feature_keywords[feature]:
-                                if keyword in product_text:
-                                    product['feature_score'] += 1
-                
-                # Sort by feature score (descending)
-                products.sort(key=lambda p: p.get('feature_score', 0), reverse=True)
+        if not requirements['features']:
+            return sync_woocommerce.find_products(limit, **filters)
+        
+        # This is a simple heuristic - in reality, you'd need product feature data
+        feature_keywords = {
+            'quiet': ['quiet', 'silent', 'low noise', 'geräuscharm', 'leise'],
+            'energy-efficient': ['energy', 'efficient', 'saving', 'sparsam', 'energieeffizient'],
+            'compact': ['compact', 'small', 'mini', 'kompakt', 'klein'],
+            'powerful': ['powerful', 'strong', 'high performance', 'leistungsstark', 'stark']
+        }
+        
+        def feature_score(product):
+            """Feature keyword matches in name and description"""
+            product_text = (product.get('name', '') + ' ' + product.get('description', '')).lower()
+            return sum(1 for feature in requirements['features']
+                       for keyword in feature_keywords.get(feature, [])
+                       if keyword in product_text)
+        
+        # Page only until enough products match a requested feature
+        products = sync_woocommerce.find_products(limit, accept=lambda p: feature_score(p) > 0, **filters)
+        products.sort(key=feature_score, reverse=True)
+        
+        # Top up with the best remaining candidates
+        if len(products) < limit:
+            chosen = {p.get('id') for p in products}
+            candidates = sync_woocommerce.find_products(limit + len(products), **filters)
+            products += [p for p in candidates if p.get('id') not in chosen][:limit - len(products)]
         
         # Return top products
         return products[:limit]
@@ -377,13 +367,12 @@ def format_product_recommendation(product, lang='de'):
 def format_category_recommendation(category_name, lang='de'):
     """Format a category recommendation message"""
     try:
-        category_id = PRODUCT_CATEGORIES.get(category_name)
+        category_id = category_service.resolve(category_name)
         if not category_id:
             return f"❌ Category {category_name} not found"
         
-        # Get the category URL
-        store_url = "https://durmusbaba.de"
-        category_url = f"{store_url}/product-category/{category_name.lower().replace(' ', '-')}/"
+        # Get the category URL (slug path including parent categories)
+        category_url = category_service.url(category_id)
         
         # Format the message based on language
         if lang == 'de':
@@ -427,7 +416,7 @@ def handle_sales_inquiry(text, user_id=None):
             response += format_category_recommendation(category_name, lang) + "\n\n"
             
             # Get and recommend products from this category
-            category_id = PRODUCT_CATEGORIES.get(category_name)
+            category_id = category_service.resolve(category_name)
             if category_id:
                 products = get_category_products(category_id, limit=3)
                 if products:
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from fake_woocommerce_server import FakeWooCommerceStore, CATEGORIES
+from category_service import CategoryService, normalize_category_name
+
+STORE = FakeWooCommerceStore.synthetic(products=200, orders=0)
+
+class StubClient:
+    """Serves the fake store's categories, or nothing while 'offline'"""
+    def __init__(self, online=True):
+        self.online = online
+        self.calls = 0
+
+    def get_product_categories(self):
+        self.calls += 1
+        return STORE.categories() if self.online else []
+
+def test_lookups():
+    """Categories are found by id, slug, store name and localized aliases"""
+    service = CategoryService(StubClient(), store_url="https://shop.example")
+    assert service.get(132)["name"] == "Kompressoren"
+    assert service.get_by_slug("kaltesysteme")["id"] == 74
+    assert service.find("Kältesysteme")["id"] == 74
+    assert service.find("KAELTESYSTEME")["id"] == 74
+    assert service.find("cooling system")["id"] == 74
+    assert service.find("soğutma sistemi")["id"] == 74
+    assert service.resolve("Klimageräte-Einheiten") == 93
+    assert service.resolve("86") == 86
+    assert service.find("unknown category") is None
+    assert normalize_category_name("Tiefkühlraumtür") == "tiefkuhlraumtur"
+
+def test_tree():
+    """Children, expansion, collapse and nested URLs follow the parent links"""
+    service = CategoryService(StubClient(), store_url="https://shop.example")
+    assert service.children(132) == [86]
+    assert service.expand(132) == [132, 86]
+    assert service.expand(999) == []
+    assert service.ancestors(86) == [132]
+    assert service.collapse([86, 132, 161, 132]) == [132, 161]
+    assert service.url(86) == "https://shop.example/product-category/kompressoren/halbhermetische-kompressoren/"
+
+def test_ttl_and_fallback():
+    """Indexes are rebuilt after the TTL; the built-in categories are used while offline"""
+    client = StubClient(online=False)
+    service = CategoryService(client, ttl=3600)
+    assert service.find("Thermostat")["id"] == 161
+    assert service.info()["source"] == "default"
+    assert len(service.all()) == len(CATEGORIES)
+
+    client.online = True
+    service._expires_at = 0
+    assert service.info()["source"] == "store"
+    calls = client.calls
+    service.get(132)
+    service.find("compressor")
+    assert client.calls == calls
+
+    # A failed reload keeps the tree loaded from the store
+    client.online = False
+    service._expires_at = 0
+    assert service.info()["source"] == "store"
+
+if __name__ == "__main__":
+    test_lookups()
+    test_tree()
+    test_ttl_and_fallback()
+    print("✅ All category service tests passed")
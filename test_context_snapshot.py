@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+from conversation_context import ConversationContext
+from context_snapshot import ContextSnapshot
+
+def snapshot_path(directory):
+    return os.path.join(directory, "contexts.snapshot")
+
+def test_snapshot_round_trip():
+    """A restarted manager continues the conversations of the snapshot, decoding users lazily"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = snapshot_path(directory)
+        manager = ConversationContext()
+        manager.update_context("user1", "Haben Sie Embraco NJ 9232?")
+        manager.get_context("user1")['last_products'] = [{'id': 7, 'name': "Embraco NJ 9232"}]
+        manager.update_context("user2", "Wo ist meine Bestellung #12345?")
+        assert manager.snapshot(path) == 2
+
+        restarted = ConversationContext()
+        assert restarted.restore(path) == 2
+        assert len(restarted.contexts) == 0
+        context = restarted.get_context("user1")
+        assert context['messages'][-1]['text'] == "Haben Sie Embraco NJ 9232?"
+        assert context['entities']['products'].contains_key("embraco nj 9232")
+        assert context['last_products'][0]['id'] == 7
+        assert len(restarted._snapshot) == 1
+
+        # user2 was never touched, but survives the next snapshot without being decoded
+        restarted.update_context("user3", "Hallo")
+        assert restarted.snapshot(path) == 3
+        again = ConversationContext()
+        again.restore(path)
+        assert list(again.get_context("user2")['entities']['orders']) == ["12345"]
+
+def test_expired_and_unreadable_snapshots():
+    """Expired contexts are not restored and a foreign file is ignored"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = snapshot_path(directory)
+        manager = ConversationContext()
+        manager.update_context("old", "Hallo")
+        manager.get_context("old")['last_updated'] = time.time() - 49 * 3600
+        manager.snapshot(path)
+        restarted = ConversationContext()
+        restarted.restore(path)
+        assert len(restarted.get_context("old")['messages']) == 0
+        assert restarted.snapshot(path) == 1
+
+        with open(path, 'wb') as f:
+            f.write(b"not a snapshot at all")
+        assert len(ContextSnapshot(path)) == 0
+        assert ConversationContext().restore(path) == 0
+        assert ConversationContext().restore(os.path.join(directory, "missing")) == 0
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_expired_and_unreadable_snapshots()
+    print("✅ All context snapshot tests passed")
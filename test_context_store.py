@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+from context_store import MemoryContextStore, SQLiteContextStore
+from conversation_context import ConversationContext
+
+def test_backends():
+    """The SQLite backend stores, loads, purges and deletes records"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteContextStore(os.path.join(directory, "contexts.db"))
+        store.save_many({
+            "old": {'last_updated': 100.0, 'messages': []},
+            "new": {'last_updated': time.time(), 'messages': [{'text': "Grüße"}]},
+        })
+        assert store.count() == 2
+        assert store.load("new")['messages'][0]['text'] == "Grüße"
+        assert store.load("unknown") is None
+        assert store.purge_expired(time.time() - 3600) == 1
+        store.delete("new")
+        assert store.count() == 0
+        store.close()
+
+def test_memory_store_keeps_no_copy():
+    """With the memory store, contexts are neither copied nor marked changed on read"""
+    manager = ConversationContext(store=MemoryContextStore())
+    manager.update_context("user", "Haben Sie Embraco NJ 9238?")
+    manager.get_context("user")
+    assert not manager._dirty
+    assert manager.flush() == 0
+    manager.store.save_many({"user": {'last_updated': time.time(), 'messages': []}})
+    assert manager.store.count() == 0
+    assert manager.store.load("user") is None
+
+def test_write_behind_and_read_through():
+    """Changed contexts reach the store on flush and are loaded again after a restart"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "contexts.db")
+        manager = ConversationContext(store=SQLiteContextStore(path))
+        manager.update_context("4915112345678", "Haben Sie Embraco NJ 9238 unter 400 Euro?")
+        manager.get_context("4915112345678")['product_page'] = 2
+        assert manager.store.count() == 0
+        assert manager.flush() == 1
+        assert manager.flush() == 0
+        manager.store.close()
+
+        restarted = ConversationContext(store=SQLiteContextStore(path))
+        context = restarted.get_context("4915112345678")
+        assert context['messages'][0]['text'].startswith("Haben Sie Embraco")
+        assert context['product_page'] == 2
+        assert list(context['entities']['price_ranges']) == [(0, 400)]
+        restarted.store.close()
+
+def test_expired_record_is_not_loaded():
+    """A stored context older than the expiration starts over"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteContextStore(os.path.join(directory, "contexts.db"))
+        manager = ConversationContext(store=store)
+        store.save_many({"user": {'last_updated': time.time() - manager.expiration_hours * 3600 - 1,
+                                  'messages': [{'text': "alt", 'timestamp': 0, 'is_user': True}]}})
+        assert len(manager.get_context("user")['messages']) == 0
+        store.close()
+
+def test_loaded_context_keeps_expiry_order():
+    """A context read through from the store joins the index as the most recently updated"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteContextStore(os.path.join(directory, "contexts.db"))
+        manager = ConversationContext(store=store)
+        manager.get_context("fresh")
+        store.save_many({"loaded": {'last_updated': time.time() - manager.expiration_hours * 3600 + 60,
+                                    'messages': [{'text': "alt", 'timestamp': 0, 'is_user': True}]}})
+        assert len(manager.get_context("loaded")['messages']) == 1
+        assert list(manager.contexts) == ["fresh", "loaded"]
+        updated = [context['last_updated'] for context in manager.contexts.values()]
+        assert updated == sorted(updated)
+        store.close()
+
+if __name__ == "__main__":
+    test_backends()
+    test_memory_store_keeps_no_copy()
+    test_write_behind_and_read_through()
+    test_expired_record_is_not_loaded()
+    test_loaded_context_keeps_expiry_order()
+    print("✅ All context store tests passed")
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import time
-from conversation_context import conversation_context
+from conversation_context import conversation_context, ConversationContext, BoundedEntitySet, MessageBuffer, MESSAGE_HISTORY
 
 def test_conversation_flow():
     """Test a complete conversation flow with the context manager."""
@@ -95,6 +95,66 @@ def test_conversation_flow():
     print(f"  Price ranges tracked: {context['entities']['price_ranges']}")
     print(f"  Orders tracked: {context['entities']['orders']}")
 
+def test_context_expiry():
+    """Expired contexts are dropped oldest-first; updated contexts move to the young end"""
+    manager = ConversationContext()
+    for user_id in ("a", "b", "c"):
+        manager.get_context(user_id)
+    
+    manager.update_context("a", "hallo")
+    assert list(manager.contexts) == ["b", "c", "a"]
+    
+    # "b" is past the expiration and is removed by the next call
+    manager.contexts["b"]['last_updated'] -= manager.expiration_hours * 3600 + 1
+    manager.get_context("d")
+    assert list(manager.contexts) == ["c", "a", "d"]
+    assert manager.get_context("a")['messages'][-1]['text'] == "hallo"
+
+def test_bounded_history_and_entities():
+    """History and entity lists are capped, and entities are deduplicated"""
+    manager = ConversationContext()
+    for i in range(MESSAGE_HISTORY + 10):
+        manager.update_context("u", f"Haben Sie Embraco NJ {9000 + i}? Bestellung #{10000 + i}")
+    context = manager.get_context("u")
+    assert len(context['messages']) == MESSAGE_HISTORY
+    assert [m['text'] for m in manager.get_recent_messages("u", 2)] == [m['text'] for m in context['messages'][-2:]]
+    assert context['messages'][-1]['text'].startswith(f"Haben Sie Embraco NJ {9000 + MESSAGE_HISTORY + 9}")
+    assert len(context['entities']['orders']) == 20
+    assert context['entities']['orders'][-1] == str(10000 + MESSAGE_HISTORY + 9)
+    
+    products = BoundedEntitySet(maxlen=2, key=lambda p: p['name'])
+    assert products.add({'name': "nj 9238"})
+    assert not products.add({'name': "nj 9238"})
+    products.add({'name': "emy 80"})
+    products.add({'name': "ff 8.5"})
+    assert [p['name'] for p in products] == ["emy 80", "ff 8.5"]
+    assert products.contains_key("ff 8.5") and not products.contains_key("nj 9238")
+    
+    price_ranges = BoundedEntitySet([(0, 300), (100, 500)], refresh=True)
+    price_ranges.append((0, 300))
+    assert price_ranges[-1] == (0, 300) and len(price_ranges) == 2
+
+def test_summary_cached_until_change():
+    """Summaries are rebuilt only after the context changed"""
+    manager = ConversationContext()
+    for i in range(12):
+        manager.update_context("u", f"Haben Sie Embraco NJ {9000 + i}?", is_user=(i % 2 == 0))
+    
+    text = manager.summarize_conversation("u")
+    summary = manager.get_conversation_summary("u")
+    assert manager.summarize_conversation("u") is text
+    assert manager.get_conversation_summary("u") is summary
+    
+    # Changes made directly on the context invalidate the cache as well
+    manager.get_context("u")['entities']['categories'].add('Thermostat')
+    assert "Thermostat" in manager.summarize_conversation("u")
+    assert manager.get_conversation_summary("u")['mentioned_categories'] == ['Thermostat']
+    manager.get_context("u")['current_topic'] = 'order_status'
+    assert "Current topic: order_status" in manager.summarize_conversation("u")
+    
+    manager.update_context("u", "Noch eine Frage")
+    assert "Haben Sie Embraco NJ 9011" in manager.summarize_conversation("u")
+
 def generate_mock_response(message, referenced_entities):
     """Generate a mock bot response based on the message and referenced entities."""
     message_lower = message.lower()
@@ -143,5 +203,24 @@ def generate_mock_response(message, referenced_entities):
     # Default response
     return "Ich habe Ihre Anfrage verstanden. Wie kann ich Ihnen weiterhelfen?"
 
+def test_cold_messages():
+    """Older messages are compressed and still read back in order, with the cap kept exact"""
+    buffer = MessageBuffer(maxlen=20, hot=4)
+    for i in range(50):
+        buffer.append({'text': f"message {i}"})
+        expected = [f"message {n}" for n in range(max(0, i - 19), i + 1)]
+        assert [m['text'] for m in buffer] == expected
+        assert len(buffer) == len(expected)
+        assert [m['text'] for m in buffer.tail(3)] == expected[-3:]
+        assert [m['text'] for m in buffer.tail(10)] == expected[-10:]
+        assert [m['text'] for m in buffer[-2:]] == expected[-2:]
+        assert buffer[0]['text'] == expected[0]
+    assert buffer._cold and len(buffer._hot) < 4 + 8
+    assert [m['text'] for m in MessageBuffer(buffer, maxlen=20, hot=4)] == [m['text'] for m in buffer]
+
 if __name__ == "__main__":
-    test_conversation_flow() 
\ No newline at end of file
+    test_conversation_flow()
+    test_context_expiry()
+    test_bounded_history_and_entities()
+    test_summary_cached_until_change()
+    test_cold_messages()
\ No newline at end of file
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from entity_extraction import analyze, KeywordMatcher
+from entity_extraction_samples import MESSAGES, analyze_baseline
+
+def test_matches_baseline_extraction():
+    """The single-pass engine returns exactly what the original pattern-by-pattern extraction returns"""
+    for message in MESSAGES:
+        assert analyze(message) == analyze_baseline(message), message
+
+def test_analysis_contents():
+    """Entities, topic and reference flags come out of one call"""
+    analysis = analyze("Haben Sie Embraco NJ 9238 unter 400 Euro? Bestellung #12345")
+    assert "embraco nj 9238 un" in analysis.products
+    assert analysis.price_ranges == ((0, 400),)
+    assert analysis.orders == ("12345",)
+    assert analysis.topic == 'product_info'
+    assert analyze("Wann wird diese Bestellung geliefert?").references == {'order'}
+    assert analyze("ja").context_reference
+
+def test_keyword_matcher_overlaps():
+    """Overlapping keywords and keywords inside longer ones are all found"""
+    matcher = KeywordMatcher(["klima", "klimagerät", "gerät", "tür", "türe"])
+    assert matcher.find("ein klimagerät und eine türe") == {"klima", "klimagerät", "gerät", "tür", "türe"}
+    assert matcher.find("nichts") == set()
+
+if __name__ == "__main__":
+    test_matches_baseline_extraction()
+    test_analysis_contents()
+    test_keyword_matcher_overlaps()
+    print("✅ All entity extraction tests passed")
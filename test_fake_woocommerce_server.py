@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from unittest import mock
+from werkzeug.serving import make_server
+from fake_woocommerce_server import FakeWooCommerceStore, create_app, API_PREFIX
+from woocommerce_client import WooCommerceClient
+
+STORE = FakeWooCommerceStore.from_catalog(orders=300)
+
+def get(path, app=None, **params):
+    return (app or create_app(STORE)).test_client().get(f"{API_PREFIX}/{path}", query_string=params)
+
+def test_pagination_and_limits():
+    """Collections carry X-WP-Total/X-WP-TotalPages and reject oversized pages like WordPress"""
+    response = get("orders", per_page=100, page=3)
+    assert response.headers["X-WP-Total"] == "300"
+    assert response.headers["X-WP-TotalPages"] == "3"
+    assert len(response.get_json()) == 100
+    assert get("products", per_page=101).status_code == 400
+    assert get("products/1").status_code == 404
+
+def test_filters_and_projection():
+    """search, category (with child categories), include, after and _fields"""
+    embraco = get("products", search="embraco", per_page=100, _fields="id,name").get_json()
+    assert embraco and all(set(p) == {"id", "name"} and "embraco" in p["name"].lower() for p in embraco)
+
+    in_category = lambda ids: sum(1 for p in STORE.products if p["categories"][0]["id"] in ids)
+    assert get("products", category=132).headers["X-WP-Total"] == str(in_category({132, 86}))
+    assert get("products", category=86).headers["X-WP-Total"] == str(in_category({86}))
+
+    ids = [o["id"] for o in STORE.orders[:3]]
+    included = get("orders", include=",".join(map(str, ids)), _fields="id,billing.phone").get_json()
+    assert sorted(o["id"] for o in included) == sorted(ids)
+    assert all(set(o["billing"]) == {"phone"} for o in included)
+
+    after = STORE.orders[10]["date_created"]
+    assert len(get("orders", after=after, per_page=100).get_json()) == 10
+
+    customer = STORE.customers[0]
+    assert get("customers", email=customer["email"]).get_json()[0]["id"] == customer["id"]
+
+def test_error_injection():
+    """A configured error rate answers with 503 and Retry-After"""
+    app = create_app(STORE, error_rate=1.0, seed=1)
+    response = get("products", app=app)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+@contextmanager
+def running_store():
+    """Serve the fake store over HTTP and yield (app, connected client)"""
+    app = create_app(STORE)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    environment = {
+        "WC_CONSUMER_KEY": "ck_test", "WC_CONSUMER_SECRET": "cs_test",
+        "WC_STORE_URL": f"http://127.0.0.1:{server.server_port}", "WC_ORDER_INDEX_FILE": "",
+    }
+    try:
+        with mock.patch.dict(os.environ, environment), \
+                mock.patch.object(WooCommerceClient, 'start_health_probe'):
+            client = WooCommerceClient()
+            assert client.connect()
+            yield app, client
+    finally:
+        server.shutdown()
+
+def test_client_against_fake_store():
+    """The real client works end to end against the fake store over HTTP"""
+    with running_store() as (app, client):
+        results = client.advanced_product_search("embraco nek", limit=3)
+        assert results and "embraco" in results[0]["name"].lower()
+
+        # The first phone lookup does not wait for the order index; it is built in the background
+        order = STORE.orders[0]
+        assert client.get_customer_orders(phone=order["billing"]["phone"]) == []
+        deadline = time.time() + 5
+        while not client.order_index.is_built and time.time() < deadline:
+            time.sleep(0.05)
+        orders = client.get_customer_orders(phone=order["billing"]["phone"])
+        assert order["id"] in [o["id"] for o in orders]
+        assert app.config["STATS"][f"{API_PREFIX}/orders"] == 4
+
+def test_batch_fetch_by_ids():
+    """IDs are fetched in include= chunks, and cached records are not requested again"""
+    with running_store() as (app, client):
+        stats = app.config["STATS"]
+        probes = stats[f"{API_PREFIX}/products"]
+        product_ids = [p["id"] for p in STORE.products[:150]]
+        products = client.get_products_by_ids(product_ids)
+        assert [p["id"] for p in products] == product_ids
+        assert stats[f"{API_PREFIX}/products"] == probes + 2
+
+        more_ids = [p["id"] for p in STORE.products[145:155]] + [999999]
+        assert [p["id"] for p in client.get_products_by_ids(more_ids)] == more_ids[:-1]
+        assert stats[f"{API_PREFIX}/products"] == probes + 3
+
+        order_ids = [o["id"] for o in STORE.orders[:5]]
+        assert [o["id"] for o in client.get_orders_by_ids(order_ids)] == order_ids
+        assert client.get_order(order_ids[0])["id"] == order_ids[0]
+
+        # A webhook payload primes the cache, so the follow-up lookup stays local
+        webhook_order = STORE.orders[10]
+        client.prime_order(webhook_order)
+        assert client.get_order(webhook_order["id"])["billing"]["phone"] == webhook_order["billing"]["phone"]
+        assert stats[f"{API_PREFIX}/orders"] == 1
+        assert sum(count for path, count in stats.items() if path.startswith(f"{API_PREFIX}/orders/")) == 0
+
+def test_all_pages_and_categories():
+    """Collections are read across all pages; categories are loaded once into the cache tier"""
+    with running_store() as (app, client):
+        stats = app.config["STATS"]
+        product_ids = [p["id"] for p in client._get_all_pages("products", {"per_page": 50, "_fields": "id"})]
+        assert sorted(product_ids) == sorted(p["id"] for p in STORE.products)
+
+        categories = client.get_product_categories()
+        assert {c["id"] for c in categories} == {c["id"] for c in STORE.categories()}
+        assert set(categories[0]) == {"id", "name", "slug", "parent", "count"}
+        client.get_product_categories()
+        assert stats[f"{API_PREFIX}/products/categories"] == 1
+
+def test_filtered_top_n():
+    """Price and stock filters go to the store; find_products pages only until the top-N is filled"""
+    with running_store() as (app, client):
+        stats = app.config["STATS"]
+        probes = stats[f"{API_PREFIX}/products"]
+        cheapest = client.find_products(5, min_price=100, max_price=500, stock_status="instock",
+                                        orderby="price", order="asc")
+        prices = [float(p["price"]) for p in cheapest]
+        assert len(cheapest) == 5 and prices == sorted(prices) and all(100 <= price <= 500 for price in prices)
+        assert all(p["stock_status"] == "instock" for p in cheapest)
+        assert stats[f"{API_PREFIX}/products"] == probes + 1
+
+        # A local predicate keeps paging, but stops as soon as enough products matched
+        by_id = sorted(STORE.products, key=lambda p: p["id"])
+        third_gk = [i for i, p in enumerate(by_id) if " GK" in p["name"]][2]
+        gk = client.find_products(3, accept=lambda p: " GK" in p["name"], orderby="id", order="asc")
+        assert [p["id"] for p in gk] == [p["id"] for p in by_id if " GK" in p["name"]][:3]
+        pages_needed = third_gk // 10 + 1
+        assert stats[f"{API_PREFIX}/products"] == probes + 1 + pages_needed
+
+if __name__ == "__main__":
+    test_pagination_and_limits()
+    test_filters_and_projection()
+    test_error_injection()
+    test_client_against_fake_store()
+    test_batch_fetch_by_ids()
+    test_all_pages_and_categories()
+    test_filtered_top_n()
+    print("✅ All fake WooCommerce server tests passed")
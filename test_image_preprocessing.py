@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+from PIL import Image, ImageChops
+from image_preprocessing import preprocess_image, ImagePreprocessor
+
+def photo(size=(4000, 3000), border=0, orientation=None, mode='RGB', fmt='JPEG'):
+    """Encoded test image with a diagonal gradient (no uniform edge) and an optional white border"""
+    gradient = Image.linear_gradient('L')
+    gradient = ImageChops.add(gradient, gradient.rotate(90), scale=2)
+    width, height = size
+    image = Image.new(mode, size, 'white')
+    image.paste(gradient.resize((width - 2 * border, height - 2 * border)).convert(mode), (border, border))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, format=fmt, exif=exif, quality=95)
+    return output.getvalue()
+
+def decode(data):
+    return Image.open(io.BytesIO(data))
+
+def test_downscale_and_rotate():
+    """Large photos are downscaled to the long edge and turned upright"""
+    data, mime_type = preprocess_image(photo(), max_edge=1600)
+    assert mime_type == 'image/jpeg'
+    assert decode(data).size == (1600, 1200)
+
+    # Orientation 6: the camera was turned, the upright image is portrait
+    data, _ = preprocess_image(photo(orientation=6), max_edge=1600)
+    assert decode(data).size == (1200, 1600)
+
+    data, mime_type = preprocess_image(photo(), max_edge=800, output_format='WEBP')
+    assert mime_type == 'image/webp' and decode(data).format == 'WEBP'
+
+def test_crop_and_small_images():
+    """Uniform borders are cropped, transparency is flattened and small files are kept"""
+    data, _ = preprocess_image(photo(size=(1000, 1000), border=200), max_edge=1600)
+    width, height = decode(data).size
+    assert width < 700 and height < 700
+
+    data, mime_type = preprocess_image(photo(size=(300, 200), mode='RGBA', fmt='PNG'), max_edge=1600)
+    assert decode(data).mode == 'RGB'
+
+    small = photo(size=(200, 100))
+    assert preprocess_image(small, max_edge=1600, quality=100) == (small, None)
+
+def test_preprocessor_pool_and_fallback():
+    """The pool returns the processed image and statistics; broken input falls back to the original"""
+    preprocessor = ImagePreprocessor(workers=1)
+    try:
+        original = photo()
+        data, mime_type = preprocessor.preprocess(original, 'image/jpeg')
+        assert len(data) < len(original) and mime_type == 'image/jpeg'
+        assert preprocessor.preprocess(b'not an image', 'image/jpeg') == (b'not an image', 'image/jpeg')
+        stats = preprocessor.stats()
+        assert stats['images'] == 1 and stats['failed'] == 1
+        assert stats['bytes_saved_per_image'] == len(original) - len(data)
+    finally:
+        preprocessor.shutdown()
+
+if __name__ == "__main__":
+    test_downscale_and_rotate()
+    test_crop_and_small_images()
+    test_preprocessor_pool_and_fallback()
+    print("✅ All image preprocessing tests passed")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from contextlib import contextmanager
+from flask import Flask, Response, request
+from werkzeug.serving import make_server
+from media_download import detect_image_type, download_image
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 200
+
+@contextmanager
+def media_server():
+    """Serve test media over HTTP and yield the base URL"""
+    app = Flask(__name__)
+
+    @app.route("/png")
+    def png():
+        assert request.headers.get("Authorization") == "Bearer token"
+        return Response(PNG, mimetype="image/jpeg")
+
+    @app.route("/large")
+    def large():
+        # Streamed without Content-Length, so only the byte cap stops it
+        return Response((b'\xff\xd8\xff' + b'\x00' * 1021 if i == 0 else b'\x00' * 1024 for i in range(100)),
+                        mimetype="image/jpeg")
+
+    @app.route("/html")
+    def html():
+        return Response(b"<html><body>Not found</body></html>", mimetype="image/jpeg")
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+
+def test_detect_image_type():
+    """Images are recognised by their signature, anything else is rejected"""
+    assert detect_image_type(b'\xff\xd8\xff\xe0' + b'\x00' * 8) == 'image/jpeg'
+    assert detect_image_type(PNG[:12]) == 'image/png'
+    assert detect_image_type(b'RIFF\x00\x00\x00\x00WEBP') == 'image/webp'
+    assert detect_image_type(b'\x00\x00\x00\x18ftypheic') == 'image/heic'
+    assert detect_image_type(b'GIF89a' + b'\x00' * 6) == 'image/gif'
+    assert detect_image_type(b'<html><body>') is None
+    assert detect_image_type(b'%PDF-1.4\n...') is None
+
+def test_download_image():
+    """Downloads stay in memory, use the sniffed type and respect the byte cap"""
+    with media_server() as base_url:
+        data, mime_type = download_image(f"{base_url}/png", headers={"Authorization": "Bearer token"})
+        assert data == PNG and mime_type == 'image/png'
+        assert download_image(f"{base_url}/png", headers={"Authorization": "Bearer token"}, max_bytes=100) is None
+        assert download_image(f"{base_url}/large", max_bytes=10 * 1024) is None
+        assert download_image(f"{base_url}/large")[1] == 'image/jpeg'
+        assert download_image(f"{base_url}/html") is None
+        assert download_image(f"{base_url}/missing") is None
+
+if __name__ == "__main__":
+    test_detect_image_type()
+    test_download_image()
+    print("✅ All media download tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from conversation_context import ConversationContext
+from memory_budget import MemoryBudget, deep_sizeof, KEEP_MESSAGES, SESSION_PROMPT_ENTRIES, KEEP_CHAT_TURNS
+
+class FakeSession:
+    """Chat session stand-in with a settable history"""
+    def __init__(self, entries):
+        self.history = [f"entry {i} " * 50 for i in range(entries)]
+
+def make_users(count, products=20):
+    """Contexts with long histories and full product payloads, plus chat sessions"""
+    manager = ConversationContext()
+    sessions = {}
+    for i in range(count):
+        user_id = f"user{i}"
+        for n in range(20):
+            manager.update_context(user_id, f"Haben Sie Embraco NJ {9000 + n}?")
+        manager.get_context(user_id)['last_products'] = [
+            {'id': p, 'name': f"Product {p}", 'price': '99.00', 'description': f"{user_id} product {p} " * 100,
+             'images': [{'src': f"https://example.com/{p}.jpg"}]}
+            for p in range(products)
+        ]
+        sessions[user_id] = FakeSession(30)
+    return manager, sessions
+
+def test_accounting_and_report():
+    """Usage is measured per user and structure, and the report ranks the largest users"""
+    manager, sessions = make_users(3)
+    manager.get_context("user1")['last_products'] *= 2
+    budget = MemoryBudget(manager, sessions, budget_mb=100)
+    for user_id in sessions:
+        assert budget.account(user_id) == 0
+    report = budget.report(top=2)
+    assert report['users'] == 3
+    assert report['top_users'][0]['user_id'] == "user1"
+    assert len(report['top_users']) == 2
+    assert report['by_structure']['last_products'] > report['by_structure']['messages'] > 0
+    assert report['used_bytes'] == sum(report['by_structure'].values())
+    assert deep_sizeof({'a': [1, 2]}) > deep_sizeof({})
+
+def test_eviction_order():
+    """Over budget, heavy fields of the least recently active users go first"""
+    manager, sessions = make_users(5)
+    budget = MemoryBudget(manager, sessions, budget_mb=100)
+    for user_id in sessions:
+        budget.account(user_id)
+    used = budget.report()['used_bytes']
+
+    # A budget a little below usage only costs the oldest users their product payloads
+    budget.budget = int(used * 0.95)
+    assert budget.enforce(protect="user4") > 0
+    oldest = manager.get_context("user0")
+    assert 'description' not in oldest['last_products'][0]
+    assert oldest['last_products'][0]['name'] == "Product 0"
+    assert len(oldest['messages']) == 20
+    assert 'description' in manager.get_context("user4")['last_products'][0]
+
+    # A tiny budget also cuts histories and drops sessions, except for the protected user
+    budget.budget = 1
+    budget.enforce(protect="user4")
+    assert len(manager.get_context("user0")['messages']) == KEEP_MESSAGES
+    assert "user0" not in sessions and "user4" in sessions
+    assert len(sessions["user4"].history) == 30
+    assert budget.evictions['chat_session'] == 4
+    assert budget.report()['users'] == 5
+
+def test_trimmed_session_keeps_prompt():
+    """A cut chat history keeps the system prompt exchange and the last turns"""
+    manager, sessions = make_users(1)
+    budget = MemoryBudget(manager, sessions)
+    session = sessions["user0"]
+    first, last = session.history[0], session.history[-1]
+    assert budget._trim_history("user0", manager.get_context("user0"), session)
+    assert len(session.history) == SESSION_PROMPT_ENTRIES + KEEP_CHAT_TURNS * 2
+    assert session.history[0] == first and session.history[-1] == last
+
+if __name__ == "__main__":
+    test_accounting_and_report()
+    test_eviction_order()
+    test_trimmed_session_keeps_prompt()
+    print("✅ All memory budget tests passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from message_workers import MessageWorkers
+from conversation_context import conversation_context
+
+def test_text_runs_before_queued_vision():
+    """Text jobs overtake waiting vision jobs; vision concurrency stays within its limit"""
+    workers = MessageWorkers(text_workers=1, vision_workers=1, text_queue=10, vision_queue=10)
+    order = []
+    running = {'vision': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def vision_job(name):
+        with lock:
+            running['vision'] += 1
+            running['max'] = max(running['max'], running['vision'])
+        time.sleep(0.1)
+        with lock:
+            running['vision'] -= 1
+            order.append(name)
+
+    def text_job(name):
+        with lock:
+            order.append(name)
+
+    for number in range(3):
+        assert workers.submit('vision', vision_job, f"vision-{number}") is not None
+    time.sleep(0.02)
+    workers.submit('text', text_job, "text-0")
+    time.sleep(0.02)
+    # The text reply did not wait for the photo being analysed nor for the queued ones
+    assert order == ["text-0"]
+    assert workers.join(timeout=2)
+    assert order == ["text-0", "vision-0", "vision-1", "vision-2"]
+    assert running['max'] == 1
+
+    stats = workers.stats()
+    assert stats['vision']['completed'] == 3 and stats['text']['completed'] == 1
+    assert stats['vision']['max_wait_ms'] >= stats['text']['max_wait_ms']
+
+def test_queue_cap_and_failures():
+    """A full lane rejects new jobs; a failing job does not stop its worker"""
+    workers = MessageWorkers(text_workers=1, vision_workers=1, text_queue=5, vision_queue=1)
+    release = threading.Event()
+    workers.submit('vision', release.wait)
+    time.sleep(0.02)
+    assert workers.submit('vision', time.sleep, 0) == 0
+    assert workers.submit('vision', time.sleep, 0) is None
+
+    workers.submit('text', lambda: 1 / 0)
+    done = threading.Event()
+    workers.submit('text', done.set)
+    assert done.wait(1)
+
+    release.set()
+    assert workers.join(timeout=2)
+    stats = workers.stats()
+    assert stats['vision']['rejected'] == 1 and stats['vision']['completed'] == 2
+    assert stats['text']['failed'] == 1 and stats['text']['completed'] == 1
+
+def test_vision_job_does_not_block_stripe():
+    """A text job of a user sharing the stripe of a running vision job is answered meanwhile"""
+    workers = MessageWorkers(text_workers=1, vision_workers=1, text_queue=10, vision_queue=10)
+    locks = conversation_context.locks
+    photo_user = "vision-stripe-user"
+    text_user = next(f"text-stripe-user-{n}" for n in range(10000)
+                     if f"text-stripe-user-{n}" != photo_user
+                     and locks.stripe(f"text-stripe-user-{n}") == locks.stripe(photo_user))
+    holding = threading.Event()
+    answered = threading.Event()
+    result = {}
+
+    def vision_job():
+        # Like process_image_with_gemini: the stripe is held for the context change only,
+        # the analysis (here: waiting for the text reply) runs outside it
+        with conversation_context.locked(photo_user):
+            conversation_context.get_context(photo_user)['current_topic'] = 'product_search'
+            holding.set()
+            time.sleep(0.05)
+        result['answered_during_vision'] = answered.wait(1)
+
+    def text_job():
+        conversation_context.update_context(text_user, "Haben Sie Embraco NJ 9238?")
+        answered.set()
+
+    workers.submit('vision', vision_job)
+    assert holding.wait(1)
+    workers.submit('text', text_job)
+    assert workers.join(timeout=2)
+    assert result['answered_during_vision']
+    assert workers.stats()['text']['completed'] == 1
+
+if __name__ == "__main__":
+    test_text_runs_before_queued_vision()
+    test_queue_cap_and_failures()
+    test_vision_job_does_not_block_stripe()
+    print("✅ All message worker tests passed")
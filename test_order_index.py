@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import threading
+from order_index import PhoneOrderIndex, normalize_phone
+
+def make_store(orders, per_page=100):
+    """Fake paginated "orders" endpoint that records the requested pages"""
+    requested = []
+    lock = threading.Lock()
+
+    def fetch_page(params):
+        with lock:
+            requested.append(dict(params))
+        matching = [o for o in orders if not params.get('after') or o['date_created_gmt'] > params['after']]
+        total_pages = max(1, -(-len(matching) // per_page))
+        start = (params['page'] - 1) * per_page
+        return matching[start:start + per_page], total_pages
+
+    return fetch_page, requested
+
+def make_order(order_id, phone, day=1):
+    return {'id': order_id, 'billing': {'phone': phone}, 'date_created_gmt': f"2024-01-{day:02d}T10:00:00"}
+
+def test_phone_normalisation():
+    """Different spellings of the same number share one key"""
+    assert normalize_phone("+49 178 1234567") == normalize_phone("0049-178-1234567") == normalize_phone("01781234567")
+    assert normalize_phone("12") is None
+    assert normalize_phone(None) is None
+
+def test_backfill_fetches_all_pages_once():
+    """The backfill walks every page and later lookups need no requests"""
+    orders = [make_order(i, f"+49178{i:07d}") for i in range(1, 251)]
+    orders.append(make_order(999, "0178 0000007"))
+    fetch_page, requested = make_store(orders)
+
+    index = PhoneOrderIndex(fetch_page)
+    assert index.ensure_built()
+    assert sorted(r['page'] for r in requested) == [1, 2, 3]
+
+    requested.clear()
+    assert index.lookup("+49 178 0000007") == [999, 7]
+    assert index.lookup("+49 178 9999999") == []
+    assert requested == []
+
+def test_incremental_updates():
+    """Webhook/poller updates add new orders and move orders whose phone changed"""
+    fetch_page, _ = make_store([])
+    index = PhoneOrderIndex(fetch_page)
+    index.ensure_built()
+
+    index.add_order(make_order(1, "01781111111"))
+    assert index.lookup("+491781111111") == [1]
+
+    index.add_order(make_order(1, "01782222222"))
+    assert index.lookup("01781111111") == []
+    assert index.lookup("01782222222") == [1]
+
+    # An order whose phone was removed leaves the index
+    index.add_order(make_order(1, ""))
+    assert index.lookup("01782222222") == [] and index.size() == 0
+
+def test_persisted_index_catches_up():
+    """A restarted worker loads the index and only fetches orders created since"""
+    orders = [make_order(1, "01781111111", day=1), make_order(2, "01781111111", day=2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.json")
+        fetch_page, _ = make_store(orders)
+        index = PhoneOrderIndex(fetch_page, persist_path=path)
+        assert index.ensure_built()
+
+        orders.append(make_order(3, "01781111111", day=3))
+        fetch_page, requested = make_store(orders)
+        restored = PhoneOrderIndex(fetch_page, persist_path=path)
+        assert restored.lookup("01781111111") == [2, 1]
+        assert restored.ensure_built()
+        assert requested[0]['after'] == "2024-01-02T10:00:00"
+        assert restored.lookup("01781111111") == [3, 2, 1]
+
+def test_catch_up_covers_orders_before_webhook():
+    """An order indexed by the webhook before the catch-up does not skip the downtime orders"""
+    orders = [make_order(1, "01781111111", day=1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.json")
+        fetch_page, _ = make_store(orders)
+        assert PhoneOrderIndex(fetch_page, persist_path=path).ensure_built()
+
+        # Order 2 was created while the worker was down, order 3 arrives by webhook after the restart
+        orders += [make_order(2, "01782222222", day=2), make_order(3, "01783333333", day=3)]
+        fetch_page, requested = make_store(orders)
+        restored = PhoneOrderIndex(fetch_page, persist_path=path)
+        restored.add_order(orders[2])
+        restored.save()
+        assert PhoneOrderIndex(fetch_page, persist_path=path).last_order_date == "2024-01-01T10:00:00"
+
+        assert restored.ensure_built()
+        assert requested[0]['after'] == "2024-01-01T10:00:00"
+        assert restored.lookup("01782222222") == [2]
+        assert PhoneOrderIndex(fetch_page, persist_path=path).last_order_date == "2024-01-03T10:00:00"
+
+if __name__ == "__main__":
+    test_phone_normalisation()
+    test_backfill_fetches_all_pages_once()
+    test_incremental_updates()
+    test_persisted_index_catches_up()
+    test_catch_up_covers_orders_before_webhook()
+    print("✅ All order index tests passed")
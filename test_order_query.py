@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import json
-from main import is_order_query, extract_order_number, handle_order_query
+from main import is_order_query, extract_order_number, handle_order_query, generate_order_index_pending_response
 
 def test_order_detection():
     """Test the order query detection function"""
@@ -51,6 +51,16 @@ def test_order_handling():
         print(f"Response:\n{response}")
         print("-" * 50)
 
+def test_order_index_pending_response():
+    """Phone lookups before the order index is built are answered in the user's language"""
+    assert "Bestelldaten werden gerade geladen" in generate_order_index_pending_response("Wo ist meine Bestellung?")
+    assert "loading our order records" in generate_order_index_pending_response("Where is my order?")
+    assert "sipariş numaranızı" in generate_order_index_pending_response("Siparişim nerede?", loading=False)
+    # With the store unreachable the customer is asked for the order number rather than to wait
+    response = generate_order_index_pending_response("What's the status of my order?", loading=False)
+    assert "order number" in response and "try again" not in response
+
 if __name__ == "__main__":
     test_order_detection()
-    test_order_handling() 
\ No newline at end of file
+    test_order_handling()
+    test_order_index_pending_response() 
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from product_price_index import ProductPriceIndex, parse_price
+
+PRODUCTS = [
+    {'product_name': 'A', 'price_eur': 79.45, 'status': 'instock'},
+    {'product_name': 'B', 'price_eur': '101,01 €', 'status': 'outofstock'},
+    {'product_name': 'C', 'price_eur': '1.234,50', 'status': 'instock'},
+    {'product_name': 'D', 'price_eur': 'auf Anfrage', 'status': 'instock'},
+    {'product_name': 'E', 'price_eur': 250, 'status': 'instock'},
+]
+
+def test_parse_price():
+    """Numbers and German/English formatted strings are parsed, anything else is None"""
+    assert parse_price(79.45) == 79.45
+    assert parse_price("79,45") == 79.45
+    assert parse_price("79.45 €") == 79.45
+    assert parse_price("1.234,56") == 1234.56
+    assert parse_price("EUR 1,234.56") == 1234.56
+    assert parse_price("1,234") == 1234.0
+    assert parse_price("auf Anfrage") is None
+    assert parse_price(None) is None
+
+def test_query():
+    """Range queries are inclusive, sorted by price and can filter by stock"""
+    index = ProductPriceIndex(PRODUCTS)
+    assert len(index) == 4
+    names = lambda products: [p['product_name'] for p in products]
+    assert names(index.query(79.45, 250)) == ['A', 'B', 'E']
+    assert names(index.query(100, None, order='desc')) == ['C', 'E', 'B']
+    assert names(index.query(stock_status='instock', limit=2)) == ['A', 'E']
+    assert index.query(300, 400) == []
+
+if __name__ == "__main__":
+    test_parse_price()
+    test_query()
+    print("✅ All product price index tests passed")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from unittest import mock
+from resilience import CircuitBreaker, RetryPolicy, CLOSED, OPEN, HALF_OPEN
+from woocommerce_client import WooCommerceClient
+
+TEST_STORE = {
+    "WC_CONSUMER_KEY": "ck_test",
+    "WC_CONSUMER_SECRET": "cs_test",
+    "WC_STORE_URL": "http://127.0.0.1:9",
+}
+
+def response(status_code, body=None, headers=None):
+    return mock.Mock(status_code=status_code, text="", headers=headers or {}, json=lambda: body)
+
+def test_backoff_is_bounded_and_jittered():
+    """Delays grow exponentially up to max_delay, and Retry-After takes precedence"""
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=4)
+    assert all(0 <= policy.delay(0) <= 0.5 for _ in range(100))
+    assert all(0 <= policy.delay(10) <= 4 for _ in range(100))
+    assert policy.delay(0, retry_after="2") == 2
+    assert policy.should_retry(429) and policy.should_retry(503) and not policy.should_retry(404)
+
+def test_breaker_transitions():
+    """closed -> open after the threshold, open -> half_open after the timeout, then closed or open again"""
+    opened = []
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.1, on_open=lambda: opened.append(True))
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and opened == [True]
+    assert not breaker.allow_request()
+
+    time.sleep(0.15)
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.15)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['transitions'] == {'closed->open': 1, 'open->half_open': 2, 'half_open->open': 1,
+                                                  'half_open->closed': 1}
+
+def test_client_retries_and_degrades_fast():
+    """5xx responses are retried, client errors are not, and an open breaker skips the store entirely"""
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        client = WooCommerceClient()
+        client._ready.set()
+        client.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+        client.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, on_open=client.mark_unreachable)
+
+        with mock.patch.object(client.wcapi, 'get', side_effect=[response(503), response(200, [{'id': 1}])]) as get:
+            assert client.get_products(search="embraco") == [{'id': 1}]
+            assert get.call_count == 2
+
+        with mock.patch.object(client.wcapi, 'get', return_value=response(404)) as get:
+            assert client.get_order(1) is None
+            assert get.call_count == 1
+
+        with mock.patch.object(client.wcapi, 'get', return_value=response(500)) as get:
+            assert client.get_order(2) is None
+            assert client.get_order(3) is None
+            assert get.call_count == 6
+            assert client.breaker.state == OPEN
+            assert not client.is_connected
+
+            start = time.time()
+            assert client.get_products(search="danfoss") == []
+            assert time.time() - start < 0.1
+            assert get.call_count == 6
+            assert client.health()['breaker']['state'] == OPEN
+
+def test_non_json_body_is_a_failure():
+    """A 200 answer that is not JSON (an HTML error page) returns None and counts against the breaker"""
+    def html_body():
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        client = WooCommerceClient()
+        client._ready.set()
+        client.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, on_open=client.mark_unreachable)
+        html = mock.Mock(status_code=200, text="<html>Fatal error</html>", headers={}, json=html_body)
+
+        with mock.patch.object(client.wcapi, 'get', return_value=html):
+            assert client.get_products(search="embraco") == []
+            assert client._get_page("orders", {"page": 1}) == (None, 0)
+            assert client.breaker.state == OPEN
+
+if __name__ == "__main__":
+    test_backoff_is_bounded_and_jittered()
+    test_breaker_transitions()
+    test_client_retries_and_degrades_fast()
+    test_non_json_body_is_a_failure()
+    print("✅ All resilience tests passed")
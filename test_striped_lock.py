@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+import threading
+from striped_lock import StripedLock
+from context_store import SQLiteContextStore
+from conversation_context import ConversationContext, MESSAGE_HISTORY
+
+def run_threads(target, count):
+    """Run target(i) in `count` threads and wait for them"""
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_same_key_is_serialised():
+    """Holders of one key never overlap, and waits are counted"""
+    locks = StripedLock('test', stripes=8)
+    active = []
+    overlaps = []
+
+    def work(i):
+        with locks.hold("user"):
+            active.append(i)
+            if len(active) > 1:
+                overlaps.append(i)
+            time.sleep(0.005)
+            active.remove(i)
+
+    run_threads(work, 8)
+    assert not overlaps
+    stats = locks.stats()
+    assert stats['acquisitions'] == 8
+    assert stats['contended'] >= 1
+    assert stats['hottest_stripes'][0]['stripe'] == locks.stripe("user")
+
+def test_reentrant_and_stable_stripes():
+    """A holder can take its own stripe again; stripes do not depend on the process"""
+    locks = StripedLock('test', stripes=16)
+    with locks.hold("a"):
+        with locks.hold("a"):
+            pass
+    assert locks.stripe("a") == locks.stripe("a") < 16
+    assert locks.stats()['contended'] == 0
+
+def test_concurrent_context_updates():
+    """Concurrent messages of many users lose no updates and keep the entity sets consistent"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ConversationContext(store=SQLiteContextStore(os.path.join(directory, "contexts.db")))
+        users = [f"user{i}" for i in range(10)]
+
+        def chat(i):
+            user_id = users[i % len(users)]
+            for n in range(20):
+                manager.update_context(user_id, f"Haben Sie Embraco NJ {9000 + n}? Bestellung #{10000 + n}")
+                manager.get_recent_messages(user_id, 3)
+                manager.summarize_conversation(user_id)
+
+        run_threads(chat, 30)
+        assert len(manager.contexts) == len(users)
+        for user_id in users:
+            context = manager.get_context(user_id)
+            assert len(context['messages']) == MESSAGE_HISTORY
+            assert len(context['entities']['orders']) == len(set(context['entities']['orders']))
+        assert manager.flush() == len(users)
+        assert manager.lock_stats()['user_locks']['acquisitions'] > 0
+        manager.store.close()
+
+if __name__ == "__main__":
+    test_same_key_is_serialised()
+    test_reentrant_and_stable_stripes()
+    test_concurrent_context_updates()
+    print("✅ All striped lock tests passed")
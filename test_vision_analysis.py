@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from vision_analysis import parse_vision_response, VisionAnalysis, ModelNumber, VISION_GENERATION_CONFIG
+
+def test_json_response():
+    """A schema answer (also inside a code fence) becomes a VisionAnalysis; placeholders become empty"""
+    text = """```json
+{"product_type": "refrigeration compressor", "brand": "Not visible",
+ "model_numbers": [{"model": "NEK 6214 Z", "confidence": 0.6}, {"model": "NJ 9232 GK", "confidence": 1.4},
+                   {"model": "unknown", "confidence": 1}],
+ "features": ["hermetic", "N/A"], "summary": "A hermetic compressor for commercial refrigeration."}
+```"""
+    analysis = parse_vision_response(text)
+    assert analysis == VisionAnalysis(
+        product_type="refrigeration compressor",
+        brand="",
+        model_numbers=(ModelNumber("NJ 9232 GK", 1.0), ModelNumber("NEK 6214 Z", 0.6)),
+        features=("hermetic",),
+        summary="A hermetic compressor for commercial refrigeration.",
+    )
+    assert not analysis.has_brand
+    assert analysis.model_confidence() == {"NJ 9232 GK": 1.0, "NEK 6214 Z": 0.6}
+    assert analysis.describe() == ("refrigeration compressor, model NJ 9232 GK: "
+                                   "A hermetic compressor for commercial refrigeration.")
+    assert parse_vision_response(analysis) is analysis
+    assert VISION_GENERATION_CONFIG["response_mime_type"] == "application/json"
+
+def test_free_text_response():
+    """Free text is parsed in one pass over its labelled lines"""
+    text = """
+    **Product Information:**
+
+    1. **Product Type:** Digital Thermostat / Temperature Controller
+
+    2. **Brand Name:** Not visible in the image.
+
+    3. **Model/Style Name or Number:** Not visible in the image.
+
+    4. **Key Features:**
+       * Digital temperature display
+       * Multiple control buttons
+
+    This appears to be a digital thermostat used in refrigeration applications.
+    """
+    analysis = parse_vision_response(text)
+    assert analysis.product_type == "Digital Thermostat / Temperature Controller"
+    assert analysis.brand == "" and analysis.model_numbers == ()
+    assert analysis.features == ("Digital temperature display", "Multiple control buttons")
+    assert analysis.summary == "This appears to be a digital thermostat used in refrigeration applications."
+
+    analysis = parse_vision_response("The nameplate shows an Embraco unit.\n\n"
+                                     "Model: NJ 9232 GK, refrigerant R404A, 220V 50HZ")
+    assert analysis.brand == "Embraco"
+    assert analysis.model_numbers[0] == ModelNumber("NJ 9232 GK", 1.0)
+    # Ratings next to a labelled model number are not taken as model numbers
+    assert not any("R404A" in candidate.model for candidate in analysis.model_numbers[1:])
+
+if __name__ == "__main__":
+    test_json_response()
+    test_free_text_response()
+    print("✅ All vision analysis tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import random
+from PIL import Image, ImageChops, ImageDraw
+from vision_cache import VisionCache, BKTree, image_hash, hamming
+
+def encode(image, fmt='JPEG', quality=90):
+    output = io.BytesIO()
+    image.save(output, format=fmt, quality=quality)
+    return output.getvalue()
+
+def product_photo(seed, size=(1200, 900)):
+    """Test image with a few random shapes on a gradient"""
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient('L').resize(size)
+    image = ImageChops.add(gradient, gradient.rotate(rng.choice([90, 180, 270]), expand=False)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x, y = rng.randrange(size[0] - 300), rng.randrange(size[1] - 300)
+        draw.rectangle([x, y, x + rng.randrange(50, 300), y + rng.randrange(50, 300)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    return image
+
+def test_image_hash():
+    """Rescaled and recompressed copies stay close, different photos are far apart"""
+    photo = product_photo(1)
+    original = image_hash(encode(photo))
+    assert hamming(original, image_hash(encode(photo.resize((600, 450)), quality=60))) <= 4
+    assert hamming(original, image_hash(encode(photo, fmt='PNG'))) <= 4
+    assert hamming(original, image_hash(encode(product_photo(2)))) > 10
+    assert image_hash(b'not an image') is None
+
+def test_bk_tree_matches_brute_force():
+    """The tree returns exactly the hashes within the radius"""
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    tree = BKTree(values)
+    for query in values[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        for radius in (0, 6, 20):
+            expected = sorted((hamming(query, v), v) for v in set(values) if hamming(query, v) <= radius)
+            assert tree.search(query, radius) == expected
+
+def test_cache_limits():
+    """Near hits return the analysis; entries expire and the oldest are evicted over the size limit"""
+    cache = VisionCache(max_distance=3, ttl=60, max_entries=3)
+    cache.put(0b1111, "compressor")
+    assert cache.get(0b1110) == "compressor"
+    assert cache.get(0b1111 ^ 0xFF00) is None
+
+    for value in (1 << 20, 1 << 30, 1 << 40):
+        cache.put(value, f"image {value}")
+    assert len(cache) == 3 and cache.get(0b1111) is None
+    assert cache.get(1 << 40) == f"image {1 << 40}"
+
+    rng = random.Random(3)
+    values = [rng.getrandbits(64) for _ in range(10)]
+    for value in values:
+        cache.put(value, "more")
+    assert cache.stats()['tree_size'] <= 2 * 3 + 1
+
+    cache.ttl = -1
+    assert cache.get(values[-1]) is None and len(cache) == 2
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['near_hits'] == 1
+
+if __name__ == "__main__":
+    test_image_hash()
+    test_bk_tree_matches_brute_force()
+    test_cache_limits()
+    print("✅ All vision cache tests passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+from vision_search import plan_queries, execute_plan, model_candidates, PlannedQuery
+
+class FakeClient:
+    """Async store stand-in: answers after a delay and records the queries"""
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+
+    async def _answer(self, key):
+        self.calls.append(key)
+        await asyncio.sleep(self.delays.get(key, 0.01))
+        return [{'id': f"{key}-{i}", 'name': f"{key} {i}"} for i in range(3)]
+
+    async def get_products(self, category=None, search=None):
+        return await self._answer(f"{category}:{search}")
+
+    async def advanced_product_search(self, query):
+        return await self._answer(query)
+
+def test_model_candidates():
+    """Spelling variants collapse, non-model tokens are dropped, confidence orders the rest"""
+    candidates = model_candidates({"NJ 9232 GK": 0.9, "nj9232gk": 1.0, "R404A": 0.4, "220V": 0.4,
+                                   "50HZ": 0.4, "**NEK 6160 Z**": 0.4, "HVAC": 0.4, "12": 0.4})
+    assert candidates == [("NJ 9232 GK", 1.0), ("NEK 6160 Z", 0.4)]
+
+def test_plan_budget_and_order():
+    """The most confident combinations are kept within the request budget, without duplicates"""
+    models = {f"XY {1000 + i}": 0.4 for i in range(30)}
+    models["NJ 9232 GK"] = 1.0
+    plan = plan_queries(brands=["Embraco"], models=models, category_ids=[86], product_types=["compressor"],
+                        queries=["Embraco NJ 9232 GK", "compressor"], budget=8)
+    assert sum(query.cost for query in plan) <= 8
+    assert plan[0] == PlannedQuery('category_model', 1.0, 1, search="NJ 9232 GK", category=86)
+    assert plan[1].kind == 'brand_model' and plan[1].search == "Embraco NJ 9232 GK"
+    assert [query.score for query in plan] == sorted((query.score for query in plan), reverse=True)
+    assert not any(query.kind == 'query' and query.search == "Embraco NJ 9232 GK" for query in plan)
+    assert plan_queries(models={"R134A": 1.0}, budget=8) == []
+
+def test_execute_stops_early_and_respects_deadline():
+    """Strong results end the search early; slow queries are cut off at the deadline"""
+    plan = [PlannedQuery('category_model', 1.0, 1, search="NJ 9232", category=86),
+            PlannedQuery('brand_model', 0.95, 2, search="Embraco NJ 9232"),
+            PlannedQuery('query', 0.3, 1, search="compressor")]
+    client = FakeClient(delays={"compressor": 5})
+    start = time.perf_counter()
+    products = asyncio.run(execute_plan(plan, client, limit=5, deadline=2))
+    assert time.perf_counter() - start < 1
+    assert len(products) == 5 and products[0]['id'] == "86:NJ 9232-0"
+    assert len(client.calls) == 3
+
+    client = FakeClient(delays={"86:NJ 9232": 5, "Embraco NJ 9232": 5})
+    start = time.perf_counter()
+    products = asyncio.run(execute_plan(plan, client, limit=5, deadline=0.3))
+    assert time.perf_counter() - start < 1
+    assert [product['id'] for product in products] == ["compressor-0", "compressor-1", "compressor-2"]
+
+if __name__ == "__main__":
+    test_model_candidates()
+    test_plan_budget_and_order()
+    test_execute_stops_early_and_respects_deadline()
+    print("✅ All vision search tests passed")
@@ -11,7 +11,8 @@ load_dotenv()
 def test_woocommerce_connection():
     """Test the connection to WooCommerce API"""
     print("Testing WooCommerce API connection...")
-    if woocommerce.is_connected:
+    # The client connects lazily in the background, so give the first probe a moment
+    if woocommerce.wait_until_ready(timeout=10):
         print("✅ Successfully connected to WooCommerce API")
         return True
     else:
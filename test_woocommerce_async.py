@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import asyncio
+from unittest import mock
+import httpx
+from woocommerce_client import WooCommerceClient
+from woocommerce_async import AsyncWooCommerceClient, SyncWooCommerceFacade
+
+TEST_STORE = {
+    "WC_CONSUMER_KEY": "ck_test",
+    "WC_CONSUMER_SECRET": "cs_test",
+    "WC_STORE_URL": "http://store.test",
+}
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Embraco NEK6160GK', 'sku': 'NEK6160GK', 'price': '199.00'},
+    {'id': 2, 'name': 'Danfoss SC15G', 'sku': 'SC15G', 'price': '249.00'},
+]
+
+def make_clients(handler, **kwargs):
+    """Sync client marked ready plus an async client on a mock transport"""
+    sync_client = WooCommerceClient()
+    sync_client._ready.set()
+    return sync_client, AsyncWooCommerceClient(sync_client, transport=httpx.MockTransport(handler), **kwargs)
+
+def test_concurrency_limit():
+    """No more than max_concurrency requests are in flight at once"""
+    in_flight = {'now': 0, 'max': 0}
+
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.02)
+        in_flight['now'] -= 1
+        return httpx.Response(200, json={'id': int(request.url.path.rsplit('/', 1)[1])})
+
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        _, client = make_clients(handler, max_concurrency=3)
+
+        async def fetch_all():
+            return await asyncio.gather(*(client.get_product(i) for i in range(1, 11)))
+
+        products = asyncio.run(fetch_all())
+        assert [p['id'] for p in products] == list(range(1, 11))
+        assert in_flight['max'] == 3
+
+def test_deadline():
+    """A request exceeding its deadline returns None without marking the store unreachable"""
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[])
+
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        sync_client, client = make_clients(handler, deadline=0.1)
+        start = time.time()
+        assert asyncio.run(client.get_order(42)) is None
+        assert time.time() - start < 0.5
+        assert sync_client.is_connected
+
+def test_sync_facade_advanced_search():
+    """The facade exposes the async methods to synchronous callers with signed, projected requests"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=PRODUCTS)
+
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        _, client = make_clients(handler)
+        facade = SyncWooCommerceFacade(client)
+
+        results = facade.advanced_product_search("embraco nek6160gk", limit=1)
+        assert results == [PRODUCTS[0]]
+        assert all('oauth_signature' in request.url.params for request in requests)
+        assert all(request.url.params['_fields'].startswith('id,name') for request in requests)
+
+        categories, products = facade.gather(client.get_product_categories(), client.get_products(search="danfoss"))
+        assert categories == PRODUCTS and products == PRODUCTS
+
+def test_pool_of_previous_loop_is_closed():
+    """Moving to another event loop closes the HTTP pool on the loop it was created on"""
+    def handler(request):
+        return httpx.Response(200, json=PRODUCTS[0])
+
+    with mock.patch.dict(os.environ, TEST_STORE), mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        _, client = make_clients(handler)
+        facade = SyncWooCommerceFacade(client)
+        assert facade.get_product(1) == PRODUCTS[0]
+        facade_pool = client._http
+
+        client.product_cache.clear()
+        assert asyncio.run(client.get_product(1)) == PRODUCTS[0]
+        assert client._http is not facade_pool
+        for _ in range(50):
+            if facade_pool.is_closed:
+                break
+            time.sleep(0.01)
+        assert facade_pool.is_closed
+
+if __name__ == "__main__":
+    test_concurrency_limit()
+    test_deadline()
+    test_sync_facade_advanced_search()
+    test_pool_of_previous_loop_is_closed()
+    print("✅ All async WooCommerce client tests passed")
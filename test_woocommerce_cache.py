@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+from woocommerce_cache import TieredCache, make_cache_key
+
+TEST_TIERS = {
+    'products': {'ttl': 0.2, 'stale': 5, 'max_entries': 2},
+    'orders': {'ttl': 0.2, 'stale': 0, 'max_entries': 10},
+}
+
+def test_cache_key_is_stable():
+    """Parameter order must not change the cache key"""
+    assert make_cache_key("products", {"search": "embraco", "page": 1}) == \
+        make_cache_key("products", {"page": 1, "search": "embraco"})
+    assert make_cache_key("products/5") == "products/5"
+
+def test_hit_miss_and_lru_bound():
+    """Loaded values are served from the cache and the tier stays within its bound"""
+    cache = TieredCache(tiers=TEST_TIERS)
+    calls = []
+
+    def loader(value):
+        calls.append(value)
+        return value
+
+    assert cache.get_or_load('products', 'a', lambda: loader([1])) == [1]
+    assert cache.get_or_load('products', 'a', lambda: loader([2])) == [1]
+    assert calls == [[1]]
+
+    cache.set('products', 'b', [2])
+    cache.set('products', 'c', [3])
+    assert cache.size('products') == 2
+    assert cache.get('products', 'a') == (None, None)
+
+def test_failed_loads_are_not_cached():
+    """A loader returning None must not poison the cache"""
+    cache = TieredCache(tiers=TEST_TIERS)
+    assert cache.get_or_load('orders', 'x', lambda: None) is None
+    assert cache.get_or_load('orders', 'x', lambda: [42]) == [42]
+
+def test_stale_while_revalidate():
+    """Stale entries are served immediately and refreshed in the background"""
+    cache = TieredCache(tiers=TEST_TIERS)
+    cache.set('products', 'a', ['old'])
+    time.sleep(0.3)
+
+    assert cache.get_or_load('products', 'a', lambda: ['new']) == ['old']
+    for _ in range(50):
+        if cache.get('products', 'a')[0] == ['new']:
+            break
+        time.sleep(0.02)
+    assert cache.get('products', 'a') == (['new'], 'fresh')
+
+    # Orders have no stale window and are reloaded synchronously
+    cache.set('orders', 'o', ['old'])
+    time.sleep(0.3)
+    assert cache.get_or_load('orders', 'o', lambda: ['new']) == ['new']
+
+def test_invalidation():
+    """Invalidation hooks drop single entries, matching entries or whole tiers"""
+    cache = TieredCache(tiers=TEST_TIERS)
+    cache.set('products', 'a', [{'id': 1}])
+    cache.set('products', 'b', [{'id': 2}])
+    assert cache.invalidate_where('products', lambda products: any(p['id'] == 1 for p in products)) == 1
+    assert cache.get('products', 'b')[0] == [{'id': 2}]
+    cache.invalidate('products')
+    assert cache.size() == 0
+
+def test_entries_are_copied():
+    """Changing a stored or returned value does not change the cached entry"""
+    cache = TieredCache(tiers=TEST_TIERS)
+    products = [{'id': 1, 'name': 'Embraco NEK6160GK'}]
+    cache.set('products', 'a', products)
+    products[0]['name'] = 'changed'
+
+    cached, _ = cache.get('products', 'a')
+    cached[0]['price'] = '199.00'
+    loaded = cache.get_or_load('products', 'a', lambda: None)
+    assert loaded == [{'id': 1, 'name': 'Embraco NEK6160GK'}]
+
+    loaded.append({'id': 2})
+    assert cache.get_cached('products', 'a') == [{'id': 1, 'name': 'Embraco NEK6160GK'}]
+
+def test_persistence_round_trip():
+    """A saved cache is loaded warm by a new instance"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        cache = TieredCache(tiers=TEST_TIERS, persist_path=path)
+        cache.set('products', 'a', [{'id': 1, 'name': 'Embraco EMY 80 CLP'}])
+        assert cache.save()
+
+        restored = TieredCache(tiers=TEST_TIERS, persist_path=path)
+        assert restored.get('products', 'a')[0] == [{'id': 1, 'name': 'Embraco EMY 80 CLP'}]
+
+if __name__ == "__main__":
+    test_cache_key_is_stable()
+    test_hit_miss_and_lru_bound()
+    test_failed_loads_are_not_cached()
+    test_stale_while_revalidate()
+    test_invalidation()
+    test_entries_are_copied()
+    test_persistence_round_trip()
+    print("✅ All WooCommerce cache tests passed")
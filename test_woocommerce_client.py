@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from unittest import mock
+from woocommerce_client import WooCommerceClient
+from woocommerce_cache import make_cache_key
+from woocommerce_fields import PRODUCT_SEARCH_FIELDS
+
+# Credentials pointing at a closed local port, so every probe fails fast
+UNREACHABLE_STORE = {
+    "WC_CONSUMER_KEY": "ck_test",
+    "WC_CONSUMER_SECRET": "cs_test",
+    "WC_STORE_URL": "http://127.0.0.1:9",
+}
+
+def test_client_creation_is_non_blocking():
+    """Creating the client must not wait for the store"""
+    with mock.patch.dict(os.environ, UNREACHABLE_STORE):
+        with mock.patch.object(WooCommerceClient, 'start_health_probe'):
+            start = time.time()
+            client = WooCommerceClient()
+            assert time.time() - start < 1
+            assert client.is_configured
+            assert not client.is_connected
+
+def test_calls_degrade_immediately_while_unreachable():
+    """While the store is not ready, reads return empty results without a network round-trip"""
+    with mock.patch.dict(os.environ, UNREACHABLE_STORE):
+        with mock.patch.object(WooCommerceClient, 'start_health_probe'):
+            client = WooCommerceClient()
+            start = time.time()
+            assert client.get_products(search="embraco") == []
+            assert client.get_order(1234) is None
+            assert time.time() - start < 1
+
+def test_cache_is_served_while_unreachable():
+    """Cached entries, stale ones included, are served before the first probe succeeds"""
+    with mock.patch.dict(os.environ, UNREACHABLE_STORE):
+        with mock.patch.object(WooCommerceClient, 'start_health_probe'):
+            client = WooCommerceClient()
+            products = [{'id': 7, 'name': "Embraco NJ 9232 GK"}]
+            params = client._with_fields(client._product_params(1, 20, search="embraco"), PRODUCT_SEARCH_FIELDS)
+            key = make_cache_key("products", params)
+            client.product_cache.set('products', key, products)
+            # Make the entry stale: past its TTL, inside the stale window
+            value, stored_at = client.product_cache._entries['products'][key]
+            client.product_cache._entries['products'][key] = (value, stored_at - 2 * 3600)
+
+            with mock.patch.object(client, '_request') as request:
+                assert client.get_products(search="embraco") == products
+                assert client.get_products_by_ids([7]) == products
+                assert client.get_products(search="danfoss") == []
+                request.assert_not_called()
+
+def test_readiness_flips_when_store_becomes_reachable():
+    """A successful probe promotes the client back to connected mode"""
+    with mock.patch.dict(os.environ, UNREACHABLE_STORE):
+        with mock.patch.object(WooCommerceClient, 'start_health_probe'):
+            client = WooCommerceClient()
+            assert not client.probe_failed
+            assert not client.connect()
+            assert not client.is_connected and client.probe_failed
+
+            ok_response = mock.Mock(status_code=200)
+            with mock.patch.object(client._probe_api, 'get', return_value=ok_response):
+                assert client.connect()
+            assert client.is_connected and not client.probe_failed
+
+            client.mark_unreachable()
+            assert not client.is_connected
+
+if __name__ == "__main__":
+    test_client_creation_is_non_blocking()
+    test_calls_degrade_immediately_while_unreachable()
+    test_cache_is_served_while_unreachable()
+    test_readiness_flips_when_store_becomes_reachable()
+    print("✅ All WooCommerce client tests passed")
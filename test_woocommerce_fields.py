@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from unittest import mock
+from woocommerce_client import WooCommerceClient
+from woocommerce_fields import PRODUCT_SEARCH_FIELDS, ORDER_SUMMARY_FIELDS, project_fields
+
+ORDER = {
+    'id': 7, 'status': 'processing', 'total': '10.00', 'meta_data': [{'key': 'x'}],
+    'billing': {'phone': '+491781234567', 'email': 'a@example.com'},
+    'line_items': [{'name': 'Embraco', 'quantity': 1, 'total': '10.00', 'taxes': []}],
+}
+
+def test_projection_matches_wordpress_rules():
+    """Top-level and dotted fields are kept, dotted paths into lists yield empty lists"""
+    projected = project_fields([ORDER], "id,billing.phone,line_items,meta_data.key")
+    assert projected == [{
+        'id': 7, 'billing': {'phone': '+491781234567'},
+        'line_items': ORDER['line_items'], 'meta_data': [],
+    }]
+    assert project_fields(ORDER, None) is ORDER
+
+def test_client_sends_projection_and_primes_same_projection():
+    """Reads request only the projected fields, and primed products serve projected lookups"""
+    # The health probe stays patched out for the whole test so readiness is not reset
+    with mock.patch.dict(os.environ, {"WC_CONSUMER_KEY": "ck_test", "WC_CONSUMER_SECRET": "cs_test",
+                                      "WC_STORE_URL": "http://127.0.0.1:9"}), \
+            mock.patch.object(WooCommerceClient, 'start_health_probe'):
+        client = WooCommerceClient()
+        client._ready.set()
+
+        product = {'id': 5, 'name': 'Embraco NEK6160GK', 'price': '199.00'}
+        with mock.patch.object(client, '_get', return_value=[product]) as get:
+            assert client.get_products(search="embraco") == [product]
+            assert get.call_args[0][1]["_fields"] == ",".join(PRODUCT_SEARCH_FIELDS)
+            assert client.get_product(5) == product
+            assert get.call_count == 1
+
+        with mock.patch.object(client, '_get', return_value=[ORDER]) as get:
+            client.get_customer_orders(email="a@example.com")
+            assert get.call_args_list[0][0][1]["_fields"] == "id"
+            assert get.call_args_list[1][0][1]["_fields"] == ",".join(ORDER_SUMMARY_FIELDS)
+
+if __name__ == "__main__":
+    test_projection_matches_wordpress_rules()
+    test_client_sends_projection_and_primes_same_projection()
+    print("✅ All WooCommerce field projection tests passed")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Structured Gemini Vision analysis for Snap-to-Shop.
+
+The vision call asks for JSON matching VISION_RESPONSE_SCHEMA (product type, brand,
+model numbers with a confidence, features, summary), and parse_vision_response() turns
+the answer into one VisionAnalysis that the product search and the reply formatting
+share. Free-text answers (older cached analyses, models without JSON mode, the test
+scripts) are parsed by a single labelled-field pass instead.
+"""
+
+import re
+import json
+import logging
+from typing import NamedTuple, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('vision_analysis')
+
+VISION_PROMPT = """
+Identify the product in this image in detail.
+Focus on:
+1. Product type (e.g., refrigeration compressor, temperature controller, expansion valve)
+2. Brand name if visible
+3. Model or part numbers exactly as printed (e.g. "NJ 9232 GK"), each with your confidence from 0 to 1
+4. Key features visible in the image
+5. Technical specifications if visible
+
+If this appears to be a screenshot of a product search or website, extract the product information from the text visible in the image.
+Leave brand empty and model_numbers empty when they are not visible; do not list refrigerants, voltages or other ratings as model numbers.
+Write the summary as one or two sentences for the customer.
+"""
+
+VISION_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "product_type": {"type": "string"},
+        "brand": {"type": "string"},
+        "model_numbers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "model": {"type": "string"},
+                    "confidence": {"type": "number"},
+                },
+                "required": ["model", "confidence"],
+            },
+        },
+        "features": {"type": "array", "items": {"type": "string"}},
+        "specifications": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string"},
+    },
+    "required": ["product_type", "brand", "model_numbers", "features", "summary"],
+}
+
+# generation_config of the vision call
+VISION_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": VISION_RESPONSE_SCHEMA,
+}
+
+# Brands recognised in free text when no brand field is given
+KNOWN_BRANDS = ["DRC", "Embraco", "Danfoss", "Bitzer", "Copeland", "Tecumseh", "Aspera", "Eliwell", "Carel"]
+
+# Values meaning "nothing there"
+PLACEHOLDER = re.compile(r'^(?:not\s+(?:visible|specified|available|identifiable)|unknown|none|n/?a|-)?\W*$|not visible',
+                         re.IGNORECASE)
+
+# Labelled lines of a free-text answer: "**Brand Name:** Embraco", "2. Model number: NJ 9232 GK"
+FIELD_PATTERN = re.compile(
+    r'^[\s\d.*#-]*(product type|identified as|brand name|brand|manufacturer|model(?:[\s/]*(?:number|no|name|style|or))*|'
+    r'(?:part|product)\s*number)[\s*]*:[\s*]*(.*?)\s*$',
+    re.IGNORECASE | re.MULTILINE
+)
+FIELD_NAMES = {
+    'product type': 'product_type', 'identified as': 'product_type',
+    'brand name': 'brand', 'brand': 'brand', 'manufacturer': 'brand',
+}
+# Model numbers of known series, trusted more than a labelled line
+SERIES_PATTERNS = [
+    r'(NJ\s*\d{4}\s*[A-Z]{1,2})',
+    r'(NEU\s*\d{4}\s*[A-Z]{1,2})',
+    r'(NEK\s*\d{4}\s*[A-Z]{1,2})',
+    r'(EMY\s*\d{2,3}\s*[A-Z]{0,3})',
+    r'(FFI\s*\d{2,3})',
+    r'(NT\s*\d{4}\s*[A-Z]{1,2})',
+]
+SERIES_PATTERN = re.compile('|'.join(SERIES_PATTERNS), re.IGNORECASE)
+# Any code with letters and digits, used only when no model number is labelled
+CODE_PATTERN = re.compile(r'\b(?=[A-Z0-9-]*\d)([A-Z0-9]{2,}-?[A-Z0-9]{2,})\b')
+LIST_ITEM = re.compile(r'^(?:\d+\.|[*•-])\s')
+# The key features list ends at the next numbered item, a heading or a paragraph of prose
+FEATURES_PATTERN = re.compile(r'key features\W*(.*?)(?:technical specifications|\n\s*\d\.|\n\s*\n(?!\s*[*•-])|$)',
+                              re.IGNORECASE | re.DOTALL)
+MARKDOWN = re.compile(r'\*\*|\*|`')
+
+class ModelNumber(NamedTuple):
+    """A model number candidate and how sure the analysis is about it"""
+    model: str
+    confidence: float
+
+class VisionAnalysis(NamedTuple):
+    """What the vision step found in an image (immutable, so it can be cached and shared)"""
+    product_type: str
+    brand: str
+    model_numbers: Tuple[ModelNumber, ...]
+    features: Tuple[str, ...]
+    summary: str
+
+    @property
+    def has_brand(self):
+        return bool(self.brand)
+
+    def model_confidence(self):
+        """model -> confidence, for the search planner"""
+        return {candidate.model: candidate.confidence for candidate in self.model_numbers}
+
+    def describe(self):
+        """One line for the conversation history, e.g. 'Embraco compressor, model NJ 9232 GK'"""
+        text = " ".join(part for part in (self.brand, self.product_type or "product") if part)
+        if self.model_numbers:
+            text += f", model {self.model_numbers[0].model}"
+        if self.summary:
+            text += f": {self.summary}"
+        return text
+
+def _clean(value):
+    """Field value without markdown, or '' for placeholders like 'Not visible'"""
+    value = MARKDOWN.sub('', str(value or '')).strip()
+    return '' if PLACEHOLDER.search(value) else value
+
+def _from_json(data):
+    """VisionAnalysis from the JSON answer (a dict following VISION_RESPONSE_SCHEMA)"""
+    models = []
+    for item in data.get('model_numbers') or []:
+        if isinstance(item, dict):
+            model, confidence = _clean(item.get('model')), item.get('confidence', 0.5)
+        else:
+            model, confidence = _clean(item), 0.5
+        try:
+            confidence = min(max(float(confidence), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = 0.5
+        if model:
+            models.append(ModelNumber(model, confidence))
+    models.sort(key=lambda candidate: -candidate.confidence)
+    features = [_clean(feature) for feature in data.get('features') or []]
+    return VisionAnalysis(
+        product_type=_clean(data.get('product_type')),
+        brand=_clean(data.get('brand')),
+        model_numbers=tuple(models),
+        features=tuple(feature for feature in features if feature),
+        summary=_clean(data.get('summary')),
+    )
+
+def _from_text(text):
+    """VisionAnalysis from a free-text answer, in one pass over its labelled lines"""
+    fields = {}
+    models = {}
+    for label, value in FIELD_PATTERN.findall(text):
+        value = _clean(value).strip(' .')
+        if not value:
+            continue
+        name = FIELD_NAMES.get(label.lower())
+        if name:
+            fields.setdefault(name, value)
+        else:
+            # "NJ 9232 GK (R404A, 220V)": the model number ends where the annotations start
+            models.setdefault(re.split(r'\s*[,;(]', value)[0], 0.8)
+    for match in SERIES_PATTERN.finditer(text):
+        models[re.sub(r'\s+', ' ', match.group(0).strip()).upper()] = 1.0
+    if not models:
+        for code in CODE_PATTERN.findall(text):
+            models.setdefault(code, 0.4)
+
+    brand = fields.get('brand', '')
+    if not brand:
+        lowered = text.lower()
+        brand = next((known for known in KNOWN_BRANDS if known.lower() in lowered), '')
+
+    features = []
+    features_match = FEATURES_PATTERN.search(text)
+    if features_match:
+        features = [_clean(line.strip(' \t*-•')).rstrip('.') for line in features_match.group(1).splitlines()]
+
+    # The first paragraph of prose, not a heading, list or labelled field
+    summary = ''
+    for paragraph in text.split('\n\n'):
+        paragraph = paragraph.strip()
+        if paragraph.startswith('#') or LIST_ITEM.match(paragraph) or FIELD_PATTERN.match(paragraph):
+            continue
+        paragraph = _clean(paragraph)
+        if len(paragraph) > 20 and not paragraph.endswith(':'):
+            summary = paragraph if len(paragraph) <= 200 else paragraph[:197] + "..."
+            break
+    return VisionAnalysis(
+        product_type=fields.get('product_type', ''),
+        brand=brand,
+        model_numbers=tuple(sorted((ModelNumber(model, confidence) for model, confidence in models.items()),
+                                   key=lambda candidate: -candidate.confidence)),
+        features=tuple(feature for feature in features if feature),
+        summary=summary,
+    )
+
+def parse_vision_response(text):
+    """
+    Parse the answer of the vision call
+
+    Args:
+        text (str): JSON answer (possibly in a ```json fence) or free text
+
+    Returns:
+        VisionAnalysis: Parsed analysis
+    """
+    if isinstance(text, VisionAnalysis):
+        return text
+    text = text or ''
+    stripped = re.sub(r'^\s*```(?:json)?\s*|\s*```\s*$', '', text)
+    if stripped.startswith('{'):
+        try:
+            return _from_json(json.loads(stripped))
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Vision answer is not valid JSON, parsing it as text: {e}")
+    return _from_text(text)
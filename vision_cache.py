@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cache of Gemini Vision analyses keyed by a perceptual image hash.
+
+The same catalogue screenshots and forwarded product photos reach us from many
+customers. Each image gets a 64-bit difference hash (dHash), which barely changes when
+an image is rescaled or recompressed. An image within VISION_CACHE_DISTANCE bits of a
+cached one reuses its analysis instead of calling Gemini again. Product matches are
+not cached: they are searched again for every photo, so a match list from a store
+outage or from the local fallback is never served after the store has recovered.
+Near neighbours are found with a BK-tree, so a lookup does not compare against every
+cached hash.
+"""
+
+import io
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('vision_cache')
+
+# Largest Hamming distance (of 64 bits) at which two images count as the same
+VISION_CACHE_DISTANCE = int(os.getenv("VISION_CACHE_DISTANCE", "6"))
+# Seconds an analysis is reused
+VISION_CACHE_TTL = int(os.getenv("VISION_CACHE_TTL", str(6 * 3600)))
+# Maximum number of cached analyses
+VISION_CACHE_SIZE = int(os.getenv("VISION_CACHE_SIZE", "2000"))
+
+HASH_SIZE = 8
+
+def image_hash(data):
+    """
+    64-bit difference hash of an image
+
+    The image is reduced to 9x8 grey pixels; each bit says whether a pixel is brighter
+    than its right neighbour.
+
+    Args:
+        data (bytes): Image file contents
+
+    Returns:
+        int: Hash, or None if the image cannot be decoded
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs are decoded at 1/8 scale, enough for a 9x8 thumbnail
+        image.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        # One byte per pixel of the 'L' image, row by row
+        pixels = list(image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS).tobytes())
+    except Exception as e:
+        logger.error(f"Cannot hash image: {e}")
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + column]
+            right = pixels[row * (HASH_SIZE + 1) + column + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+def hamming(a, b):
+    """Number of differing bits"""
+    return (a ^ b).bit_count()
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes with the Hamming distance
+
+    A search for hashes within `radius` only descends into children whose edge distance
+    is within radius of the distance to the current node (triangle inequality).
+    """
+    def __init__(self, values=()):
+        # Node: [hash, {distance: child node}]
+        self.root = None
+        self.size = 0
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        """Insert a hash (duplicates are ignored)"""
+        if self.root is None:
+            self.root = [value, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value, radius):
+        """
+        Hashes within radius of value
+
+        Returns:
+            list: (distance, hash) tuples, nearest first
+        """
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[0]))
+            for edge, child in node[1].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+class VisionCache:
+    """
+    Vision analyses by image hash, with a TTL and an LRU size limit
+
+    Evicted or expired hashes stay in the BK-tree until it is rebuilt (once it holds
+    twice as many hashes as live entries); lookups ignore them.
+    """
+    def __init__(self, max_distance=None, ttl=None, max_entries=None):
+        """
+        Args:
+            max_distance (int): Largest Hamming distance for a hit (default VISION_CACHE_DISTANCE)
+            ttl (int): Seconds an entry is used (default VISION_CACHE_TTL)
+            max_entries (int): Maximum number of entries (default VISION_CACHE_SIZE)
+        """
+        self.max_distance = VISION_CACHE_DISTANCE if max_distance is None else max_distance
+        self.ttl = ttl or VISION_CACHE_TTL
+        self.max_entries = max_entries or VISION_CACHE_SIZE
+        # hash -> (stored at, analysis), least recently used first
+        self._entries = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, value):
+        """
+        Cached analysis of the nearest image within the distance limit
+
+        Args:
+            value (int): Image hash (None is always a miss)
+
+        Returns:
+            VisionAnalysis: Cached analysis, or None
+        """
+        if value is None:
+            return None
+        with self._lock:
+            now = time.time()
+            for distance, candidate in self._tree.search(value, self.max_distance):
+                entry = self._entries.get(candidate)
+                if entry is None:
+                    continue
+                if now - entry[0] > self.ttl:
+                    del self._entries[candidate]
+                    continue
+                self._entries.move_to_end(candidate)
+                self.hits += 1
+                if distance:
+                    self.near_hits += 1
+                logger.info(f"Vision cache hit at distance {distance}")
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, value, analysis):
+        """
+        Cache the analysis of an image
+
+        Args:
+            value (int): Image hash (None is ignored)
+            analysis (VisionAnalysis): Parsed Gemini Vision response
+        """
+        if value is None:
+            return
+        with self._lock:
+            self._entries[value] = (time.time(), analysis)
+            self._entries.move_to_end(value)
+            self._tree.add(value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._tree.size > 2 * max(len(self._entries), 1):
+                self._tree = BKTree(self._entries)
+
+    def stats(self):
+        """Hit rate and size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'tree_size': self._tree.size,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+# Create a singleton instance
+vision_cache = VisionCache()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Query planning and concurrent execution for the product search behind Snap-to-Shop.
+
+The analysis of a photo yields brands, model number candidates, categories and free
+search phrases; combined naively they give dozens of store queries per photo. The
+planner normalises and deduplicates the candidates, drops ones that cannot be model
+numbers (refrigerants, voltages), ranks the combinations by confidence and keeps the
+best ones within a budget of store requests. The chosen queries run concurrently on
+the async WooCommerce client under one deadline, and the search stops as soon as enough
+products from high-confidence queries have arrived.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+from woocommerce_client import woocommerce
+from woocommerce_async import async_woocommerce, sync_woocommerce
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('vision_search')
+
+# Store requests one photo may cost, and seconds the whole search may take
+VISION_SEARCH_BUDGET = int(os.getenv("VISION_SEARCH_BUDGET", "8"))
+VISION_SEARCH_DEADLINE = float(os.getenv("VISION_SEARCH_DEADLINE", "6"))
+# Queries at least this confident count towards stopping early
+STRONG_QUERY_SCORE = 0.7
+
+# Confidence of a query kind; model-based kinds are scaled by the model's confidence
+QUERY_SCORES = {
+    'category_model': 1.0,
+    'brand_model': 0.95,
+    'model': 0.8,
+    'brand_type': 0.5,
+    'category': 0.4,
+    'query': 0.3,
+}
+
+# Nameplate values that look like model numbers: refrigerants, electrical ratings, pressures
+NOT_A_MODEL = re.compile(r'^(R\d{2,4}[A-Z]?|\d+(V|VAC|HZ|W|KW|PH|A|BAR|MM|KG|CM)|\d{1,3})$')
+
+class PlannedQuery(NamedTuple):
+    """One store query of a plan"""
+    kind: str
+    score: float
+    cost: int
+    search: Optional[str] = None
+    category: Optional[int] = None
+
+def normalize_model(model):
+    """Comparison key of a model number: 'NJ 9232-GK' and 'nj9232gk' are the same"""
+    return re.sub(r'[^A-Z0-9]', '', model.upper())
+
+def clean_candidate(text):
+    """Candidate text without markdown and surrounding punctuation, whitespace collapsed"""
+    text = re.sub(r'[*_`]', '', text)
+    return re.sub(r'\s+', ' ', text).strip(' .,;:()[]"\'-')
+
+def model_candidates(models):
+    """
+    Deduplicate and filter model number candidates
+
+    Args:
+        models (dict or list): model -> confidence (0-1), or models with confidence 1
+
+    Returns:
+        list: (model, confidence), most confident first
+    """
+    if not isinstance(models, dict):
+        models = dict.fromkeys(models, 1.0)
+    best = {}
+    for model, confidence in models.items():
+        model = clean_candidate(model)
+        key = normalize_model(model)
+        if len(key) < 3 or len(key) > 20 or not re.search(r'\d', key) or NOT_A_MODEL.match(key):
+            continue
+        # The first spelling is kept (labelled candidates come first), with the highest confidence
+        if key in best:
+            best[key] = (best[key][0], max(best[key][1], confidence))
+        else:
+            best[key] = (model, confidence)
+    return sorted(best.values(), key=lambda candidate: -candidate[1])
+
+def _search_cost(text):
+    """Store requests of an advanced search: the direct search plus one per model number in it"""
+    return 1 + len(woocommerce.extract_model_numbers(text.strip().lower()))
+
+def plan_queries(brands=(), models=(), category_ids=(), product_types=(), queries=(), budget=None):
+    """
+    Choose the store queries for a photo
+
+    Args:
+        brands (list): Brand names
+        models (dict or list): Model number candidates, optionally with confidence
+        category_ids (list): Store category ids
+        product_types (list): Product types (e.g. compressor)
+        queries (list): Free search phrases, least specific
+        budget (int): Store requests allowed (default VISION_SEARCH_BUDGET)
+
+    Returns:
+        list: PlannedQuery, best first, with a total cost within the budget
+    """
+    budget = VISION_SEARCH_BUDGET if budget is None else budget
+    brands = list(dict.fromkeys(clean_candidate(brand) for brand in brands if clean_candidate(brand)))
+    product_types = list(dict.fromkeys(clean_candidate(p_type).lower() for p_type in product_types
+                                       if clean_candidate(p_type)))
+    candidates = model_candidates(models)
+
+    planned = []
+    for model, confidence in candidates:
+        for category_id in category_ids:
+            planned.append(PlannedQuery('category_model', QUERY_SCORES['category_model'] * confidence, 1,
+                                        search=model, category=category_id))
+        for brand in brands:
+            if normalize_model(brand) not in normalize_model(model):
+                text = f"{brand} {model}"
+                planned.append(PlannedQuery('brand_model', QUERY_SCORES['brand_model'] * confidence,
+                                            _search_cost(text), search=text))
+        if not brands:
+            planned.append(PlannedQuery('model', QUERY_SCORES['model'] * confidence, _search_cost(model), search=model))
+    for brand in brands:
+        for p_type in product_types[:2]:
+            text = f"{brand} {p_type}"
+            planned.append(PlannedQuery('brand_type', QUERY_SCORES['brand_type'], _search_cost(text), search=text))
+    for category_id in category_ids:
+        planned.append(PlannedQuery('category', QUERY_SCORES['category'], 1, category=category_id))
+    for text in queries:
+        planned.append(PlannedQuery('query', QUERY_SCORES['query'], _search_cost(text), search=text))
+
+    # Highest confidence first (stable, so the caller's order breaks ties); one query per search
+    planned.sort(key=lambda query: -query.score)
+    plan, seen, spent = [], set(), 0
+    for query in planned:
+        key = (query.category, normalize_model(query.search or ''))
+        if key in seen or spent + query.cost > budget:
+            continue
+        seen.add(key)
+        plan.append(query)
+        spent += query.cost
+    logger.info(f"Planned {len(plan)} of {len(planned)} queries ({spent} of {budget} requests) "
+                f"from {len(candidates)} model candidates")
+    return plan
+
+async def _run_query(query, client):
+    """Products of one planned query ([] on failure)"""
+    try:
+        if query.kind in ('category_model', 'category'):
+            return await client.get_products(category=query.category, search=query.search) or []
+        return await client.advanced_product_search(query.search) or []
+    except Exception as e:
+        logger.error(f"Planned query {query.kind} {query.search or query.category} failed: {e}")
+        return []
+
+async def execute_plan(plan, client, limit=5, deadline=None):
+    """
+    Run the queries of a plan concurrently
+
+    Stops at the deadline, or once `limit` distinct products from queries scoring at
+    least STRONG_QUERY_SCORE have arrived; unfinished queries are cancelled.
+
+    Args:
+        plan (list): PlannedQuery
+        client (AsyncWooCommerceClient): Store client
+        limit (int): Number of products wanted
+        deadline (float): Seconds for the whole plan (default VISION_SEARCH_DEADLINE)
+
+    Returns:
+        list: Distinct products, those of the most confident queries first
+    """
+    deadline = deadline or VISION_SEARCH_DEADLINE
+    tasks = {asyncio.ensure_future(_run_query(query, client)): index for index, query in enumerate(plan)}
+    pending = set(tasks)
+    results = {}
+    strong_ids = set()
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    try:
+        while pending and len(strong_ids) < limit:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                logger.warning(f"Vision search deadline reached with {len(pending)} queries unfinished")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = tasks[task]
+                results[index] = task.result()
+                if plan[index].score >= STRONG_QUERY_SCORE:
+                    strong_ids.update(product['id'] for product in results[index])
+    finally:
+        for task in pending:
+            task.cancel()
+    if pending and len(strong_ids) >= limit:
+        logger.info(f"Vision search stopped early, {len(pending)} queries cancelled")
+
+    products = {}
+    for index in sorted(results, key=lambda index: (-plan[index].score, index)):
+        for product in results[index]:
+            products.setdefault(product['id'], product)
+    return list(products.values())[:limit]
+
+def search_with_plan(plan, limit=5, deadline=None):
+    """
+    Blocking execution of a plan for the Flask handlers, on the async client's loop thread
+
+    Returns:
+        list: Matching products ([] if the search failed)
+    """
+    if not plan:
+        return []
+    deadline = deadline or VISION_SEARCH_DEADLINE
+    try:
+        return sync_woocommerce.run(execute_plan(plan, async_woocommerce, limit, deadline), timeout=deadline + 1)
+    except Exception as e:
+        logger.error(f"Vision search failed: {e}")
+        return []
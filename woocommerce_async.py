@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import asyncio
+import logging
+import threading
+from urllib.parse import urlencode
+import httpx
+from woocommerce.oauth import OAuth
+from dotenv import load_dotenv
+from woocommerce_cache import make_cache_key
+from woocommerce_client import woocommerce, BATCH_CHUNK_SIZE, MAX_SEARCH_PAGES
+from woocommerce_fields import (
+    PRODUCT_SEARCH_FIELDS, ORDER_SUMMARY_FIELDS, ORDER_NOTIFICATION_FIELDS,
+    CUSTOMER_ID_FIELDS, CATEGORY_FIELDS
+)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('woocommerce_async')
+
+# Requests in flight at once, pooled connections, and the deadline of a single request
+# (including the time spent waiting for a concurrency slot)
+ASYNC_CONCURRENCY = int(os.getenv("WC_ASYNC_CONCURRENCY", "8"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("WC_ASYNC_MAX_CONNECTIONS", "20"))
+ASYNC_DEADLINE = float(os.getenv("WC_ASYNC_DEADLINE", "10"))
+
+class AsyncWooCommerceClient:
+    """
+    asyncio counterpart of WooCommerceClient.
+
+    Requests go through one pooled httpx.AsyncClient, at most max_concurrency at a
+    time, and each one is bounded by a deadline. Readiness, the tiered cache and the
+    phone order index are shared with the synchronous client, so both see the same
+    store state and invalidations.
+    """
+    def __init__(self, sync_client=None, max_concurrency=ASYNC_CONCURRENCY, deadline=ASYNC_DEADLINE, transport=None):
+        """
+        Args:
+            sync_client (WooCommerceClient): Client whose readiness, cache and order index are shared
+            max_concurrency (int): Maximum number of requests in flight
+            deadline (float): Seconds a single request may take, including queueing
+            transport (httpx.AsyncBaseTransport): Custom transport (tests)
+        """
+        self.sync = sync_client or woocommerce
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.transport = transport
+        self.store_url = os.getenv("WC_STORE_URL", "https://durmusbaba.de").rstrip("/")
+        self.consumer_key = os.getenv("WC_CONSUMER_KEY")
+        self.consumer_secret = os.getenv("WC_CONSUMER_SECRET")
+        self.is_configured = bool(self.consumer_key and self.consumer_secret)
+        # The HTTP pool and the semaphore belong to the loop they were created on
+        self._loop = None
+        self._http = None
+        self._semaphore = None
+
+    @property
+    def is_connected(self):
+        return self.sync.is_connected
+
+    @property
+    def product_cache(self):
+        return self.sync.product_cache
+
+    def _bind_loop(self):
+        """Create the HTTP pool and semaphore for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._close_pool(self._http, self._loop)
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            auth = None
+            if self.store_url.startswith("https"):
+                auth = httpx.BasicAuth(self.consumer_key, self.consumer_secret)
+            self._http = httpx.AsyncClient(
+                auth=auth,
+                headers={"accept": "application/json"},
+                limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                                    max_keepalive_connections=ASYNC_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(self.deadline),
+                transport=self.transport
+            )
+        return self._http
+
+    @staticmethod
+    def _close_pool(http, loop):
+        """
+        Close an HTTP pool replaced by _bind_loop, on the loop its connections belong to
+
+        Args:
+            http (httpx.AsyncClient): Replaced pool (None if there was none)
+            loop (asyncio.AbstractEventLoop): Loop the pool was created on
+        """
+        if http is None:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(http.aclose(), loop)
+        else:
+            # A loop that has finished cannot run aclose() any more; its connections went with it
+            logger.debug("HTTP pool of a finished event loop dropped without closing")
+
+    def _url(self, endpoint, params):
+        """Build the request URL; plain HTTP stores need OAuth 1.0a signed URLs like the woocommerce library"""
+        url = f"{self.store_url}/wp-json/wc/v3/{endpoint}"
+        if self.store_url.startswith("https"):
+            return url, params
+        signed = OAuth(
+            url=f"{url}?{urlencode(params)}" if params else url,
+            consumer_key=self.consumer_key,
+            consumer_secret=self.consumer_secret,
+            version="wc/v3",
+            method="GET"
+        ).get_oauth_url()
+        return signed, None
+
+    async def _request(self, endpoint, params=None):
+        """
+        Perform a GET request within the concurrency limit and deadline
+
+        Retries and circuit breaking follow WooCommerceClient._request, using the
+        breaker and retry policy of the shared sync client. The deadline covers all attempts.
+
+        Returns:
+            httpx.Response or None if the request failed
+        """
+        breaker = self.sync.breaker
+        policy = self.sync.retry_policy
+        if not breaker.allow_request():
+            logger.info(f"Circuit breaker open, skipping request to {endpoint}")
+            return None
+
+        http = self._bind_loop()
+        url, query = self._url(endpoint, params or {})
+        try:
+            async with asyncio.timeout(self.deadline):
+                for attempt in range(policy.max_attempts):
+                    retry_after = None
+                    try:
+                        async with self._semaphore:
+                            response = await http.get(url, params=query)
+                        if response.status_code == 200:
+                            # Recorded as a success once the body is parsed (see WooCommerceClient._parse_json)
+                            return response
+                        if not policy.should_retry(response.status_code):
+                            logger.error(f"Failed to get {endpoint}: {response.status_code} - {response.text}")
+                            breaker.record_success()
+                            return None
+                        logger.warning(f"Got {response.status_code} from {endpoint} (attempt {attempt + 1}/{policy.max_attempts})")
+                        retry_after = response.headers.get("Retry-After")
+                    except httpx.TimeoutException as e:
+                        logger.error(f"Timeout getting {endpoint}: {str(e)}")
+                        break
+                    except httpx.HTTPError as e:
+                        logger.warning(f"Error getting {endpoint} (attempt {attempt + 1}/{policy.max_attempts}): {str(e)}")
+
+                    if attempt + 1 < policy.max_attempts:
+                        await asyncio.sleep(policy.delay(attempt, retry_after))
+        except TimeoutError:
+            # A missed deadline may be caused by queueing, so it does not count against the store
+            logger.error(f"Request to {endpoint} exceeded the {self.deadline}s deadline")
+            breaker.release()
+            return None
+
+        logger.error(f"Giving up on {endpoint}")
+        breaker.record_failure()
+        return None
+
+    async def _get(self, endpoint, params=None):
+        """Parsed JSON response or None if the request failed"""
+        response = await self._request(endpoint, params)
+        if response is None:
+            return None
+        return self.sync._parse_json(response, endpoint)
+
+    async def _get_page(self, endpoint, params=None):
+        """(parsed JSON or None, total number of pages)"""
+        response = await self._request(endpoint, params)
+        if response is None:
+            return None, 0
+        records = self.sync._parse_json(response, endpoint)
+        if records is None:
+            return None, 0
+        return records, int(response.headers.get("X-WP-TotalPages", 1))
+
+    async def _get_all_pages(self, endpoint, params=None):
+        """Async version of WooCommerceClient._get_all_pages; later pages are fetched concurrently"""
+        params = dict(params or {}, page=1)
+        params.setdefault("per_page", 100)
+        records, total_pages = await self._get_page(endpoint, params)
+        if records is None:
+            return None
+
+        pages = await asyncio.gather(*(self._get(endpoint, dict(params, page=page))
+                                       for page in range(2, total_pages + 1)))
+        for page_records in pages:
+            if page_records is None:
+                return None
+            records.extend(page_records)
+        return records
+
+    async def _cached_get(self, tier, endpoint, params=None):
+        """Perform a GET request through the shared cache tier for this endpoint type"""
+        key = make_cache_key(endpoint, params)
+        if not self.is_connected:
+            # Until the store is reachable serve what is cached, stale entries included
+            return self.product_cache.get_cached(tier, key)
+        return await self.product_cache.aget_or_load(tier, key, lambda: self._get(endpoint, params))
+
+    async def get_products(self, page=1, per_page=20, search=None, category=None, min_price=None, max_price=None,
+                           stock_status=None, orderby=None, order=None, fields=PRODUCT_SEARCH_FIELDS):
+        """Async version of WooCommerceClient.get_products"""
+        params = self.sync._product_params(page, per_page, search, category, min_price, max_price,
+                                           stock_status, orderby, order)
+
+        products = await self._cached_get('products', "products", self.sync._with_fields(params, fields))
+        if products is None:
+            return []
+
+        for product in products:
+            if 'id' in product:
+                key = make_cache_key(f"products/{product['id']}", self.sync._with_fields(None, fields))
+                self.product_cache.set('product', key, product)
+
+        return list(products)
+
+    async def find_products(self, limit, accept=None, max_pages=MAX_SEARCH_PAGES, fields=PRODUCT_SEARCH_FIELDS,
+                            **filters):
+        """Async version of WooCommerceClient.find_products"""
+        per_page = min(limit if accept is None else max(limit * 2, 10), 100)
+        found = []
+        for page in range(1, max_pages + 1):
+            products = await self.get_products(page=page, per_page=per_page, fields=fields, **filters)
+            found.extend(p for p in products if accept is None or accept(p))
+            if len(found) >= limit or len(products) < per_page:
+                break
+        return found[:limit]
+
+    async def get_product(self, product_id, fields=PRODUCT_SEARCH_FIELDS):
+        """Async version of WooCommerceClient.get_product"""
+        return await self._cached_get('product', f"products/{product_id}", self.sync._with_fields(None, fields))
+
+    async def search_products_by_name(self, name):
+        """Async version of WooCommerceClient.search_products_by_name"""
+        return await self.get_products(search=name, per_page=5)
+
+    async def advanced_product_search(self, query, limit=5, fields=PRODUCT_SEARCH_FIELDS):
+        """
+        Async version of WooCommerceClient.advanced_product_search
+
+        The direct search and the per-model-number searches run concurrently.
+        """
+        try:
+            query = query.strip().lower()
+            model_numbers = self.sync.extract_model_numbers(query)
+
+            searches = [self.get_products(search=query, per_page=20, fields=fields)]
+            searches += [self.get_products(search=model, per_page=10, fields=fields) for model in model_numbers]
+            results = await asyncio.gather(*searches)
+
+            all_results = [product for products in results for product in products]
+            return self.sync._rank_search_results(all_results, query, model_numbers, limit)
+
+        except Exception as e:
+            logger.error(f"Error in advanced product search: {e}")
+            return []
+
+    async def _get_by_ids(self, endpoint, tier, ids, fields):
+        """Async version of WooCommerceClient._get_by_ids; chunks are fetched concurrently"""
+        if fields and "id" not in fields:
+            fields = ("id",) + tuple(fields)
+        projection = self.sync._with_fields(None, fields)
+        ids = list(dict.fromkeys(int(record_id) for record_id in ids))
+
+        connected = self.is_connected
+        found = {}
+        missing = []
+        for record_id in ids:
+            record, state = self.product_cache.get(tier, make_cache_key(f"{endpoint}/{record_id}", projection))
+            if state == 'fresh' or (state == 'stale' and not connected):
+                found[record_id] = record
+            else:
+                missing.append(record_id)
+
+        # While the store is unreachable only cached records are returned
+        if not connected:
+            missing = []
+        chunks = [missing[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(missing), BATCH_CHUNK_SIZE)]
+        results = await asyncio.gather(*(
+            self._get(endpoint, dict(projection, include=",".join(map(str, chunk)), per_page=len(chunk)))
+            for chunk in chunks
+        ))
+        for records in results:
+            for record in records or []:
+                found[record['id']] = record
+                self.product_cache.set(tier, make_cache_key(f"{endpoint}/{record['id']}", projection), record)
+
+        return [found[record_id] for record_id in ids if record_id in found]
+
+    async def get_products_by_ids(self, product_ids, fields=PRODUCT_SEARCH_FIELDS):
+        """Async version of WooCommerceClient.get_products_by_ids"""
+        if not product_ids:
+            return []
+
+        return await self._get_by_ids("products", 'product', product_ids, fields)
+
+    async def get_orders_by_ids(self, order_ids, fields=ORDER_NOTIFICATION_FIELDS):
+        """Async version of WooCommerceClient.get_orders_by_ids"""
+        if not order_ids:
+            return []
+
+        return await self._get_by_ids("orders", 'order', order_ids, fields)
+
+    async def get_order(self, order_id, fields=ORDER_NOTIFICATION_FIELDS):
+        """Async version of WooCommerceClient.get_order"""
+        return await self._cached_get('order', f"orders/{order_id}", self.sync._with_fields(None, fields))
+
+    async def get_customer_orders(self, email=None, phone=None, fields=ORDER_SUMMARY_FIELDS):
+        """Async version of WooCommerceClient.get_customer_orders"""
+        if not email and not phone:
+            logger.error("Either email or phone must be provided")
+            return []
+
+        try:
+            customers = []
+            if email:
+                params = self.sync._with_fields({"email": email}, CUSTOMER_ID_FIELDS)
+                customers = await self._cached_get('orders', "customers", params) or []
+
+            if not customers and phone:
+                # The backfill and catch-up run in the background, never on a request
+                order_index = self.sync.order_index
+                if not order_index.is_built or order_index.needs_catch_up:
+                    if self.is_connected:
+                        order_index.ensure_built_in_background()
+                    if not order_index.is_built:
+                        return []
+
+                return await self.get_orders_by_ids(self.sync.order_index.lookup(phone), fields)
+
+            if customers:
+                params = self.sync._with_fields({"customer": customers[0]["id"]}, fields)
+                orders = await self._cached_get('orders', "orders", params)
+                if orders is not None:
+                    return list(orders)
+
+            return []
+
+        except Exception as e:
+            logger.error(f"Error getting customer orders: {str(e)}")
+            return []
+
+    async def get_orders(self, status=None, after=None, limit=20, fields=ORDER_NOTIFICATION_FIELDS):
+        """Async version of WooCommerceClient.get_orders"""
+        try:
+            params = {"per_page": limit}
+            if status:
+                params["status"] = ",".join(status) if isinstance(status, list) else status
+            if after:
+                params["after"] = after.strftime("%Y-%m-%dT%H:%M:%S")
+
+            orders = await self._cached_get('orders', "orders", self.sync._with_fields(params, fields))
+            return list(orders) if orders is not None else []
+        except Exception as e:
+            logger.error(f"Error getting orders: {str(e)}")
+            return []
+
+    async def get_product_categories(self):
+        """Async version of WooCommerceClient.get_product_categories"""
+        params = self.sync._with_fields({"per_page": 100}, CATEGORY_FIELDS)
+        key = make_cache_key("products/categories", params)
+        if not self.is_connected:
+            categories = self.product_cache.get_cached('categories', key)
+        else:
+            categories = await self.product_cache.aget_or_load(
+                'categories', key, lambda: self._get_all_pages("products/categories", params)
+            )
+        return list(categories) if categories is not None else []
+
+    async def aclose(self):
+        """Close the HTTP connection pool"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+class SyncWooCommerceFacade:
+    """
+    Blocking facade over AsyncWooCommerceClient for synchronous code (Flask handlers,
+    sales_assistant, order_notification).
+
+    The async client runs on one dedicated event loop thread. Methods have the same
+    names and signatures as WooCommerceClient, so it can be used in its place, and
+    gather() lets synchronous code run several store queries concurrently.
+    """
+    def __init__(self, client):
+        self.client = client
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the event loop thread on first use"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=loop.run_forever, daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the loop thread and wait for its result
+
+        Args:
+            coro: Coroutine to run
+            timeout (float): Maximum seconds to wait (per-request deadlines apply regardless)
+
+        Returns:
+            The coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def gather(self, *coros, timeout=None):
+        """
+        Run several coroutines concurrently, e.g.
+        facade.gather(client.get_products(search="embraco"), client.get_product_categories())
+
+        Returns:
+            list: Results in the order of the coroutines
+        """
+        async def gather_all():
+            return await asyncio.gather(*coros)
+        return self.run(gather_all(), timeout)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if asyncio.iscoroutinefunction(attr):
+            def blocking(*args, **kwargs):
+                return self.run(attr(*args, **kwargs))
+            return blocking
+        return attr
+
+# Create singleton instances
+async_woocommerce = AsyncWooCommerceClient()
+sync_woocommerce = SyncWooCommerceFacade(async_woocommerce)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import copy
+import json
+import asyncio
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('woocommerce_cache')
+
+# Cache tiers per endpoint type.
+#   ttl:         seconds an entry is served as fresh
+#   stale:       extra seconds an expired entry may still be served while it is refreshed in the background
+#   max_entries: LRU bound for the tier
+# Products change rarely, so they are kept long; orders change status often, so they are kept short
+# and never served stale.
+DEFAULT_TIERS = {
+    'products': {'ttl': 3600, 'stale': 6 * 3600, 'max_entries': 500},
+    'product': {'ttl': 3600, 'stale': 6 * 3600, 'max_entries': 2000},
+    'categories': {'ttl': 6 * 3600, 'stale': 24 * 3600, 'max_entries': 20},
+    'orders': {'ttl': 60, 'stale': 0, 'max_entries': 200},
+    'order': {'ttl': 120, 'stale': 0, 'max_entries': 1000},
+}
+
+def make_cache_key(endpoint, params=None):
+    """
+    Build a stable cache key for an endpoint and its query parameters
+
+    Args:
+        endpoint (str): REST endpoint, e.g. "products"
+        params (dict): Query parameters
+
+    Returns:
+        str: Cache key
+    """
+    if not params:
+        return endpoint
+    items = sorted((str(k), str(v)) for k, v in params.items() if v is not None)
+    return f"{endpoint}?{urlencode(items)}"
+
+class TieredCache:
+    """
+    In-memory TTL + LRU cache with one bucket per endpoint type.
+
+    Expired entries that are still inside their stale window are returned immediately
+    while a background thread reloads them (stale-while-revalidate). The cache can
+    optionally be persisted to a JSON file so a restarted worker starts warm.
+
+    Entries are copied when they are stored and when they are returned, so callers
+    may change the lists and dicts they pass in or get back without touching the cache.
+    """
+    def __init__(self, tiers=None, persist_path=None):
+        self.tiers = {name: dict(config) for name, config in (tiers or DEFAULT_TIERS).items()}
+        self.persist_path = persist_path
+        self._entries = {name: OrderedDict() for name in self.tiers}
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._autosave_thread = None
+        # Set by changes, cleared by save(); autosave skips unchanged caches
+        self._dirty = False
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0}
+
+        if self.persist_path:
+            self.load()
+
+    def _entry_state(self, tier, stored_at, now):
+        """Return 'fresh', 'stale' or None (expired) for an entry stored at stored_at"""
+        config = self.tiers[tier]
+        age = now - stored_at
+        if age <= config['ttl']:
+            return 'fresh'
+        if age <= config['ttl'] + config.get('stale', 0):
+            return 'stale'
+        return None
+
+    def get(self, tier, key):
+        """
+        Look up an entry
+
+        Args:
+            tier (str): Cache tier name
+            key (str): Cache key
+
+        Returns:
+            tuple: (value, state) where state is 'fresh', 'stale' or None on a miss;
+                the value is a copy of the entry
+        """
+        with self._lock:
+            entries = self._entries[tier]
+            entry = entries.get(key)
+            if entry is None:
+                return None, None
+
+            value, stored_at = entry
+            state = self._entry_state(tier, stored_at, time.time())
+            if state is None:
+                del entries[key]
+                return None, None
+
+            entries.move_to_end(key)
+        return copy.deepcopy(value), state
+
+    def set(self, tier, key, value):
+        """Store a copy of a value, evicting the least recently used entries beyond the tier bound"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            entries = self._entries[tier]
+            entries[key] = (value, time.time())
+            entries.move_to_end(key)
+            self._dirty = True
+
+            max_entries = self.tiers[tier]['max_entries']
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_cached(self, tier, key):
+        """
+        Look up an entry without loading it, stale entries included
+
+        Used while the source is unreachable, when a stale value beats no value.
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        value, state = self.get(tier, key)
+        self._count({'fresh': 'hits', 'stale': 'stale_hits'}.get(state, 'misses'))
+        return value
+
+    def _count(self, name):
+        """Increment a stats counter (under the lock, as requests run on many threads)"""
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_or_load(self, tier, key, loader):
+        """
+        Return a cached value or load it
+
+        A loader result of None is treated as a failed request and is not cached.
+
+        Args:
+            tier (str): Cache tier name
+            key (str): Cache key
+            loader (callable): Function returning the fresh value
+
+        Returns:
+            Cached or freshly loaded value (None if loading failed)
+        """
+        value, state = self.get(tier, key)
+
+        if state == 'fresh':
+            self._count('hits')
+            return value
+
+        if state == 'stale':
+            self._count('stale_hits')
+            self._refresh_in_background(tier, key, loader)
+            return value
+
+        self._count('misses')
+        value = loader()
+        if value is not None:
+            self.set(tier, key, value)
+        return value
+
+    async def aget_or_load(self, tier, key, loader):
+        """
+        Async variant of get_or_load for use from an event loop
+
+        Args:
+            tier (str): Cache tier name
+            key (str): Cache key
+            loader (callable): Coroutine function returning the fresh value
+
+        Returns:
+            Cached or freshly loaded value (None if loading failed)
+        """
+        value, state = self.get(tier, key)
+
+        if state == 'fresh':
+            self._count('hits')
+            return value
+
+        if state == 'stale':
+            self._count('stale_hits')
+            self._refresh_as_task(tier, key, loader)
+            return value
+
+        self._count('misses')
+        value = await loader()
+        if value is not None:
+            self.set(tier, key, value)
+        return value
+
+    def _refresh_as_task(self, tier, key, loader):
+        """Reload a stale entry as a task on the running loop, at most one refresh per key at a time"""
+        with self._lock:
+            if (tier, key) in self._refreshing:
+                return
+            self._refreshing.add((tier, key))
+
+        async def refresh():
+            try:
+                value = await loader()
+                if value is not None:
+                    self.set(tier, key, value)
+                    self._count('refreshes')
+            except Exception as e:
+                logger.error(f"Error refreshing cache entry {tier}/{key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((tier, key))
+
+        # Keep a reference so the task is not garbage collected before it finishes
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def _refresh_in_background(self, tier, key, loader):
+        """Reload a stale entry on a daemon thread, at most one refresh per key at a time"""
+        with self._lock:
+            if (tier, key) in self._refreshing:
+                return
+            self._refreshing.add((tier, key))
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(tier, key, value)
+                    self._count('refreshes')
+            except Exception as e:
+                logger.error(f"Error refreshing cache entry {tier}/{key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((tier, key))
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def invalidate(self, tier, key=None):
+        """
+        Remove one entry, or the whole tier when no key is given
+
+        Args:
+            tier (str): Cache tier name
+            key (str): Cache key (optional)
+        """
+        with self._lock:
+            if key is None:
+                self._entries[tier].clear()
+            else:
+                self._entries[tier].pop(key, None)
+            self._dirty = True
+
+    def invalidate_where(self, tier, predicate):
+        """
+        Remove all entries of a tier whose value matches a predicate
+
+        Args:
+            tier (str): Cache tier name
+            predicate (callable): Function taking a cached value and returning True to drop it
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            entries = self._entries[tier]
+            stale_keys = [key for key, (value, _) in entries.items() if predicate(value)]
+            for key in stale_keys:
+                del entries[key]
+            self._dirty = self._dirty or bool(stale_keys)
+            return len(stale_keys)
+
+    def clear(self):
+        """Remove every entry from every tier"""
+        with self._lock:
+            for entries in self._entries.values():
+                entries.clear()
+            self._dirty = True
+
+    def size(self, tier=None):
+        """Return the number of entries in a tier or in the whole cache"""
+        with self._lock:
+            if tier:
+                return len(self._entries[tier])
+            return sum(len(entries) for entries in self._entries.values())
+
+    def save(self, path=None):
+        """
+        Persist all non-expired entries to a JSON file
+
+        Args:
+            path (str): Target file, defaults to the configured persist path
+
+        Returns:
+            bool: True if the cache was written
+        """
+        path = path or self.persist_path
+        if not path:
+            return False
+
+        try:
+            now = time.time()
+            with self._lock:
+                data = {
+                    tier: [
+                        [key, value, stored_at]
+                        for key, (value, stored_at) in entries.items()
+                        if self._entry_state(tier, stored_at, now) is not None
+                    ]
+                    for tier, entries in self._entries.items()
+                }
+                self._dirty = False
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # Write to a temporary file first so a crash never leaves a truncated cache behind
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+
+            logger.info(f"Saved {sum(len(v) for v in data.values())} cache entries to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving cache to {path}: {e}")
+            self._dirty = True
+            return False
+
+    def load(self, path=None):
+        """
+        Load entries from a JSON file written by save(), skipping expired ones
+
+        Args:
+            path (str): Source file, defaults to the configured persist path
+
+        Returns:
+            int: Number of loaded entries
+        """
+        path = path or self.persist_path
+        if not path or not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            now = time.time()
+            loaded = 0
+            with self._lock:
+                for tier, rows in data.items():
+                    if tier not in self._entries:
+                        continue
+                    for key, value, stored_at in rows:
+                        if self._entry_state(tier, stored_at, now) is not None:
+                            self._entries[tier][key] = (value, stored_at)
+                            loaded += 1
+
+            logger.info(f"Loaded {loaded} cache entries from {path}")
+            return loaded
+        except Exception as e:
+            logger.error(f"Error loading cache from {path}: {e}")
+            return 0
+
+    def start_autosave(self, interval=300):
+        """
+        Periodically persist the cache when it changed, and once more at interpreter exit
+
+        Args:
+            interval (int): Seconds between saves
+        """
+        if not self.persist_path or self._autosave_thread:
+            return
+
+        def autosave():
+            while True:
+                time.sleep(interval)
+                if self._dirty:
+                    self.save()
+
+        self._autosave_thread = threading.Thread(target=autosave, daemon=True)
+        self._autosave_thread.start()
+        atexit.register(lambda: self._dirty and self.save())
@@ -3,10 +3,21 @@
 
 import os
 import re
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from woocommerce import API
 from dotenv import load_dotenv
 import logging
 from fuzzywuzzy import fuzz
+from woocommerce_cache import TieredCache, make_cache_key
+from order_index import PhoneOrderIndex
+from resilience import CircuitBreaker, RetryPolicy
+from woocommerce_fields import (
+    PRODUCT_SEARCH_FIELDS, ORDER_SUMMARY_FIELDS, ORDER_NOTIFICATION_FIELDS,
+    CUSTOMER_ID_FIELDS, CATEGORY_FIELDS, fields_param, project_fields
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,110 +26,479 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('woocommerce_client')
 
+# Health probing: interval while the store is reachable, and backoff bounds while it is not
+HEALTH_CHECK_INTERVAL = int(os.getenv("WC_HEALTH_CHECK_INTERVAL", "60"))
+PROBE_RETRY_MIN = 5
+PROBE_RETRY_MAX = 300
+PROBE_TIMEOUT = int(os.getenv("WC_PROBE_TIMEOUT", "5"))
+
+# Batch fetches by ID: IDs per include= request (WooCommerce page maximum) and parallel requests
+BATCH_CHUNK_SIZE = 100
+BATCH_WORKERS = 4
+# Upper bound of pages find_products walks to fill a top-N
+MAX_SEARCH_PAGES = 5
+
 class WooCommerceClient:
     def __init__(self):
-        """Initialize the WooCommerce API client with credentials from environment variables."""
+        """
+        Initialize the WooCommerce API client with credentials from environment variables.
+        
+        No network request is made here. The store is probed lazily on a background
+        thread the first time the client is used, and is_connected flips to True once
+        the store is reachable.
+        """
         self.wcapi = None
-        self.is_connected = False
-        self.connect()
-        self.product_cache = {}  # Cache for product data
+        self._probe_api = None
+        self._ready = threading.Event()
+        self._probe_lock = threading.Lock()
+        self._probe_thread = None
+        # True after a failed probe, until one succeeds (the store is down, not just starting)
+        self.probe_failed = False
+        self.is_configured = self._build_api()
+        
+        # Retries with backoff on 429/5xx, and a breaker that stops calling a failing store
+        self.retry_policy = RetryPolicy()
+        self.breaker = CircuitBreaker("woocommerce", on_open=self.mark_unreachable)
+        
+        # Tiered TTL cache for product, category and order data (optionally persisted to disk)
+        self.product_cache = TieredCache(persist_path=os.getenv("WC_CACHE_FILE"))
+        self.product_cache.start_autosave(int(os.getenv("WC_CACHE_SAVE_INTERVAL", "300")))
+        
+        # Phone -> order IDs index for customer order lookups (persisted to disk)
+        self.order_index = PhoneOrderIndex(
+            lambda params: self._get_page("orders", params),
+            persist_path=os.getenv("WC_ORDER_INDEX_FILE", "cache/phone_order_index.json")
+        )
+        self.order_index.start_autosave(int(os.getenv("WC_CACHE_SAVE_INTERVAL", "300")))
+    
+    @property
+    def is_connected(self):
+        """
+        True while the store is known to be reachable and the circuit breaker is not open;
+        starts background probing on first use. Otherwise reads are answered from the cache
+        (stale entries included) without a request, and misses come back empty.
+        """
+        self.start_health_probe()
+        return self._ready.is_set() and not self.breaker.is_open()
+    
+    def _build_api(self):
+        """Create the API objects from environment variables without touching the network."""
+        consumer_key = os.getenv("WC_CONSUMER_KEY")
+        consumer_secret = os.getenv("WC_CONSUMER_SECRET")
+        store_url = os.getenv("WC_STORE_URL", "https://durmusbaba.de")
+        
+        if not consumer_key or not consumer_secret:
+            logger.error("WooCommerce API credentials not found in environment variables")
+            return False
+        
+        self.wcapi = API(
+            url=store_url,
+            consumer_key=consumer_key,
+            consumer_secret=consumer_secret,
+            version="wc/v3",
+            timeout=30
+        )
+        # Separate client with a short timeout so a slow store cannot stall the prober
+        self._probe_api = API(
+            url=store_url,
+            consumer_key=consumer_key,
+            consumer_secret=consumer_secret,
+            version="wc/v3",
+            timeout=PROBE_TIMEOUT
+        )
+        return True
     
     def connect(self):
-        """Establish connection to WooCommerce API."""
+        """
+        Probe the WooCommerce API once and update the readiness state.
+        
+        Returns:
+            bool: True if the store is reachable
+        """
+        if not self.is_configured:
+            return False
+        
         try:
-            consumer_key = os.getenv("WC_CONSUMER_KEY")
-            consumer_secret = os.getenv("WC_CONSUMER_SECRET")
-            store_url = os.getenv("WC_STORE_URL", "https://durmusbaba.de")
-            
-            if not consumer_key or not consumer_secret:
-                logger.error("WooCommerce API credentials not found in environment variables")
-                return False
-            
-            self.wcapi = API(
-                url=store_url,
-                consumer_key=consumer_key,
-                consumer_secret=consumer_secret,
-                version="wc/v3",
-                timeout=30
-            )
-            
-            # Test the connection
-            response = self.wcapi.get("products", params={"per_page": 1})
+            response = self._probe_api.get("products", params={"per_page": 1, "_fields": "id"})
             if response.status_code == 200:
-                logger.info("Successfully connected to WooCommerce API")
-                self.is_connected = True
+                if not self._ready.is_set():
+                    logger.info("Successfully connected to WooCommerce API")
+                self.probe_failed = False
+                self._ready.set()
                 return True
             else:
                 logger.error(f"Failed to connect to WooCommerce API: {response.status_code} - {response.text}")
-                return False
                 
         except Exception as e:
             logger.error(f"Error connecting to WooCommerce API: {str(e)}")
+        
+        self.probe_failed = True
+        self._ready.clear()
+        return False
+    
+    def start_health_probe(self):
+        """Start the background health probe thread if it is not running yet (non-blocking)."""
+        if not self.is_configured or self._probe_thread is not None:
+            return
+        
+        with self._probe_lock:
+            if self._probe_thread is None:
+                self._probe_thread = threading.Thread(target=self._health_probe_loop, daemon=True)
+                self._probe_thread.start()
+    
+    def _health_probe_loop(self):
+        """
+        Probe the store forever: every HEALTH_CHECK_INTERVAL seconds while it is reachable,
+        and with exponential backoff while it is not. A successful probe promotes the
+        client back to connected mode without a restart.
+        """
+        retry_delay = PROBE_RETRY_MIN
+        while True:
+            was_ready = self._ready.is_set()
+            if self.connect():
+                if not was_ready:
+                    logger.info("WooCommerce API is reachable, switching to WooCommerce mode")
+                    # Build or catch up the phone order index off the request path
+                    self.order_index.ensure_built_in_background()
+                retry_delay = PROBE_RETRY_MIN
+                # Wake up early if a request notices the store went away
+                self._wait_for_failure(HEALTH_CHECK_INTERVAL)
+            else:
+                if was_ready:
+                    logger.warning("WooCommerce API became unreachable, falling back to local product data")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, PROBE_RETRY_MAX)
+    
+    def _wait_for_failure(self, timeout):
+        """Sleep up to timeout seconds, returning early once the client is marked unreachable."""
+        deadline = time.time() + timeout
+        while self._ready.is_set() and time.time() < deadline:
+            time.sleep(1)
+    
+    def mark_unreachable(self):
+        """Flag the store as unreachable after a failed request; the prober takes over from here."""
+        if self._ready.is_set():
+            logger.warning("WooCommerce request failed, marking store as unreachable")
+        self._ready.clear()
+    
+    def wait_until_ready(self, timeout=None):
+        """
+        Block until the store is reachable (for scripts and tests)
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+            
+        Returns:
+            bool: True if the store became reachable
+        """
+        if not self.is_configured:
             return False
+        self.start_health_probe()
+        return self._ready.wait(timeout)
     
-    def get_products(self, page=1, per_page=20, search=None, category=None):
+    def health(self):
         """
-        Get products from WooCommerce store
+        Connection, circuit breaker and cache metrics for monitoring
+        
+        Returns:
+            dict: JSON-serialisable health information
+        """
+        return {
+            'configured': self.is_configured,
+            'reachable': self._ready.is_set(),
+            'connected': self.is_connected,
+            'breaker': self.breaker.snapshot(),
+            'cache': dict(self.product_cache.stats, entries=self.product_cache.size()),
+            'order_index': {'built': self.order_index.is_built, 'orders': self.order_index.size()},
+        }
+    
+    def _request(self, endpoint, params=None):
+        """
+        Perform a GET request with retries and circuit breaking
+        
+        Rate limiting (429), server errors (5xx) and connection errors are retried with
+        exponential backoff and jitter. Timeouts are not retried, so a hanging store
+        fails fast. Requests are not sent at all while the breaker is open.
         
         Args:
-            page (int): Page number
-            per_page (int): Number of products per page
-            search (str): Search term
-            category (int): Category ID
+            endpoint (str): REST endpoint, e.g. "products"
+            params (dict): Query parameters
             
         Returns:
-            list: List of products or empty list if error
+            requests.Response or None if the request failed
+        """
+        if not self.breaker.allow_request():
+            logger.info(f"Circuit breaker open, skipping request to {endpoint}")
+            return None
+        
+        policy = self.retry_policy
+        for attempt in range(policy.max_attempts):
+            retry_after = None
+            try:
+                response = self.wcapi.get(endpoint, params=params or {})
+                if response.status_code == 200:
+                    # Recorded as a success once the body is parsed (see _parse_json)
+                    return response
+                if not policy.should_retry(response.status_code):
+                    # Client errors (e.g. 404 for an unknown order) say nothing about store health
+                    logger.error(f"Failed to get {endpoint}: {response.status_code} - {response.text}")
+                    self.breaker.record_success()
+                    return None
+                logger.warning(f"Got {response.status_code} from {endpoint} (attempt {attempt + 1}/{policy.max_attempts})")
+                retry_after = response.headers.get("Retry-After")
+            except requests.exceptions.Timeout as e:
+                logger.error(f"Timeout getting {endpoint}: {str(e)}")
+                break
+            except Exception as e:
+                logger.warning(f"Error getting {endpoint} (attempt {attempt + 1}/{policy.max_attempts}): {str(e)}")
+            
+            if attempt + 1 < policy.max_attempts:
+                time.sleep(policy.delay(attempt, retry_after))
+        
+        logger.error(f"Giving up on {endpoint}")
+        self.breaker.record_failure()
+        return None
+    
+    def _parse_json(self, response, endpoint):
+        """
+        Parsed body of a 200 response, or None if it is not JSON
+        
+        A misconfigured store can answer 200 with an HTML page or PHP notices; that
+        counts as a failed request for the circuit breaker.
+        """
+        try:
+            records = response.json()
+        except ValueError as e:
+            logger.error(f"Invalid JSON from {endpoint}: {e} - {response.text[:200]}")
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return records
+    
+    def _get(self, endpoint, params=None):
         """
+        Perform a GET request against the WooCommerce API
+        
+        Args:
+            endpoint (str): REST endpoint, e.g. "products"
+            params (dict): Query parameters
+            
+        Returns:
+            Parsed JSON response or None if the request failed
+        """
+        response = self._request(endpoint, params)
+        if response is None:
+            return None
+        return self._parse_json(response, endpoint)
+    
+    def _get_page(self, endpoint, params=None):
+        """
+        Perform a paginated GET request against the WooCommerce API
+        
+        Args:
+            endpoint (str): REST endpoint, e.g. "orders"
+            params (dict): Query parameters including page and per_page
+            
+        Returns:
+            tuple: (parsed JSON or None if the request failed, total number of pages)
+        """
+        response = self._request(endpoint, params)
+        if response is None:
+            return None, 0
+        records = self._parse_json(response, endpoint)
+        if records is None:
+            return None, 0
+        return records, int(response.headers.get("X-WP-TotalPages", 1))
+    
+    def _get_all_pages(self, endpoint, params=None):
+        """
+        Fetch every page of a collection; pages after the first are fetched in parallel
+        
+        Args:
+            endpoint (str): REST endpoint, e.g. "products/categories"
+            params (dict): Query parameters (per_page defaults to 100)
+            
+        Returns:
+            list: All records, or None if any page failed
+        """
+        params = dict(params or {}, page=1)
+        params.setdefault("per_page", 100)
+        records, total_pages = self._get_page(endpoint, params)
+        if records is None:
+            return None
+        
+        if total_pages > 1:
+            def fetch(page):
+                return self._get_page(endpoint, dict(params, page=page))[0]
+            
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, total_pages - 1)) as executor:
+                for page_records in executor.map(fetch, range(2, total_pages + 1)):
+                    if page_records is None:
+                        return None
+                    records.extend(page_records)
+        
+        return records
+    
+    def _cached_get(self, tier, endpoint, params=None):
+        """
+        Perform a GET request through the cache tier for this endpoint type
+        
+        Args:
+            tier (str): Cache tier name (see woocommerce_cache.DEFAULT_TIERS)
+            endpoint (str): REST endpoint
+            params (dict): Query parameters
+            
+        Returns:
+            Parsed JSON response, or None if the request failed or, while the store is
+            unreachable, nothing is cached
+        """
+        key = make_cache_key(endpoint, params)
         if not self.is_connected:
-            if not self.connect():
-                return []
+            # Until the store is reachable (at startup, or while the breaker is open) serve what is cached
+            return self.product_cache.get_cached(tier, key)
+        return self.product_cache.get_or_load(tier, key, lambda: self._get(endpoint, params))
+    
+    def _with_fields(self, params, fields):
+        """Add the `_fields` projection to query parameters (fields=None requests full objects)"""
+        params = dict(params or {})
+        if fields:
+            params["_fields"] = fields_param(fields)
+        return params
+    
+    def invalidate_product(self, product_id):
+        """
+        Drop a product and every cached product list containing it
+        
+        Called from the WooCommerce product webhooks when a product changes.
+        
+        Args:
+            product_id (int): Product ID
+        """
+        product_id = int(product_id)
+        # Single products are cached once per field projection
+        self.product_cache.invalidate_where('product', lambda product: product.get('id') == product_id)
+        removed = self.product_cache.invalidate_where(
+            'products', lambda products: any(p.get('id') == product_id for p in products)
+        )
+        logger.info(f"Invalidated product {product_id} and {removed} cached product lists")
+    
+    def invalidate_products(self):
+        """Drop all cached products and categories"""
+        self.product_cache.invalidate('product')
+        self.product_cache.invalidate('products')
+        self.product_cache.invalidate('categories')
+    
+    def invalidate_order(self, order_id):
+        """
+        Drop an order and all cached order lists
+        
+        Called from the WooCommerce order webhook when an order is created or updated.
         
+        Args:
+            order_id (int): Order ID
+        """
+        order_id = int(order_id)
+        self.product_cache.invalidate_where('order', lambda order: order.get('id') == order_id)
+        self.product_cache.invalidate('orders')
+    
+    @staticmethod
+    def _product_params(page, per_page, search=None, category=None, min_price=None, max_price=None,
+                        stock_status=None, orderby=None, order=None):
+        """Query parameters for a products listing; filters left as None are not sent"""
         params = {
             "page": page,
             "per_page": per_page
         }
+        filters = {
+            "search": search,
+            "category": category,
+            "min_price": min_price,
+            "max_price": max_price,
+            "stock_status": stock_status,
+            "orderby": orderby,
+            "order": order,
+        }
+        for name, value in filters.items():
+            if value is not None and value != "":
+                params[name] = str(value) if name in ("min_price", "max_price") else value
+        return params
+    
+    def get_products(self, page=1, per_page=20, search=None, category=None, min_price=None, max_price=None,
+                     stock_status=None, orderby=None, order=None, fields=PRODUCT_SEARCH_FIELDS):
+        """
+        Get products from WooCommerce store
         
-        if search:
-            params["search"] = search
-            
-        if category:
-            params["category"] = category
+        Filters are applied by the store, so a page holds only matching products.
+        
+        Args:
+            page (int): Page number
+            per_page (int): Number of products per page
+            search (str): Search term
+            category (int): Category ID (includes subcategories)
+            min_price (float): Lowest price (inclusive)
+            max_price (float): Highest price (inclusive)
+            stock_status (str): 'instock', 'outofstock' or 'onbackorder'
+            orderby (str): 'date', 'price', 'popularity', 'title', ...
+            order (str): 'asc' or 'desc'
+            fields (tuple): Field projection (see woocommerce_fields), None for full products
             
-        try:
-            response = self.wcapi.get("products", params=params)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to get products: {response.status_code} - {response.text}")
-                return []
-        except Exception as e:
-            logger.error(f"Error getting products: {str(e)}")
+        Returns:
+            list: List of products or empty list if error
+        """
+        params = self._product_params(page, per_page, search, category, min_price, max_price,
+                                      stock_status, orderby, order)
+        
+        products = self._cached_get('products', "products", self._with_fields(params, fields))
+        if products is None:
             return []
+        
+        # Prime the single-product tier with the same projection so follow-up lookups by ID are served locally
+        for product in products:
+            if 'id' in product:
+                key = make_cache_key(f"products/{product['id']}", self._with_fields(None, fields))
+                self.product_cache.set('product', key, product)
+        
+        return list(products)
+    
+    def find_products(self, limit, accept=None, max_pages=MAX_SEARCH_PAGES, fields=PRODUCT_SEARCH_FIELDS, **filters):
+        """
+        Collect the first `limit` products matching store-side filters and an optional local check
+        
+        Pages are requested one at a time and only until the top-N is filled, so a
+        narrow filter does not download the whole catalog.
+        
+        Args:
+            limit (int): Number of products wanted
+            accept (callable): Local predicate for checks the store cannot do (optional)
+            max_pages (int): Upper bound of pages to request
+            fields (tuple): Field projection (see woocommerce_fields)
+            **filters: Filters of get_products (search, category, min_price, max_price, stock_status, orderby, order)
+            
+        Returns:
+            list: Up to `limit` products in store order
+        """
+        # Without a local check the first page already is the answer
+        per_page = min(limit if accept is None else max(limit * 2, 10), 100)
+        found = []
+        for page in range(1, max_pages + 1):
+            products = self.get_products(page=page, per_page=per_page, fields=fields, **filters)
+            found.extend(p for p in products if accept is None or accept(p))
+            if len(found) >= limit or len(products) < per_page:
+                break
+        return found[:limit]
     
-    def get_product(self, product_id):
+    def get_product(self, product_id, fields=PRODUCT_SEARCH_FIELDS):
         """
         Get a specific product by ID
         
         Args:
             product_id (int): Product ID
+            fields (tuple): Field projection (see woocommerce_fields), None for the full product
             
         Returns:
             dict: Product data or None if error
         """
-        if not self.is_connected:
-            if not self.connect():
-                return None
-        
-        try:
-            response = self.wcapi.get(f"products/{product_id}")
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to get product {product_id}: {response.status_code} - {response.text}")
-                return None
-        except Exception as e:
-            logger.error(f"Error getting product {product_id}: {str(e)}")
-            return None
+        return self._cached_get('product', f"products/{product_id}", self._with_fields(None, fields))
     
     def search_products_by_name(self, name):
         """
@@ -132,67 +512,79 @@ class WooCommerceClient:
         """
         return self.get_products(search=name, per_page=5)
     
-    def advanced_product_search(self, query, limit=5):
+    def advanced_product_search(self, query, limit=5, fields=PRODUCT_SEARCH_FIELDS):
         """
         Advanced product search that handles model numbers and partial queries
         
         Args:
             query (str): Search query
             limit (int): Maximum number of results to return
+            fields (tuple): Field projection; must include the fields used for scoring
             
         Returns:
             list: List of matching products sorted by relevance
         """
-        if not self.is_connected:
-            if not self.connect():
-                return []
-        
         try:
             # Clean up the query
             query = query.strip().lower()
             
             # Extract potential model numbers from the query
-            model_numbers = self._extract_model_numbers(query)
+            model_numbers = self.extract_model_numbers(query)
             
             # Try direct search first
-            direct_results = self.get_products(search=query, per_page=20)
+            direct_results = self.get_products(search=query, per_page=20, fields=fields)
             
             # If we have model numbers, try searching for each one
             model_results = []
             if model_numbers:
                 for model in model_numbers:
-                    model_search = self.get_products(search=model, per_page=10)
+                    model_search = self.get_products(search=model, per_page=10, fields=fields)
                     model_results.extend(model_search)
             
-            # Combine results
-            all_results = direct_results + model_results
-            
-            # Remove duplicates
-            unique_results = {}
-            for product in all_results:
-                if product['id'] not in unique_results:
-                    unique_results[product['id']] = product
-            
-            # Score and sort results
-            scored_results = []
-            for product in unique_results.values():
-                score = self._calculate_relevance_score(product, query, model_numbers)
-                scored_results.append((score, product))
-            
-            # Sort by score (descending)
-            scored_results.sort(key=lambda x: x[0], reverse=True)
-            
-            # Return top results
-            return [product for _, product in scored_results[:limit]]
+            return self._rank_search_results(direct_results + model_results, query, model_numbers, limit)
         
         except Exception as e:
             logger.error(f"Error in advanced product search: {e}")
             return []
     
-    def _extract_model_numbers(self, text):
+    def _rank_search_results(self, all_results, query, model_numbers, limit):
+        """
+        Deduplicate search results and return the most relevant ones
+        
+        Args:
+            all_results (list): Products from all searches
+            query (str): Cleaned search query
+            model_numbers (list): Model numbers extracted from the query
+            limit (int): Maximum number of results to return
+            
+        Returns:
+            list: Products sorted by relevance
+        """
+        # Remove duplicates
+        unique_results = {}
+        for product in all_results:
+            if product['id'] not in unique_results:
+                unique_results[product['id']] = product
+        
+        # Score and sort results
+        scored_results = []
+        for product in unique_results.values():
+            score = self._calculate_relevance_score(product, query, model_numbers)
+            scored_results.append((score, product))
+        
+        # Sort by score (descending)
+        scored_results.sort(key=lambda x: x[0], reverse=True)
+        
+        # Return top results
+        return [product for _, product in scored_results[:limit]]
+    
+    def extract_model_numbers(self, text):
         """
         Extract potential model numbers from text
         
+        advanced_product_search runs one extra search per model number, so the query
+        planner of vision_search uses this to estimate the cost of a query.
+        
         Args:
             text (str): Text to extract model numbers from
             
@@ -299,46 +691,124 @@ class WooCommerceClient:
         
         return score
     
-    def get_order(self, order_id):
+    def _get_by_ids(self, endpoint, tier, ids, fields):
+        """
+        Fetch records by ID through the per-record cache tier
+        
+        Cached records are served locally; only the missing IDs are requested, in
+        include= chunks of BATCH_CHUNK_SIZE fetched in parallel. While the store is
+        unreachable, stale records are served and nothing is requested.
+        
+        Args:
+            endpoint (str): "products" or "orders"
+            tier (str): Per-record cache tier ('product' or 'order')
+            ids (list): Record IDs
+            fields (tuple): Field projection, None for full records
+            
+        Returns:
+            list: Records in the order of ids; unknown IDs are skipped
+        """
+        if fields and "id" not in fields:
+            fields = ("id",) + tuple(fields)
+        projection = self._with_fields(None, fields)
+        ids = list(dict.fromkeys(int(record_id) for record_id in ids))
+        
+        connected = self.is_connected
+        found = {}
+        missing = []
+        for record_id in ids:
+            record, state = self.product_cache.get(tier, make_cache_key(f"{endpoint}/{record_id}", projection))
+            if state == 'fresh' or (state == 'stale' and not connected):
+                found[record_id] = record
+            else:
+                missing.append(record_id)
+        
+        if missing and connected:
+            chunks = [missing[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(missing), BATCH_CHUNK_SIZE)]
+            
+            def fetch(chunk):
+                return self._get(endpoint, dict(projection, include=",".join(map(str, chunk)), per_page=len(chunk)))
+            
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(chunks))) as executor:
+                for records in executor.map(fetch, chunks):
+                    for record in records or []:
+                        found[record['id']] = record
+                        self.product_cache.set(tier, make_cache_key(f"{endpoint}/{record['id']}", projection), record)
+            
+            logger.info(f"Fetched {len(missing)} of {len(ids)} {endpoint} by ID in {len(chunks)} request(s)")
+        
+        return [found[record_id] for record_id in ids if record_id in found]
+    
+    def get_products_by_ids(self, product_ids, fields=PRODUCT_SEARCH_FIELDS):
+        """
+        Get several products by ID, served from the cache where possible
+        
+        Args:
+            product_ids (list): Product IDs
+            fields (tuple): Field projection (see woocommerce_fields), None for full products
+            
+        Returns:
+            list: Products in the order of product_ids (unknown IDs are skipped)
+        """
+        if not product_ids:
+            return []
+        
+        return self._get_by_ids("products", 'product', product_ids, fields)
+    
+    def get_orders_by_ids(self, order_ids, fields=ORDER_NOTIFICATION_FIELDS):
+        """
+        Get several orders by ID, served from the cache where possible
+        
+        Args:
+            order_ids (list): Order IDs
+            fields (tuple): Field projection (see woocommerce_fields), None for full orders
+            
+        Returns:
+            list: Orders in the order of order_ids (unknown IDs are skipped)
+        """
+        if not order_ids:
+            return []
+        
+        return self._get_by_ids("orders", 'order', order_ids, fields)
+    
+    def prime_order(self, order, fields=ORDER_NOTIFICATION_FIELDS):
+        """
+        Cache an order received outside the API (e.g. a webhook payload) so that
+        get_order() with the same projection does not go over the wire
+        
+        Args:
+            order (dict): Full order data
+            fields (tuple): Projection to cache it under
+        """
+        if order.get('id'):
+            key = make_cache_key(f"orders/{order['id']}", self._with_fields(None, fields))
+            self.product_cache.set('order', key, project_fields(order, fields))
+    
+    def get_order(self, order_id, fields=ORDER_NOTIFICATION_FIELDS):
         """
         Get order details by ID
         
         Args:
             order_id (int): Order ID
+            fields (tuple): Field projection (see woocommerce_fields), None for the full order
             
         Returns:
             dict: Order data or None if error
         """
-        if not self.is_connected:
-            if not self.connect():
-                return None
-        
-        try:
-            response = self.wcapi.get(f"orders/{order_id}")
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to get order {order_id}: {response.status_code} - {response.text}")
-                return None
-        except Exception as e:
-            logger.error(f"Error getting order {order_id}: {str(e)}")
-            return None
+        return self._cached_get('order', f"orders/{order_id}", self._with_fields(None, fields))
     
-    def get_customer_orders(self, email=None, phone=None):
+    def get_customer_orders(self, email=None, phone=None, fields=ORDER_SUMMARY_FIELDS):
         """
         Get orders for a customer by email or phone
         
         Args:
             email (str): Customer email
             phone (str): Customer phone number
+            fields (tuple): Field projection (see woocommerce_fields), None for full orders
             
         Returns:
             list: List of orders or empty list if error
         """
-        if not self.is_connected:
-            if not self.connect():
-                return []
-        
         if not email and not phone:
             logger.error("Either email or phone must be provided")
             return []
@@ -351,51 +821,27 @@ class WooCommerceClient:
             
             customers = []
             if email:
-                response = self.wcapi.get("customers", params=params)
-                if response.status_code == 200:
-                    customers = response.json()
+                customers = self._cached_get('orders', "customers", self._with_fields(params, CUSTOMER_ID_FIELDS)) or []
             
-            # If no customer found by email and phone is provided, search orders directly
+            # If no customer found by email and phone is provided, look the phone up in the order index
             if not customers and phone:
-                # Format phone number for search (remove spaces, +, etc.)
-                formatted_phone = ''.join(filter(str.isdigit, phone))
-                
-                # Search orders with this phone number
-                # Note: This is not ideal as WooCommerce API doesn't directly support filtering orders by phone
-                # We'll need to get all orders and filter them manually
-                all_orders = []
-                page = 1
-                
-                while True:
-                    response = self.wcapi.get("orders", params={"page": page, "per_page": 100})
-                    if response.status_code != 200 or not response.json():
-                        break
-                    
-                    page_orders = response.json()
-                    all_orders.extend(page_orders)
-                    
-                    if len(page_orders) < 100:
-                        break
-                    
-                    page += 1
+                # WooCommerce cannot filter orders by phone, so the index maps phone numbers to order IDs.
+                # A request never waits for the backfill or catch-up; they run in the background.
+                if not self.order_index.is_built or self.order_index.needs_catch_up:
+                    if self.is_connected:
+                        self.order_index.ensure_built_in_background()
+                    if not self.order_index.is_built:
+                        logger.info("Phone order index not built yet, building it in the background")
+                        return []
                 
-                # Filter orders by phone number
-                matching_orders = []
-                for order in all_orders:
-                    billing_phone = order.get("billing", {}).get("phone", "")
-                    formatted_billing_phone = ''.join(filter(str.isdigit, billing_phone))
-                    
-                    if formatted_phone in formatted_billing_phone or formatted_billing_phone in formatted_phone:
-                        matching_orders.append(order)
-                
-                return matching_orders
+                return self.get_orders_by_ids(self.order_index.lookup(phone), fields)
             
             # If customer found by email, get their orders
             if customers:
                 customer_id = customers[0]["id"]
-                response = self.wcapi.get("orders", params={"customer": customer_id})
-                if response.status_code == 200:
-                    return response.json()
+                orders = self._cached_get('orders', "orders", self._with_fields({"customer": customer_id}, fields))
+                if orders is not None:
+                    return list(orders)
             
             return []
             
@@ -403,7 +849,7 @@ class WooCommerceClient:
             logger.error(f"Error getting customer orders: {str(e)}")
             return []
     
-    def get_orders(self, status=None, after=None, limit=20):
+    def get_orders(self, status=None, after=None, limit=20, fields=ORDER_NOTIFICATION_FIELDS):
         """
         Get orders with filters
         
@@ -411,14 +857,11 @@ class WooCommerceClient:
             status (str or list): Filter by order status (e.g., 'processing', 'completed')
             after (datetime): Get orders after this date/time
             limit (int): Maximum number of orders to return
+            fields (tuple): Field projection (see woocommerce_fields), None for full orders
             
         Returns:
             list: List of orders or empty list if error
         """
-        if not self.is_connected:
-            if not self.connect():
-                return []
-        
         try:
             params = {"per_page": limit}
             
@@ -434,40 +877,33 @@ class WooCommerceClient:
                 params["after"] = after.strftime("%Y-%m-%dT%H:%M:%S")
             
             logger.info(f"Getting orders with params: {params}")
-            response = self.wcapi.get("orders", params=params)
+            orders = self._cached_get('orders', "orders", self._with_fields(params, fields))
             
-            if response.status_code == 200:
-                orders = response.json()
-                logger.info(f"Found {len(orders)} orders")
-                return orders
-            else:
-                logger.error(f"Failed to get orders: {response.status_code} - {response.text}")
+            if orders is None:
                 return []
+            
+            logger.info(f"Found {len(orders)} orders")
+            return list(orders)
         except Exception as e:
             logger.error(f"Error getting orders: {str(e)}")
             return []
     
     def get_product_categories(self):
         """
-        Get all product categories
+        Get all product categories (every page, cached in the 'categories' tier)
         
         Returns:
             list: List of categories or empty list if error
         """
+        params = self._with_fields({"per_page": 100}, CATEGORY_FIELDS)
+        key = make_cache_key("products/categories", params)
         if not self.is_connected:
-            if not self.connect():
-                return []
-        
-        try:
-            response = self.wcapi.get("products/categories", params={"per_page": 100})
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to get categories: {response.status_code} - {response.text}")
-                return []
-        except Exception as e:
-            logger.error(f"Error getting categories: {str(e)}")
-            return []
+            categories = self.product_cache.get_cached('categories', key)
+        else:
+            categories = self.product_cache.get_or_load(
+                'categories', key, lambda: self._get_all_pages("products/categories", params)
+            )
+        return list(categories) if categories is not None else []
 
 # Create a singleton instance
 woocommerce = WooCommerceClient()
@@ -475,11 +911,11 @@ woocommerce = WooCommerceClient()
 def test_connection():
     """Test the WooCommerce connection"""
     client = WooCommerceClient()
-    return client.is_connected
+    return client.connect()
 
 if __name__ == "__main__":
     # Test the connection when run directly
-    if test_connection():
+    if test_connection() and woocommerce.wait_until_ready(timeout=PROBE_TIMEOUT * 2):
         print("✅ Successfully connected to WooCommerce API")
         
         # Test the advanced search
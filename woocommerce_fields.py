@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Field projections for WooCommerce REST reads.
+
+Each call site asks the store only for the fields it uses through the `_fields`
+query parameter, instead of downloading full objects with descriptions, meta_data,
+images and _links. The TypedDicts document the minimal record each projection returns.
+
+Dotted names select keys of nested objects (billing.phone). WordPress cannot project
+inside lists (a dotted path into a list returns an empty list), so list fields such as
+line_items and categories are always requested whole.
+"""
+
+from typing import List, TypedDict
+
+class ProductCategoryRef(TypedDict, total=False):
+    id: int
+    name: str
+    slug: str
+
+class ProductSearchHit(TypedDict, total=False):
+    """Product as used by search results and product replies"""
+    id: int
+    name: str
+    sku: str
+    price: str
+    regular_price: str
+    sale_price: str
+    stock_status: str
+    permalink: str
+    short_description: str
+    categories: List[ProductCategoryRef]
+
+class ProductRecommendation(ProductSearchHit, total=False):
+    """Search hit plus the long description used for feature matching"""
+    description: str
+
+class OrderAddress(TypedDict, total=False):
+    first_name: str
+    last_name: str
+    address_1: str
+    postcode: str
+    city: str
+    country: str
+    email: str
+    phone: str
+
+class OrderLineItem(TypedDict, total=False):
+    name: str
+    quantity: int
+    total: str
+
+class OrderSummary(TypedDict, total=False):
+    """Order as shown to a customer asking about their order"""
+    id: int
+    status: str
+    date_created: str
+    total: str
+    currency: str
+    shipping: OrderAddress
+    line_items: List[OrderLineItem]
+
+class OrderNotification(OrderSummary, total=False):
+    """Order as sent to the shop owners in new-order notifications"""
+    date_created_gmt: str
+    billing: OrderAddress
+
+class ProductCategory(TypedDict, total=False):
+    id: int
+    name: str
+    slug: str
+    parent: int
+    count: int
+
+PRODUCT_SEARCH_FIELDS = (
+    "id", "name", "sku", "price", "regular_price", "sale_price", "stock_status",
+    "permalink", "short_description", "categories",
+)
+PRODUCT_RECOMMENDATION_FIELDS = PRODUCT_SEARCH_FIELDS + ("description",)
+
+ORDER_SUMMARY_FIELDS = (
+    "id", "status", "date_created", "total", "currency",
+    "shipping.first_name", "shipping.last_name", "shipping.address_1", "shipping.city", "shipping.country",
+    "line_items",
+)
+ORDER_NOTIFICATION_FIELDS = ORDER_SUMMARY_FIELDS + (
+    "date_created_gmt", "shipping.postcode",
+    "billing.first_name", "billing.last_name", "billing.email", "billing.phone",
+)
+# Enough to maintain the phone -> orders index
+ORDER_INDEX_FIELDS = ("id", "billing.phone", "date_created_gmt")
+
+CUSTOMER_ID_FIELDS = ("id",)
+CATEGORY_FIELDS = ("id", "name", "slug", "parent", "count")
+
+def fields_param(fields):
+    """
+    Build the `_fields` query parameter value
+
+    Args:
+        fields (tuple): Field names, or None for full objects
+
+    Returns:
+        str: Comma-separated field list, or None
+    """
+    if not fields:
+        return None
+    return ",".join(fields)
+
+def project_fields(data, fields):
+    """
+    Apply a `_fields` projection locally, with the same rules as the WordPress REST API
+
+    Args:
+        data (dict or list): REST object or list of objects
+        fields (tuple or str): Field names (dotted for nested keys)
+
+    Returns:
+        Projected copy of data
+    """
+    if not fields:
+        return data
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+
+    tree = {}
+    for field in fields:
+        node = tree
+        parts = field.split(".")
+        for part in parts[:-1]:
+            if node.get(part) is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+
+    def intersect(value, node):
+        if isinstance(value, list):
+            # WordPress intersects the list indices with the field names, which leaves nothing
+            return []
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for key, sub in node.items():
+            if key in value:
+                result[key] = value[key] if sub is True else intersect(value[key], sub)
+        return result
+
+    if isinstance(data, list):
+        return [intersect(item, tree) for item in data]
+    return intersect(data, tree)